@@ -2,13 +2,19 @@
 Flask server for PaddleCoach frontend-backend integration.
 Handles ball tracking and video processing requests.
 """
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, send_from_directory, Response
 from flask_cors import CORS
 import subprocess
+import json
 import os
+import sys
 from pathlib import Path
 import time
 import threading
+from werkzeug.security import safe_join
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent / "src"))
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -16,6 +22,11 @@ CORS(app)  # Enable CORS for all routes
 # Global variable to track ball tracking process
 ball_tracking_process = None
 
+# Sprite names are versioned by the video they come from, so browsers may keep them for a year;
+# the seek index is revalidated (ETag) since reprocessing a video rewrites it
+SPRITE_MAX_AGE = 365 * 24 * 3600
+SEEK_INDEX_MAX_AGE = 300
+
 @app.route('/')
 def index():
     """Serve the main index.html file."""
@@ -486,6 +497,63 @@ def text_to_speech():
             'message': f'Failed to generate audio: {str(e)}'
         }), 500
 
+@app.route('/api/metrics')
+def metrics():
+    """
+    Expose per-stage processing timings of finished jobs in the Prometheus text format.
+    
+    Jobs are recorded by runs with timing enabled: the batch and watch-folder
+    services, and video_processor.py --timing. The upload flow (demo_video.py)
+    replays an already processed video without running the pipeline, so it
+    records no jobs.
+    """
+    from vision.timing import format_prometheus
+    return Response(format_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/seek-index/<path:video_path>')
+def seek_index(video_path):
+    """
+    Thumbnail sprites and keyframe offsets of a processed video under output/.
+    With ?t=<seconds>, returns only the thumbnail tile and keyframe for that time.
+    """
+    video = Path(video_path)
+    index_path = safe_join(os.path.join(app.root_path, 'output'), (video.parent / f"{video.stem}_thumbs" / 'seek_index.json').as_posix())
+    if index_path is None or not os.path.exists(index_path):
+        return jsonify({
+            'status': 'error',
+            'message': f'No seek index for {video_path}'
+        }), 404
+    
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    index['sprite_base_url'] = f"/api/thumbnails/{(video.parent / f'{video.stem}_thumbs').as_posix()}/"
+    
+    if request.args.get('t') is not None:
+        from vision.thumbnail_sprites import lookup
+        try:
+            result = lookup(index, float(request.args['t']))
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 't must be a number of seconds'}), 400
+        result['sprite_url'] = index['sprite_base_url'] + result['sprite'] if result['sprite'] else None
+        response = jsonify(result)
+    else:
+        response = jsonify(index)
+    
+    response.set_etag(f"{index['version']}-{request.args.get('t', '')}")
+    response.cache_control.public = True
+    response.cache_control.max_age = SEEK_INDEX_MAX_AGE
+    return response.make_conditional(request)
+
+@app.route('/api/thumbnails/<path:filepath>')
+def thumbnail_sprite(filepath):
+    """Serve a thumbnail sprite sheet (versioned names, cached for a year)."""
+    if not filepath.endswith('.jpg'):
+        return jsonify({'status': 'error', 'message': 'Not a thumbnail sprite'}), 404
+    response = send_from_directory('output', filepath, max_age=SPRITE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/output/<path:filepath>')
 def serve_output(filepath):
     """Serve files from the output directory."""
@@ -512,6 +580,8 @@ if __name__ == '__main__':
     print("  • POST /api/start-ball-tracking - Start recording")
     print("  • POST /api/upload-video - Upload video")
     print("  • POST /api/upload-match-video - Upload match video (Pro feature)")
+    print("  • GET /api/metrics - Stage timings (Prometheus format)")
+    print("  • GET /api/seek-index/<video> - Thumbnail sprites and keyframe offsets")
     print("\n⚡ Ready to serve!")
     print("="*60 + "\n")
     
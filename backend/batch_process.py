@@ -0,0 +1,344 @@
+"""
+Headless batch processing of match videos.
+Runs VideoProcessor on every video of one or more directories or manifests in a
+pool of worker processes, without any display. Finished videos leave a
+completion marker and are skipped on the next run, so an interrupted overnight
+batch can simply be restarted.
+
+Usage:
+    python backend/batch_process.py input/processVideo --workers 4 --threads 2
+    python backend/batch_process.py tournament_day1.txt --output-dir output/batch --save-video
+"""
+from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv'}
+DONE_MARKER = "batch_done.json"
+
+# Thread pools sized by these variables are created when the libraries load in the worker
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+
+def collect_videos(inputs: List[str]) -> List[Path]:
+    """
+    Expand the inputs into a list of video files.
+    
+    Args:
+        inputs: Video files, directories (searched non-recursively) or manifests
+                (.txt with one path per line, or .json with a list of paths;
+                relative paths are resolved against the manifest's directory)
+    
+    Returns:
+        Unique video paths in input order
+    """
+    videos = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            videos.extend(sorted(p for p in path.iterdir() if p.suffix.lower() in VIDEO_EXTENSIONS))
+        elif path.suffix.lower() == '.json':
+            with open(path, 'r') as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                entries = entries.get('videos', [])
+            videos.extend(path.parent / entry for entry in entries)
+        elif path.suffix.lower() == '.txt':
+            with open(path, 'r') as f:
+                lines = [line.strip() for line in f]
+            videos.extend(path.parent / line for line in lines if line and not line.startswith('#'))
+        else:
+            videos.append(path)
+    
+    unique = []
+    seen = set()
+    for video in videos:
+        key = video.resolve()
+        if key not in seen:
+            seen.add(key)
+            unique.append(video)
+    return unique
+
+
+def output_dirs_for(videos: List[Path], output_dir: Path) -> Dict[Path, Path]:
+    """One output directory per video, named after the file (parent name added on clashes)."""
+    stems = [video.stem for video in videos]
+    return {video: output_dir / (video.stem if stems.count(video.stem) == 1
+                                 else f"{video.parent.name}_{video.stem}")
+            for video in videos}
+
+
+def is_completed(video_path: Path, video_output_dir: Path) -> Optional[Dict]:
+    """
+    Check for a completion marker that matches the current video file.
+    
+    Returns:
+        The marker's contents, or None if the video still needs processing
+    """
+    marker_path = video_output_dir / DONE_MARKER
+    if not marker_path.exists():
+        return None
+    try:
+        with open(marker_path, 'r') as f:
+            marker = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    
+    # A replaced video (different size or modification time) is processed again
+    stat = video_path.stat()
+    if marker.get('source_size') != stat.st_size or marker.get('source_mtime') != stat.st_mtime:
+        return None
+    return marker
+
+
+def init_worker(threads: int):
+    """Process pool initializer: limit the libraries' internal thread pools."""
+    import cv2
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+
+def process_one(video_path: str, video_output_dir: str, options: Dict) -> Dict:
+    """
+    Process one video in a worker process.
+    
+    Args:
+        video_path: Input video
+        video_output_dir: Directory for this video's outputs
+        options: VideoProcessor options from the command line
+    
+    Returns:
+        Result row for the summary table
+    """
+    video_path = Path(video_path)
+    video_output_dir = Path(video_output_dir)
+    video_output_dir.mkdir(parents=True, exist_ok=True)
+    
+    result = {'video': str(video_path), 'output_dir': str(video_output_dir), 'status': 'failed'}
+    start_time = time.time()
+    
+    # The processing log goes to a file per video instead of the shared console
+    with open(video_output_dir / "process.log", 'w') as log, redirect_stdout(log):
+        try:
+            # Imported here so the thread limits are in place before the libraries load
+            from vision.video_processor import VideoProcessor
+            
+            processor = VideoProcessor(
+                video_path=str(video_path),
+                output_dir=str(video_output_dir),
+                target_fps=options['target_fps'],
+                use_motion_gate=options['use_motion_gate'],
+                segment_rallies=options['segment_rallies'],
+                smooth_keypoints=options['smooth_keypoints'],
+                pose_interval=options['pose_interval'],
+                adaptive_rate=options['adaptive_rate'],
+                enable_timing=options['enable_timing'],
+                auto_imgsz=options.get('auto_imgsz', False),
+                thumbnail_interval=options['thumbnail_interval']
+            )
+            stats = processor.process_video(visualize=False, save_video=options['save_video'])
+            processor.save_pose_data_json(include_all_keypoints=options['all_keypoints'])
+            processor.save_shots_json()
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            result['error'] = f"{type(e).__name__}: {e}"
+            result['wall_time'] = time.time() - start_time
+            return result
+    
+    wall_time = time.time() - start_time
+    result.update({
+        'status': 'done',
+        'duration': stats['duration'],
+        'total_frames': stats['total_frames'],
+        'processed_frames': stats['processed_frames'],
+        'wall_time': wall_time,
+        'throughput_fps': stats['total_frames'] / wall_time if wall_time > 0 else 0.0,
+        'realtime_factor': stats['duration'] / wall_time if wall_time > 0 else 0.0,
+        'shots': sum(len(shots) for shots in processor.detected_shots.values()),
+        'finished': datetime.now().isoformat()
+    })
+    
+    # Written last and atomically: a marker means every output of the video is complete
+    source_stat = video_path.stat()
+    marker = {**result, 'source_size': source_stat.st_size, 'source_mtime': source_stat.st_mtime,
+              'stats': stats}
+    tmp_path = video_output_dir / (DONE_MARKER + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(marker, f, indent=2, default=str)
+    os.replace(tmp_path, video_output_dir / DONE_MARKER)
+    
+    return result
+
+
+def print_summary(rows: List[Dict], wall_time: float):
+    """Print the per-video throughput table."""
+    print("\n" + "="*100)
+    print("📊 BATCH SUMMARY")
+    print("="*100)
+    print(f"{'Video':<36} {'Status':<8} {'Length s':>9} {'Wall s':>9} {'Frames/s':>9} {'x Realtime':>11} {'Shots':>6}")
+    print("-"*100)
+    for row in rows:
+        name = Path(row['video']).name
+        name = name if len(name) <= 36 else name[:33] + "..."
+        if row['status'] == 'failed':
+            print(f"{name:<36} {'failed':<8} {row.get('error', '')[:54]}")
+            continue
+        print(f"{name:<36} {row['status']:<8} {row['duration']:>9.1f} {row['wall_time']:>9.1f} "
+              f"{row['throughput_fps']:>9.1f} {row['realtime_factor']:>11.2f} {row['shots']:>6}")
+    
+    processed = [row for row in rows if row['status'] == 'done']
+    video_seconds = sum(row['duration'] for row in processed)
+    print("-"*100)
+    print(f"Processed: {len(processed)} | Skipped: {sum(row['status'] == 'skipped' for row in rows)} | "
+          f"Failed: {sum(row['status'] == 'failed' for row in rows)}")
+    if processed and wall_time > 0:
+        print(f"Batch: {video_seconds / 60:.1f} min of video in {wall_time / 60:.1f} min "
+              f"({video_seconds / wall_time:.2f}x realtime overall)")
+
+
+def save_summary(rows: List[Dict], output_dir: Path) -> Path:
+    """Write the summary table as CSV."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary_path = output_dir / f"batch_summary_{timestamp}.csv"
+    columns = ['video', 'status', 'duration', 'total_frames', 'processed_frames', 'wall_time',
+               'throughput_fps', 'realtime_factor', 'shots', 'output_dir', 'error']
+    with open(summary_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    return summary_path
+
+
+def main():
+    """Main execution function for batch processing."""
+    parser = argparse.ArgumentParser(description="Process many table tennis videos headlessly")
+    parser.add_argument("inputs", nargs="+", help="Video files, directories or manifests (.txt/.json)")
+    parser.add_argument("--output-dir", type=str, default="output/batch", help="Output directory")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 4),
+                        help="Videos processed at the same time (worker processes)")
+    parser.add_argument("--threads", type=int, default=2, help="Library threads per worker")
+    parser.add_argument("--force", action="store_true", help="Reprocess videos that are already completed")
+    parser.add_argument("--save-video", action="store_true", help="Render an annotated video per input")
+    parser.add_argument("--all-keypoints", action="store_true", help="Store all 17 keypoints in the pose JSON")
+    parser.add_argument("--target-fps", type=int, default=30, help="Target processing FPS")
+    parser.add_argument("--pose-interval", type=int, default=1,
+                        help="Run the pose model every Nth frame, optical flow in between")
+    parser.add_argument("--adaptive-rate", action="store_true",
+                        help="Sample quiet phases at a lower rate, full rate around strokes")
+    parser.add_argument("--auto-imgsz", action="store_true",
+                        help="Choose the pose model input size per video resolution (cached)")
+    
+    args = parser.parse_args()
+    
+    videos = collect_videos(args.inputs)
+    missing = [video for video in videos if not video.exists()]
+    for video in missing:
+        print(f"⚠️  Not found: {video}")
+    videos = [video for video in videos if video.exists()]
+    
+    if not videos:
+        print("Error: No video files found.")
+        print(f"Supported formats: {', '.join(sorted(VIDEO_EXTENSIONS))}")
+        sys.exit(1)
+    
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    video_dirs = output_dirs_for(videos, output_dir)
+    
+    rows: Dict[Path, Dict] = {}
+    pending = []
+    for video in videos:
+        marker = None if args.force else is_completed(video, video_dirs[video])
+        if marker is not None:
+            rows[video] = {**marker, 'status': 'skipped'}
+        else:
+            pending.append(video)
+    
+    print("="*60)
+    print("🏓 PaddleCoach - Batch Video Processing")
+    print("="*60)
+    print(f"Videos: {len(videos)} ({len(videos) - len(pending)} already completed)")
+    print(f"Workers: {args.workers} x {args.threads} threads")
+    print(f"Output: {output_dir}")
+    print("-"*60)
+    
+    options = {
+        'target_fps': args.target_fps,
+        'pose_interval': args.pose_interval,
+        'adaptive_rate': args.adaptive_rate,
+        'auto_imgsz': args.auto_imgsz,
+        'use_motion_gate': True,
+        'segment_rallies': True,
+        'smooth_keypoints': True,
+        'enable_timing': True,
+        'thumbnail_interval': 2.0,
+        'save_video': args.save_video,
+        'all_keypoints': args.all_keypoints
+    }
+    
+    # Inherited by the spawned workers before they import numpy/torch
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(args.threads)
+    
+    # Longest videos first, so one long video does not finish alone at the end
+    pending.sort(key=lambda video: video.stat().st_size, reverse=True)
+    
+    start_time = time.time()
+    if pending:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                                 initializer=init_worker, initargs=(args.threads,)) as executor:
+            futures = {executor.submit(process_one, str(video), str(video_dirs[video]), options): video
+                       for video in pending}
+            try:
+                for future in as_completed(futures):
+                    video = futures[future]
+                    try:
+                        row = future.result()
+                    except Exception as e:
+                        # The worker process itself died (e.g. out of memory)
+                        row = {'video': str(video), 'output_dir': str(video_dirs[video]),
+                               'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+                    rows[video] = row
+                    done = sum(1 for v in pending if v in rows)
+                    if row['status'] == 'done':
+                        print(f"✅ [{done}/{len(pending)}] {video.name}: {row['duration']:.0f}s of video "
+                              f"in {row['wall_time']:.0f}s ({row['realtime_factor']:.2f}x realtime)")
+                    else:
+                        print(f"❌ [{done}/{len(pending)}] {video.name}: {row.get('error')}")
+            except KeyboardInterrupt:
+                print("\n🛑 Interrupted - finished videos are kept, rerun to continue")
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+    
+    wall_time = time.time() - start_time
+    ordered_rows = [rows[video] for video in videos if video in rows]
+    print_summary(ordered_rows, wall_time)
+    summary_path = save_summary(ordered_rows, output_dir)
+    print(f"\n💾 Summary saved: {summary_path}")
+    
+    if any(row['status'] == 'failed' for row in ordered_rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
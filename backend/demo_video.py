@@ -2,19 +2,30 @@
 Demo script for PaddleCoach Vision System
 Displays pose detection results from pre-processed video.
 """
+from typing import Optional
 import cv2
 import time
 from pathlib import Path
+import sys
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from vision.frame_source import FrameSource
+from vision.thumbnail_sprites import SpriteGenerator, thumbnails_dir
 
 
 def play_demo_video(input_video: str = "input/demoVideo/dataDetection.mp4", 
-                    output_video: str = "output/demoVideo/output_dataDetection.mp4"):
+                    output_video: str = "output/demoVideo/output_dataDetection.mp4",
+                    thumbnail_interval: Optional[float] = 2.0):
     """
     Play the processed pose detection video.
     
     Args:
         input_video: Path to input video (for reference)
         output_video: Path to processed output video
+        thumbnail_interval: Seconds between timeline thumbnails written next to the output
+                            video for the web player, if missing or older (None = no thumbnails)
     """
     input_path = Path(input_video)
     output_path = Path(output_video)
@@ -30,18 +41,24 @@ def play_demo_video(input_video: str = "input/demoVideo/dataDetection.mp4",
         print("Please ensure output/output_dataPose.mp4 exists.")
         return
     
-    # Open the processed video
-    cap = cv2.VideoCapture(str(output_path))
+    # Sprites and seek index for /api/seek-index, rebuilt only when the video changed
+    index_path = thumbnails_dir(str(output_path)) / "seek_index.json"
+    if thumbnail_interval and (not index_path.exists() or
+                               index_path.stat().st_mtime < output_path.stat().st_mtime):
+        SpriteGenerator(interval=thumbnail_interval).generate(str(output_path))
+    
+    # Open the processed video (decoded ahead on a background thread)
+    source = FrameSource(str(output_path))
     
-    if not cap.isOpened():
+    if not source.is_opened():
         print(f"❌ Error opening video file: {output_video}")
         return
     
     # Get video properties
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = int(source.fps)
+    width = source.width
+    height = source.height
+    total_frames = source.total_frames
     duration = total_frames / fps if fps > 0 else 0
     
     print("="*70)
@@ -73,7 +90,7 @@ def play_demo_video(input_video: str = "input/demoVideo/dataDetection.mp4",
     
     while True:
         if not paused:
-            ret, frame = cap.read()
+            ret, frame = source.read()
             
             if not ret:
                 print("\n✅ Playback complete!")
@@ -103,7 +120,7 @@ def play_demo_video(input_video: str = "input/demoVideo/dataDetection.mp4",
             print(f"\n⏸️  {status}")
     
     # Cleanup
-    cap.release()
+    source.release()
     cv2.destroyAllWindows()
     
     # Final stats
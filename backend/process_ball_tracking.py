@@ -14,21 +14,37 @@ from datetime import datetime
 sys.path.append(str(Path(__file__).parent.parent / "src"))
 
 from vision.ball_tracker import BallTracker
+from vision.hybrid_ball_tracker import HybridBallTracker
+from vision.motion_gate import MotionGate
+from vision.video_writer import create_video_writer
+from vision.frame_source import FrameSource
+from vision.timing import StageTimer
+from vision.imgsz_autotuner import ImgszAutotuner
 from models.ball_data import BallData
 
 
 class RealtimeBallTracker:
     """Real-time ball tracking using camera feed."""
     
-    def __init__(self, camera_id: int = 0, output_dir: str = "output/ballTracking"):
+    def __init__(self, camera_id: int = 0, output_dir: str = "output/ballTracking", detector: str = "yolo",
+                 use_motion_gate: bool = False, video_backend: str = "auto", enable_timing: bool = False,
+                 auto_imgsz: bool = False):
         """
         Initialize real-time ball tracker.
         
         Args:
             camera_id: Camera device ID (0 for default camera)
             output_dir: Directory for output files (default: output/ballTracking)
+            detector: "yolo" (YOLO on every frame) or "hybrid" (HSV first, YOLO fallback)
+            use_motion_gate: Skip ball detection while the scene is static
+            video_backend: Recording backend, "ffmpeg" (H.264, encoded off the capture loop),
+                           "opencv" (mp4v) or "auto"
+            enable_timing: Time each stage of the capture loop (stats and output/metrics)
+            auto_imgsz: Profile the first camera frames at several ball model input sizes and use
+                        the smallest that keeps up with the camera (cached per camera resolution)
         """
         self.camera_id = camera_id
+        self.video_backend = video_backend
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
@@ -47,7 +63,13 @@ class RealtimeBallTracker:
                 f"Please ensure yolov11n.pt is in {script_dir}"
             )
         
-        self.tracker = BallTracker(model_path=str(model_path), max_trajectory=50)
+        if detector == "hybrid":
+            self.tracker = HybridBallTracker(model_path=str(model_path), max_trajectory=50)
+        else:
+            self.tracker = BallTracker(model_path=str(model_path), max_trajectory=50, use_roi=True)
+        
+        # Motion gate to skip detection between rallies
+        self.motion_gate = MotionGate() if use_motion_gate else None
         
         # Storage for ball data
         self.ball_detections: List[BallData] = []
@@ -55,6 +77,13 @@ class RealtimeBallTracker:
         # Session info
         self.session_start = None
         
+        # Per-stage span timers
+        self.timer = StageTimer("ball_tracking", enabled=enable_timing)
+        
+        # Ball model input size, tuned once the camera resolution is known
+        self.auto_imgsz = auto_imgsz
+        self.imgsz_tuning = None
+        
     def start_tracking(self, save_video: bool = False) -> Dict:
         """
         Start real-time ball tracking from camera.
@@ -65,16 +94,31 @@ class RealtimeBallTracker:
         Returns:
             Dictionary with session statistics
         """
-        # Open camera
-        cap = cv2.VideoCapture(self.camera_id)
+        # Open camera (captured on a background thread; stale frames are dropped if we fall behind)
+        source = FrameSource(self.camera_id, live=True)
         
-        if not cap.isOpened():
+        if not source.is_opened():
             raise RuntimeError(f"Cannot open camera {self.camera_id}")
         
         # Get camera properties
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30  # Default to 30 if not available
+        width = source.width
+        height = source.height
+        fps = int(source.fps) or 30  # Default to 30 if not available
+        
+        if self.auto_imgsz:
+            # The YOLO detector (the fallback one in hybrid mode) has to keep up with the camera
+            yolo_tracker = getattr(self.tracker, 'yolo_tracker', self.tracker)
+            autotuner = ImgszAutotuner(target_fps=fps)
+            clip = []
+            while len(clip) < autotuner.warmup_frames + autotuner.clip_frames:
+                ret, frame = source.read()
+                if not ret:
+                    break
+                # Frames are read-only views into the decoder's ring buffer, which later reads
+                # (and, for a camera, the decoder thread) overwrite
+                clip.append(frame.copy())
+            if clip:
+                self.imgsz_tuning = autotuner.tune_ball(yolo_tracker, clip)
         
         print("\n" + "="*60)
         print("🏓 Real-Time Ball Tracking Started")
@@ -95,8 +139,8 @@ class RealtimeBallTracker:
         if save_video:
             timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_video_path = self.output_dir / f"camera_session_{timestamp_str}.mp4"
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            writer = cv2.VideoWriter(str(output_video_path), fourcc, fps, (width, height))
+            writer = create_video_writer(str(output_video_path), fps, (width, height),
+                                         backend=self.video_backend)
             print(f"📹 Recording to: {output_video_path}")
         
         # Session stats
@@ -110,7 +154,8 @@ class RealtimeBallTracker:
         
         while True:
             if not paused:
-                ret, frame = cap.read()
+                with self.timer.span("capture"):
+                    ret, frame = source.read()
                 if not ret:
                     print("\n⚠️ Failed to read from camera")
                     break
@@ -118,26 +163,32 @@ class RealtimeBallTracker:
                 # Calculate timestamp
                 timestamp = time.time() - start_time
                 
-                # Process frame for ball detection
-                ball_data = self.tracker.process_frame(frame, frame_count, timestamp)
+                # Process frame for ball detection (nothing to find in a static scene)
+                ball_data = None
+                with self.timer.span("detection"):
+                    if self.motion_gate is None or self.motion_gate.should_process(frame):
+                        ball_data = self.tracker.process_frame(frame, frame_count, timestamp)
                 
                 if ball_data is not None:
                     self.ball_detections.append(ball_data)
                     detections_count += 1
                 
-                # Visualize with ball tracking
-                annotated_frame = self.tracker.visualize_ball(frame, ball_data)
-                
-                # Add info overlay
-                self._add_realtime_overlay(annotated_frame, frame_count, 
-                                           detections_count, start_time, ball_data)
+                # Visualize with ball tracking (on a copy; the frame is a read-only ring buffer view)
+                with self.timer.span("drawing"):
+                    annotated_frame = self.tracker.visualize_ball(frame.copy(), ball_data)
+                    
+                    # Add info overlay
+                    self._add_realtime_overlay(annotated_frame, frame_count, 
+                                               detections_count, start_time, ball_data)
                 
                 # Save to video if recording
                 if writer is not None:
-                    writer.write(annotated_frame)
+                    with self.timer.span("encoding"):
+                        writer.write(annotated_frame)
                 
                 # Show live feed
-                cv2.imshow('Real-Time Ball Tracking', annotated_frame)
+                with self.timer.span("display"):
+                    cv2.imshow('Real-Time Ball Tracking', annotated_frame)
                 
                 frame_count += 1
             
@@ -157,7 +208,7 @@ class RealtimeBallTracker:
                 print("\n� Trajectory reset")
         
         # Cleanup
-        cap.release()
+        source.release()
         if writer is not None:
             writer.release()
         cv2.destroyAllWindows()
@@ -175,9 +226,17 @@ class RealtimeBallTracker:
             'processing_fps': processing_fps,
             'camera_fps': fps,
             'resolution': f"{width}x{height}",
-            'session_start': self.session_start.strftime("%Y-%m-%d %H:%M:%S") if self.session_start else None
+            'session_start': self.session_start.strftime("%Y-%m-%d %H:%M:%S") if self.session_start else None,
+            'frame_source': source.get_statistics()
         }
         
+        stats.update(self.tracker.get_search_statistics())
+        if self.motion_gate is not None:
+            stats['motion_gate'] = self.motion_gate.get_statistics()
+        if self.timer.enabled:
+            stats['timing'] = self.timer.get_statistics()
+            self.timer.save()
+        
         print("\n\n" + "="*60)
         print("✅ Tracking Session Complete!")
         print("="*60)
@@ -250,6 +309,9 @@ class RealtimeBallTracker:
                 "max": max(speeds)
             }
         
+        if self.imgsz_tuning is not None:
+            stats["imgsz"] = self.imgsz_tuning
+        
         return stats
 
 
@@ -294,6 +356,12 @@ def main():
         print(f"Ball detections: {stats['detections']}")
         print(f"Detection rate: {stats['detection_rate']:.1f}%")
         print(f"Processing FPS: {stats['processing_fps']:.1f}")
+        if 'motion_gate' in stats:
+            print(f"Static frames skipped: {stats['motion_gate']['skipped_frames']} "
+                  f"({stats['motion_gate']['skip_ratio']:.1%})")
+        if 'yolo_frame_share' in stats:
+            print(f"YOLO fallback frames: {stats['yolo_frames']} ({stats['yolo_frame_share']:.1%})")
+        tracker.timer.print_summary()
         
         if detailed_stats:
             print("\n" + "="*60)
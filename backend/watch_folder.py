@@ -0,0 +1,389 @@
+"""
+Watch-folder ingestion service.
+Polls the input folders for new recordings, waits until a file has finished
+being written (size and modification time stable), hashes its content and
+queues it for headless processing by priority. Content that was processed
+before - even under another name - is recorded as a duplicate and skipped.
+
+Usage:
+    python backend/watch_folder.py
+    python backend/watch_folder.py --folder input/demoVideo:0 --folder input/processVideo:10 --workers 2
+    python backend/watch_folder.py --once    # Process what is there now, then exit
+"""
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, Future
+from datetime import datetime
+from pathlib import Path
+import argparse
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(str(Path(__file__).parent))
+
+from batch_process import VIDEO_EXTENSIONS, THREAD_ENV_VARS, init_worker, process_one
+
+# Folder -> priority (lower is processed first); uploads from the web app come first
+DEFAULT_FOLDERS = {"input/demoVideo": 0, "input/processVideo": 10}
+
+# Names used by browsers and copy tools while a file is still being written
+PARTIAL_SUFFIXES = {'.part', '.tmp', '.crdownload', '.download', '.partial'}
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hash a file's content in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentIndex:
+    """
+    Persistent index of processed content, keyed by SHA-256.
+    Also remembers each path's size/mtime/hash so unchanged files are not
+    rehashed after a restart.
+    """
+    
+    def __init__(self, index_path: str):
+        """
+        Load or create the index.
+        
+        Args:
+            index_path: JSON file holding the index
+        """
+        self.index_path = Path(index_path)
+        self.files: Dict[str, Dict] = {}  # sha256 -> entry
+        self.paths: Dict[str, Dict] = {}  # absolute path -> {'size', 'mtime', 'sha256'}
+        
+        if self.index_path.exists():
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            self.files = data.get('files', {})
+            self.paths = data.get('paths', {})
+        
+        # Jobs interrupted by a restart are queued again
+        for entry in self.files.values():
+            if entry['status'] in ('queued', 'processing'):
+                entry['status'] = 'interrupted'
+    
+    def cached_hash(self, path: Path, size: int, mtime: float) -> Optional[str]:
+        """Hash of a path from a previous scan, if the file is unchanged."""
+        known = self.paths.get(str(path.resolve()))
+        if known is not None and known['size'] == size and known['mtime'] == mtime:
+            return known['sha256']
+        return None
+    
+    def remember_path(self, path: Path, size: int, mtime: float, sha256: str):
+        """Store a path's hash."""
+        self.paths[str(path.resolve())] = {'size': size, 'mtime': mtime, 'sha256': sha256}
+    
+    def get(self, sha256: str) -> Optional[Dict]:
+        """Entry for a content hash."""
+        return self.files.get(sha256)
+    
+    def add(self, sha256: str, path: Path, size: int, priority: int, output_dir: Path) -> Dict:
+        """Register new content as queued."""
+        entry = {
+            'path': str(path),
+            'size': size,
+            'priority': priority,
+            'output_dir': str(output_dir),
+            'status': 'queued',
+            'queued': datetime.now().isoformat(),
+            'duplicates': []
+        }
+        self.files[sha256] = entry
+        return entry
+    
+    def save(self):
+        """Write the index atomically."""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'files': self.files, 'paths': self.paths}, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+
+class FolderWatcher:
+    """
+    Polls folders, deduplicates new files by content and processes them by priority.
+    """
+    
+    def __init__(self,
+                 folders: Dict[str, int],
+                 index_path: str = "output/watch_index.json",
+                 output_root: str = "output",
+                 poll_interval: float = 2.0,
+                 stable_time: float = 5.0,
+                 workers: int = 1,
+                 threads: int = 2,
+                 options: Optional[Dict] = None):
+        """
+        Initialize the watcher.
+        
+        Args:
+            folders: Folder path -> priority (lower is processed first)
+            index_path: Content index JSON file
+            output_root: Outputs go to <output_root>/<folder name>/<video stem>_<hash prefix>
+            poll_interval: Seconds between folder scans
+            stable_time: Seconds a file's size and modification time must stay unchanged
+                         before it counts as completely written
+            workers: Videos processed at the same time
+            threads: Library threads per worker
+            options: Processing options passed to batch_process.process_one
+        """
+        self.folders = {Path(folder): priority for folder, priority in folders.items()}
+        self.index = ContentIndex(index_path)
+        self.output_root = Path(output_root)
+        self.poll_interval = poll_interval
+        self.stable_time = stable_time
+        self.workers = max(1, workers)
+        self.threads = threads
+        self.options = options or {}
+        
+        # path -> (size, mtime, time first seen with that size/mtime)
+        self.pending_files: Dict[Path, Tuple[int, float, float]] = {}
+        # (size, mtime) of paths already handled, so they are not looked at again
+        self.handled: Dict[Path, Tuple[int, float]] = {}
+        
+        # Priority queue of (priority, sequence, sha256)
+        self.queue: List[Tuple[int, int, str]] = []
+        self.sequence = 0
+        self.running: Dict[Future, str] = {}
+        
+        # Statistics
+        self.duplicates_skipped = 0
+        self.processed = 0
+        self.failed = 0
+    
+    def scan(self) -> int:
+        """
+        Scan all folders once and queue files that finished writing.
+        
+        Returns:
+            Number of newly queued files
+        """
+        now = time.time()
+        queued = 0
+        for folder, priority in self.folders.items():
+            if not folder.exists():
+                continue
+            for path in sorted(folder.iterdir()):
+                if not self._is_candidate(path):
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue  # Removed or renamed meanwhile
+                signature = (stat.st_size, stat.st_mtime)
+                if self.handled.get(path) == signature:
+                    continue
+                
+                # Size-stable check: unchanged for stable_time seconds
+                previous = self.pending_files.get(path)
+                if previous is None or previous[:2] != signature or stat.st_size == 0:
+                    self.pending_files[path] = (*signature, now)
+                    continue
+                if now - previous[2] < self.stable_time:
+                    continue
+                
+                del self.pending_files[path]
+                self.handled[path] = signature
+                queued += self._ingest(path, stat.st_size, stat.st_mtime, priority)
+        
+        # Forget files that disappeared while being written
+        for path in [p for p in self.pending_files if not p.exists()]:
+            del self.pending_files[path]
+        
+        if queued:
+            self.index.save()
+        return queued
+    
+    def _is_candidate(self, path: Path) -> bool:
+        """Video files that are not hidden or partial downloads."""
+        return (path.is_file() and not path.name.startswith('.')
+                and path.suffix.lower() not in PARTIAL_SUFFIXES
+                and path.suffix.lower() in VIDEO_EXTENSIONS)
+    
+    def _ingest(self, path: Path, size: int, mtime: float, priority: int) -> int:
+        """Hash a finished file and queue it unless its content is known."""
+        sha256 = self.index.cached_hash(path, size, mtime)
+        if sha256 is None:
+            sha256 = file_sha256(path)
+            self.index.remember_path(path, size, mtime, sha256)
+        
+        entry = self.index.get(sha256)
+        if entry is not None and entry['status'] not in ('failed', 'interrupted'):
+            if str(path) != entry['path'] and str(path) not in entry['duplicates']:
+                entry['duplicates'].append(str(path))
+                self.duplicates_skipped += 1
+                print(f"⏭️  {path.name}: same content as {Path(entry['path']).name} ({entry['status']}), skipped")
+            return 0
+        
+        if entry is not None:
+            # Retry content that failed or was interrupted, possibly under the new name
+            entry.update({'path': str(path), 'status': 'queued', 'priority': priority})
+        else:
+            output_dir = self.output_root / path.parent.name / f"{path.stem}_{sha256[:8]}"
+            entry = self.index.add(sha256, path, size, priority, output_dir)
+        
+        heapq.heappush(self.queue, (priority, self.sequence, sha256))
+        self.sequence += 1
+        print(f"📥 Queued {path.name} (priority {priority}, {size / 1e6:.1f} MB)")
+        return 1
+    
+    def _dispatch(self, executor: ProcessPoolExecutor):
+        """Start queued jobs, highest priority first, while workers are free."""
+        while self.queue and len(self.running) < self.workers:
+            _, _, sha256 = heapq.heappop(self.queue)
+            entry = self.index.get(sha256)
+            entry['status'] = 'processing'
+            entry['started'] = datetime.now().isoformat()
+            future = executor.submit(process_one, entry['path'], entry['output_dir'], self.options)
+            self.running[future] = sha256
+            print(f"⚙️  Processing {Path(entry['path']).name}")
+        self.index.save()
+    
+    def _collect(self):
+        """Record finished jobs."""
+        finished = [future for future in self.running if future.done()]
+        for future in finished:
+            sha256 = self.running.pop(future)
+            entry = self.index.get(sha256)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+            
+            entry['finished'] = datetime.now().isoformat()
+            if result['status'] == 'done':
+                entry['status'] = 'done'
+                entry['realtime_factor'] = round(result['realtime_factor'], 3)
+                self.processed += 1
+                print(f"✅ {Path(entry['path']).name}: {result['duration']:.0f}s of video in "
+                      f"{result['wall_time']:.0f}s -> {entry['output_dir']}")
+            else:
+                entry['status'] = 'failed'
+                entry['error'] = result.get('error')
+                self.failed += 1
+                print(f"❌ {Path(entry['path']).name}: {entry['error']}")
+        if finished:
+            self.index.save()
+    
+    def run(self, once: bool = False):
+        """
+        Watch until interrupted.
+        
+        Args:
+            once: Process the files present now (after they are stable), then return
+        """
+        # Inherited by the spawned workers before they import numpy/torch
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = str(self.threads)
+        
+        # Interrupted or failed content found again on disk is queued by scan()
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                 initializer=init_worker, initargs=(self.threads,)) as executor:
+            try:
+                while True:
+                    self.scan()
+                    self._collect()
+                    self._dispatch(executor)
+                    
+                    if once and not self.pending_files and not self.queue and not self.running:
+                        break
+                    time.sleep(self.poll_interval)
+            except KeyboardInterrupt:
+                print("\n🛑 Stopping watcher - running jobs are finished first")
+                self.queue.clear()
+                for future in self.running:
+                    future.result()
+                self._collect()
+    
+    def get_statistics(self) -> Dict:
+        """Get queue and deduplication counts."""
+        return {
+            'processed': self.processed,
+            'failed': self.failed,
+            'duplicates_skipped': self.duplicates_skipped,
+            'queued': len(self.queue),
+            'running': len(self.running),
+            'known_content': len(self.index.files)
+        }
+
+
+def parse_folder(value: str) -> Tuple[str, int]:
+    """Parse FOLDER[:PRIORITY]."""
+    folder, _, priority = value.rpartition(':')
+    if folder and priority.lstrip('-').isdigit():
+        return folder, int(priority)
+    return value, 10
+
+
+def main():
+    """Main execution function for the watch-folder service."""
+    parser = argparse.ArgumentParser(description="Watch input folders and process new videos")
+    parser.add_argument("--folder", action="append", type=parse_folder, default=None,
+                        help="Folder to watch as FOLDER[:PRIORITY], lower priority first "
+                             "(default: input/demoVideo:0 and input/processVideo:10)")
+    parser.add_argument("--index", type=str, default="output/watch_index.json", help="Content index file")
+    parser.add_argument("--output-root", type=str, default="output", help="Root directory for outputs")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between scans")
+    parser.add_argument("--stable-time", type=float, default=5.0,
+                        help="Seconds a file must stay unchanged before it is processed")
+    parser.add_argument("--workers", type=int, default=1, help="Videos processed at the same time")
+    parser.add_argument("--threads", type=int, default=2, help="Library threads per worker")
+    parser.add_argument("--once", action="store_true", help="Process the current files and exit")
+    parser.add_argument("--save-video", action="store_true", help="Render an annotated video per input")
+    parser.add_argument("--all-keypoints", action="store_true", help="Store all 17 keypoints in the pose JSON")
+    parser.add_argument("--auto-imgsz", action="store_true",
+                        help="Choose the pose model input size per video resolution (cached)")
+    
+    args = parser.parse_args()
+    
+    folders = dict(args.folder) if args.folder else DEFAULT_FOLDERS
+    options = {
+        'target_fps': 30,
+        'pose_interval': 1,
+        'adaptive_rate': False,
+        'auto_imgsz': args.auto_imgsz,
+        'use_motion_gate': True,
+        'segment_rallies': True,
+        'smooth_keypoints': True,
+        'enable_timing': True,
+        'thumbnail_interval': 2.0,
+        'save_video': args.save_video,
+        'all_keypoints': args.all_keypoints
+    }
+    
+    print("="*60)
+    print("🏓 PaddleCoach - Watch Folder Service")
+    print("="*60)
+    for folder, priority in sorted(folders.items(), key=lambda item: item[1]):
+        print(f"  👀 {folder} (priority {priority})")
+    print(f"  Index: {args.index}")
+    print(f"  Workers: {args.workers} x {args.threads} threads")
+    print("-"*60)
+    
+    watcher = FolderWatcher(folders, index_path=args.index, output_root=args.output_root,
+                            poll_interval=args.interval, stable_time=args.stable_time,
+                            workers=args.workers, threads=args.threads, options=options)
+    watcher.run(once=args.once)
+    
+    stats = watcher.get_statistics()
+    print(f"\nProcessed: {stats['processed']} | Failed: {stats['failed']} | "
+          f"Duplicates skipped: {stats['duplicates_skipped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Import-time and startup benchmark.
+Runs each import and CLI `--help` in a fresh interpreter, reports the wall time
+(best of several runs) and which heavy libraries got loaded, and fails if an
+entry point loads a library it must not (e.g. the Flask server loading torch).
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeats 10 --output output/benchmarks/import_time.json
+"""
+from typing import Dict, List
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parent.parent
+SRC_DIR = REPO_ROOT / "src"
+
+HEAVY_MODULES = ["torch", "ultralytics", "pandas", "scipy", "cv2", "flask"]
+
+# name -> (python arguments, heavy modules that must not be loaded)
+TARGETS = {
+    "python (interpreter only)": (["-c", "pass"], []),
+    "import vision": (["-c", "import vision"], ["torch", "ultralytics", "pandas", "scipy", "cv2"]),
+    "import vision.timing": (["-c", "import vision.timing"], ["torch", "ultralytics", "pandas", "scipy", "cv2"]),
+    "import vision.ball_tracker": (["-c", "import vision.ball_tracker"], ["torch", "ultralytics", "scipy"]),
+    "import vision.video_processor": (["-c", "import vision.video_processor"], ["torch", "ultralytics", "pandas", "scipy"]),
+    "import vision.game_analyzer": (["-c", "import vision.game_analyzer"], ["torch", "ultralytics", "scipy"]),
+    "flask app (import app)": (["-c", "import app"], ["torch", "ultralytics", "pandas", "scipy", "cv2"]),
+    "video_processor.py --help": ([str(SRC_DIR / "vision" / "video_processor.py"), "--help"],
+                                  ["torch", "ultralytics", "pandas", "scipy"]),
+    "overlay_renderer.py --help": ([str(SRC_DIR / "vision" / "overlay_renderer.py"), "--help"],
+                                   ["torch", "ultralytics", "pandas", "scipy"]),
+    "batch_process.py --help": ([str(REPO_ROOT / "backend" / "batch_process.py"), "--help"],
+                                ["torch", "ultralytics", "pandas", "scipy", "cv2"]),
+    "watch_folder.py --help": ([str(REPO_ROOT / "backend" / "watch_folder.py"), "--help"],
+                               ["torch", "ultralytics", "pandas", "scipy", "cv2"]),
+    "run_benchmarks.py --help": ([str(REPO_ROOT / "benchmarks" / "run_benchmarks.py"), "--help"],
+                                 ["torch", "ultralytics", "pandas", "scipy"]),
+    "quantize_models.py --help": ([str(REPO_ROOT / "benchmarks" / "quantize_models.py"), "--help"],
+                                  ["torch", "ultralytics", "pandas", "scipy"])
+}
+
+IMPORT_LINE = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def run_target(args: List[str], repeats: int) -> Dict:
+    """
+    Time one entry point in fresh interpreters.
+    
+    Args:
+        args: Arguments after the python executable
+        repeats: Timed runs (best is reported)
+    
+    Returns:
+        Wall times, loaded heavy modules and their cumulative import times
+    """
+    env = {**os.environ, "PYTHONPATH": str(SRC_DIR)}
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable] + args, cwd=REPO_ROOT, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        times.append(time.perf_counter() - start)
+    
+    # One more run with -X importtime to see what was imported
+    traced = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=REPO_ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    heavy = {}
+    for match in IMPORT_LINE.finditer(traced.stderr):
+        cumulative_us, name = match.groups()
+        if name in HEAVY_MODULES:
+            heavy[name] = max(heavy.get(name, 0.0), int(cumulative_us) / 1e6)
+    
+    return {
+        "best_s": round(min(times), 4),
+        "median_s": round(sorted(times)[len(times) // 2], 4),
+        "returncode": completed.returncode,
+        "heavy_modules": {name: round(seconds, 4) for name, seconds in sorted(heavy.items())},
+        "error": completed.stderr.strip().splitlines()[-1] if completed.returncode != 0 and completed.stderr else None
+    }
+
+
+def main():
+    """Run the import-time benchmark."""
+    parser = argparse.ArgumentParser(description="Measure import and CLI startup times")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per entry point (best is reported)")
+    parser.add_argument("--output", type=str, default="output/benchmarks/import_time.json", help="Results JSON")
+    
+    args = parser.parse_args()
+    
+    print("="*60)
+    print("🏓 PaddleCoach - Import Time Benchmark")
+    print("="*60)
+    print(f"\n{'Entry point':<32} {'Best ms':>9} {'Median ms':>10}  Heavy modules loaded")
+    print("-"*90)
+    
+    results = {}
+    violations = []
+    for name, (target_args, forbidden) in TARGETS.items():
+        result = run_target(target_args, args.repeats)
+        results[name] = result
+        loaded = ", ".join(result["heavy_modules"]) or "-"
+        print(f"{name:<32} {1000 * result['best_s']:>9.1f} {1000 * result['median_s']:>10.1f}  {loaded}")
+        
+        if result["returncode"] != 0:
+            violations.append(f"{name}: exited with {result['returncode']} ({result['error']})")
+        for module in forbidden:
+            if module in result["heavy_modules"]:
+                violations.append(f"{name}: loads {module} "
+                                  f"({1000 * result['heavy_modules'][module]:.0f} ms)")
+    
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump({"python": sys.version.split()[0], "entry_points": results, "violations": violations}, f, indent=2)
+    print(f"\n💾 Results saved: {output_path}")
+    
+    if violations:
+        print("\n❌ Heavy imports on startup paths:")
+        for message in violations:
+            print(f"   {message}")
+        sys.exit(1)
+    print("\n✅ No heavy imports on startup paths")
+
+
+if __name__ == "__main__":
+    main()
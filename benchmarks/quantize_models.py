@@ -0,0 +1,610 @@
+"""
+INT8 quantization workflow for the pose and ball models.
+Calibrates on frames sampled from our own videos, exports INT8 models and
+compares them with the FP32 weights on held-out clips of the same videos:
+per-keypoint error, ball detection recall, shots detected and frames per second.
+The FP32 outputs are the reference, so no labelled data is needed.
+
+Formats:
+    openvino  ultralytics export with NNCF post-training quantization (needs openvino, nncf)
+    onnx      ultralytics ONNX export + onnxruntime static QDQ quantization (needs onnx, onnxruntime)
+
+Usage:
+    python benchmarks/quantize_models.py --videos input/demoVideo
+    python benchmarks/quantize_models.py --videos match1.mp4 match2.mp4 --formats onnx --imgsz 480
+    python benchmarks/quantize_models.py --videos input/demoVideo --skip-export \\
+        --pose-candidates output/quantization/models/yolo11n-pose_int8_openvino_model
+"""
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+import argparse
+import json
+import shutil
+import sys
+import cv2
+import numpy as np
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.append(str(BENCH_DIR.parent / "src"))
+
+from models.pose_data import PoseData
+from vision.timing import StageTimer
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".m4v"}
+FORMATS = ["openvino", "onnx"]
+
+# COCO keypoint flip pairs, needed in the calibration dataset YAML of a pose model
+COCO_FLIP_IDX = [0, 2, 1, 4, 3, 6, 5, 8, 7, 10, 9, 12, 11, 14, 13, 16, 15]
+
+
+def collect_videos(paths: List[str]) -> List[Path]:
+    """Expand directories into the videos they contain."""
+    videos = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            videos.extend(sorted(p for p in path.iterdir() if p.suffix.lower() in VIDEO_EXTENSIONS))
+        elif path.exists():
+            videos.append(path)
+        else:
+            print(f"⚠️  Not found: {path}")
+    return videos
+
+
+def sample_frames(video_paths: List[Path], calibration_frames: int,
+                  eval_frames: int) -> Tuple[List[np.ndarray], List[Dict]]:
+    """
+    Split each video into a held-out evaluation clip and calibration frames.
+    
+    The evaluation clip is a contiguous run of frames from the middle of the video
+    (shot detection needs consecutive frames); calibration frames are spread evenly
+    over the rest, so no model is evaluated on the frames it was calibrated with.
+    
+    Args:
+        video_paths: Videos to sample
+        calibration_frames: Calibration frames in total (split across videos)
+        eval_frames: Length of the evaluation clip per video
+    
+    Returns:
+        (calibration frames, evaluation clips with 'video', 'fps', 'start_frame', 'frames')
+    """
+    calibration = []
+    clips = []
+    per_video = max(1, calibration_frames // max(1, len(video_paths)))
+    
+    for video_path in video_paths:
+        cap = cv2.VideoCapture(str(video_path))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        if total <= 0:
+            print(f"⚠️  Cannot read {video_path}, skipped")
+            cap.release()
+            continue
+        
+        clip_length = min(eval_frames, total // 2)
+        clip_start = (total - clip_length) // 2
+        clip_end = clip_start + clip_length
+        
+        outside_clip = np.concatenate([np.arange(0, clip_start), np.arange(clip_end, total)])
+        picks = set(outside_clip[np.linspace(0, len(outside_clip) - 1,
+                                             min(per_video, len(outside_clip))).astype(int)].tolist())
+        
+        # One sequential pass: seeking to every sample is much slower on long-GOP video
+        clip = {'video': str(video_path), 'fps': fps, 'start_frame': clip_start, 'frames': []}
+        frame_index = 0
+        while frame_index < total:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if clip_start <= frame_index < clip_end:
+                clip['frames'].append(frame)
+            elif frame_index in picks:
+                calibration.append(frame)
+            frame_index += 1
+        cap.release()
+        
+        clips.append(clip)
+        print(f"   {video_path.name}: {len(clip['frames'])} evaluation frames from frame {clip_start}, "
+              f"{len(picks)} calibration frames")
+    
+    return calibration, clips
+
+
+def write_calibration_dataset(frames: List[np.ndarray], output_dir: Path,
+                              names: Dict[int, str], task: str) -> Path:
+    """
+    Save calibration frames as an unlabelled ultralytics dataset.
+    
+    Args:
+        frames: Calibration frames (BGR)
+        output_dir: Dataset directory
+        names: Class names of the model being quantized
+        task: Model task ("pose" or "detect")
+    
+    Returns:
+        Path to the dataset YAML
+    """
+    image_dir = output_dir / "images"
+    image_dir.mkdir(parents=True, exist_ok=True)
+    for i, frame in enumerate(frames):
+        cv2.imwrite(str(image_dir / f"calib_{i:05d}.jpg"), frame)
+    
+    # Minimal YAML by hand (only flat values and lists); calibration needs no labels
+    lines = [f"path: {output_dir.resolve()}", "train: images", "val: images", "names:"]
+    lines += [f"  {class_id}: {json.dumps(name)}" for class_id, name in sorted(names.items())]
+    if task == "pose":
+        lines += ["kpt_shape: [17, 3]", f"flip_idx: {COCO_FLIP_IDX}"]
+    yaml_path = output_dir / "data.yaml"
+    yaml_path.write_text("\n".join(lines) + "\n")
+    return yaml_path
+
+
+def letterbox(frame: np.ndarray, imgsz: int) -> np.ndarray:
+    """Resize and pad a BGR frame the way ultralytics does, returning a 1x3xHxW float32 RGB tensor."""
+    height, width = frame.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_width, new_height = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - new_height) // 2
+    left = (imgsz - new_width) // 2
+    canvas[top:top + new_height, left:left + new_width] = resized
+    return (canvas[:, :, ::-1].transpose(2, 0, 1)[None] / 255.0).astype(np.float32)
+
+
+def export_openvino_int8(model_path: str, data_yaml: Path, imgsz: int, models_dir: Path) -> Path:
+    """
+    Export an INT8 OpenVINO model with NNCF post-training quantization.
+    
+    Returns:
+        Path to the exported model directory
+    """
+    from ultralytics import YOLO
+    
+    exported = Path(YOLO(model_path).export(format="openvino", int8=True, data=str(data_yaml),
+                                            imgsz=imgsz, fraction=1.0, verbose=False))
+    destination = models_dir / exported.name
+    if destination.exists():
+        shutil.rmtree(destination)
+    shutil.move(str(exported), str(destination))
+    return destination
+
+
+def export_onnx_int8(model_path: str, frames: List[np.ndarray], imgsz: int, models_dir: Path,
+                     quantize_head: bool = False) -> Path:
+    """
+    Export an ONNX model and quantize it statically with onnxruntime.
+    
+    Weights are quantized per channel; activation ranges come from the calibration
+    frames. The detection head (box/keypoint decoding) stays FP32 unless
+    quantize_head is set: it turns small activation errors into pixel offsets.
+    
+    Returns:
+        Path to the INT8 ONNX file
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from ultralytics import YOLO
+    
+    model = YOLO(model_path)
+    head_prefix = f"/model.{len(model.model.model) - 1}/"
+    fp32_path = Path(model.export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True, verbose=False))
+    
+    fp32_model = onnx.load(str(fp32_path))
+    input_name = fp32_model.graph.input[0].name
+    excluded = [] if quantize_head else [node.name for node in fp32_model.graph.node
+                                         if node.name.startswith(head_prefix)]
+    
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = iter(frames)
+        
+        def get_next(self):
+            frame = next(self.frames, None)
+            return None if frame is None else {input_name: letterbox(frame, imgsz)}
+    
+    int8_path = models_dir / f"{fp32_path.stem}_int8.onnx"
+    quantize_static(str(fp32_path), str(int8_path), FrameReader(),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    nodes_to_exclude=excluded)
+    
+    # ultralytics reads task, names, stride and imgsz from the ONNX metadata
+    int8_model = onnx.load(str(int8_path))
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, str(int8_path))
+    
+    shutil.move(str(fp32_path), str(models_dir / fp32_path.name))
+    return int8_path
+
+
+def run_pose_model(model_path: str, clips: List[Dict], device: str) -> Dict:
+    """
+    Run PlayerTracker with a pose model on the evaluation clips.
+    
+    Returns:
+        Dictionary with per-clip poses ({frame: {player_id: PoseData}}), per-clip pose
+        sequences per player and the timing statistics
+    """
+    from vision.player_tracker import PlayerTracker
+    from vision.model_registry import registry
+    
+    timer = StageTimer("quantization")
+    poses, sequences = [], []
+    for clip in clips:
+        tracker = PlayerTracker(model_name=model_path, use_half=False, device=device)
+        clip_poses = {}
+        clip_sequences = {}
+        for i, frame in enumerate(clip['frames']):
+            frame_number = clip['start_frame'] + i
+            with timer.span("pose"):
+                pose_data_list = tracker.process_frame(frame, frame_number, frame_number / clip['fps'])
+            clip_poses[frame_number] = {pose.player_id: pose for pose in pose_data_list}
+            for pose in pose_data_list:
+                clip_sequences.setdefault(pose.player_id, []).append(pose)
+        poses.append(clip_poses)
+        sequences.append(clip_sequences)
+    
+    registry.evict(model_path)
+    return {'poses': poses, 'sequences': sequences, 'timing': timer.get_statistics().get("pose", {})}
+
+
+def run_ball_model(model_path: str, clips: List[Dict], device: str) -> Dict:
+    """
+    Run BallTracker.detect (full frame, no filtering) on the evaluation clips.
+    
+    Returns:
+        Dictionary with per-clip detections ({frame: (x, y) or None}) and the timing statistics
+    """
+    from vision.ball_tracker import BallTracker
+    from vision.model_registry import registry
+    
+    timer = StageTimer("quantization")
+    detections = []
+    tracker = BallTracker(model_path=model_path, use_half=False, device=device)
+    for clip in clips:
+        clip_detections = {}
+        for i, frame in enumerate(clip['frames']):
+            frame_number = clip['start_frame'] + i
+            with timer.span("ball"):
+                ball = tracker.detect(frame, frame_number, frame_number / clip['fps'])
+            clip_detections[frame_number] = (ball.x, ball.y) if ball is not None else None
+        detections.append(clip_detections)
+    
+    registry.evict(model_path)
+    return {'detections': detections, 'timing': timer.get_statistics().get("ball", {})}
+
+
+def compare_keypoints(reference: List[Dict], candidate: List[Dict], min_confidence: float) -> Dict:
+    """
+    Per-keypoint pixel error of a candidate against the reference poses.
+    
+    Only keypoints visible (confidence >= min_confidence) in both runs are compared;
+    visibility disagreements are counted separately.
+    """
+    names = PoseData.get_coco_keypoint_names()
+    errors = {name: [] for name in names}
+    visibility_mismatches = {name: 0 for name in names}
+    reference_players = 0
+    matched_players = 0
+    
+    for reference_clip, candidate_clip in zip(reference, candidate):
+        for frame_number, reference_poses in reference_clip.items():
+            candidate_poses = candidate_clip.get(frame_number, {})
+            for player_id, reference_pose in reference_poses.items():
+                reference_players += 1
+                candidate_pose = candidate_poses.get(player_id)
+                if candidate_pose is None:
+                    continue
+                matched_players += 1
+                for name in names:
+                    a = reference_pose.all_keypoints.get(name)
+                    b = candidate_pose.all_keypoints.get(name)
+                    if a is None or b is None:
+                        continue
+                    a_visible = a.confidence >= min_confidence
+                    b_visible = b.confidence >= min_confidence
+                    if a_visible and b_visible:
+                        errors[name].append(float(np.hypot(a.x - b.x, a.y - b.y)))
+                    elif a_visible != b_visible:
+                        visibility_mismatches[name] += 1
+    
+    per_keypoint = {}
+    for name in names:
+        values = np.array(errors[name])
+        per_keypoint[name] = {
+            'mean_px': round(float(values.mean()), 2) if len(values) else None,
+            'p95_px': round(float(np.percentile(values, 95)), 2) if len(values) else None,
+            'compared': len(values),
+            'visibility_mismatches': visibility_mismatches[name]
+        }
+    
+    all_errors = np.concatenate([np.array(v) for v in errors.values()]) if matched_players else np.array([])
+    wrist_errors = np.array(errors["left_wrist"] + errors["right_wrist"])
+    return {
+        'player_match_rate': round(matched_players / reference_players, 4) if reference_players else None,
+        'mean_px': round(float(all_errors.mean()), 2) if len(all_errors) else None,
+        'wrist_mean_px': round(float(wrist_errors.mean()), 2) if len(wrist_errors) else None,
+        'wrist_p95_px': round(float(np.percentile(wrist_errors, 95)), 2) if len(wrist_errors) else None,
+        'per_keypoint': per_keypoint
+    }
+
+
+def compare_shots(reference: List[Dict], candidate: List[Dict], tolerance: int) -> Dict:
+    """
+    Run ShotDetector on both pose sequences and match shots by player and peak frame.
+    
+    Args:
+        reference: Per-clip {player_id: [PoseData]} from the FP32 model
+        candidate: Per-clip {player_id: [PoseData]} from the candidate model
+        tolerance: Largest peak frame difference for two shots to match
+    """
+    from vision.shot_detector import ShotDetector
+    
+    detector = ShotDetector()
+    reference_count = candidate_count = matched = 0
+    offsets = []
+    for reference_clip, candidate_clip in zip(reference, candidate):
+        for player_id in set(reference_clip) | set(candidate_clip):
+            reference_shots = detector.detect_shots(reference_clip.get(player_id, []))
+            candidate_shots = detector.detect_shots(candidate_clip.get(player_id, []))
+            reference_count += len(reference_shots)
+            candidate_count += len(candidate_shots)
+            
+            unmatched = [shot.peak_frame for shot in candidate_shots]
+            for shot in reference_shots:
+                if not unmatched:
+                    break
+                nearest = min(unmatched, key=lambda peak: abs(peak - shot.peak_frame))
+                if abs(nearest - shot.peak_frame) <= tolerance:
+                    unmatched.remove(nearest)
+                    matched += 1
+                    offsets.append(abs(nearest - shot.peak_frame))
+    
+    return {
+        'reference_shots': reference_count,
+        'shots': candidate_count,
+        'matched': matched,
+        'missed': reference_count - matched,
+        'extra': candidate_count - matched,
+        'match_rate': round(matched / reference_count, 4) if reference_count else None,
+        'mean_peak_offset_frames': round(float(np.mean(offsets)), 2) if offsets else None
+    }
+
+
+def compare_ball(reference: List[Dict], candidate: List[Dict], radius: float) -> Dict:
+    """Ball detection recall and extra detections of a candidate against the reference detections."""
+    reference_count = candidate_count = matched = 0
+    offsets = []
+    for reference_clip, candidate_clip in zip(reference, candidate):
+        for frame_number, reference_position in reference_clip.items():
+            candidate_position = candidate_clip.get(frame_number)
+            reference_count += reference_position is not None
+            candidate_count += candidate_position is not None
+            if reference_position is not None and candidate_position is not None:
+                distance = float(np.hypot(reference_position[0] - candidate_position[0],
+                                          reference_position[1] - candidate_position[1]))
+                if distance <= radius:
+                    matched += 1
+                    offsets.append(distance)
+    
+    return {
+        'reference_detections': reference_count,
+        'detections': candidate_count,
+        'recall': round(matched / reference_count, 4) if reference_count else None,
+        'extra_detections': candidate_count - matched,
+        'mean_offset_px': round(float(np.mean(offsets)), 2) if offsets else None
+    }
+
+
+def speed_summary(timing: Dict, reference_timing: Optional[Dict]) -> Dict:
+    """Frames per second and latency of one model, with the speedup over FP32."""
+    fps = timing['count'] / timing['total_s'] if timing.get('total_s') else 0.0
+    summary = {'fps': round(fps, 2), 'p50_ms': timing.get('p50_ms'), 'p95_ms': timing.get('p95_ms')}
+    if reference_timing is not None and reference_timing.get('total_s'):
+        reference_fps = reference_timing['count'] / reference_timing['total_s']
+        summary['speedup'] = round(fps / reference_fps, 2) if reference_fps > 0 else None
+    return summary
+
+
+def check_tolerances(entry: Dict, args) -> List[str]:
+    """Reasons a candidate is not good enough for ShotDetector (empty list = acceptable)."""
+    failures = []
+    keypoints = entry.get('keypoints')
+    if keypoints is not None:
+        if keypoints['wrist_mean_px'] is None or keypoints['wrist_mean_px'] > args.max_wrist_error:
+            failures.append(f"wrist error {keypoints['wrist_mean_px']} px > {args.max_wrist_error} px")
+        if keypoints['player_match_rate'] is not None and keypoints['player_match_rate'] < args.min_player_match:
+            failures.append(f"player match rate {keypoints['player_match_rate']:.1%} < {args.min_player_match:.0%}")
+    shots = entry.get('shots')
+    if shots is not None and shots['match_rate'] is not None and shots['match_rate'] < args.min_shot_match:
+        failures.append(f"shot match rate {shots['match_rate']:.1%} < {args.min_shot_match:.0%}")
+    ball = entry.get('ball')
+    if ball is not None and ball['recall'] is not None and ball['recall'] < args.min_ball_recall:
+        failures.append(f"ball recall {ball['recall']:.1%} < {args.min_ball_recall:.0%}")
+    return failures
+
+
+def quantize_and_compare(kind: str, model_path: str, candidates: List[str], calibration: List[np.ndarray],
+                         clips: List[Dict], output_dir: Path, args) -> Dict:
+    """
+    Export INT8 versions of one model (unless given) and compare them with the FP32 weights.
+    
+    Args:
+        kind: "pose" or "ball"
+        model_path: FP32 weights
+        candidates: Already exported models to compare (skips the export)
+        calibration: Calibration frames
+        clips: Evaluation clips
+        output_dir: Report directory (exports go to output_dir/models)
+        args: Command line arguments
+    
+    Returns:
+        Report section: the FP32 reference and one entry per INT8 model
+    """
+    models_dir = output_dir / "models"
+    models_dir.mkdir(parents=True, exist_ok=True)
+    run = run_pose_model if kind == "pose" else run_ball_model
+    
+    section = {'reference': model_path, 'models': {}}
+    
+    if not candidates and not args.skip_export:
+        from ultralytics import YOLO
+        
+        probe = YOLO(model_path)
+        data_yaml = write_calibration_dataset(calibration, output_dir / f"calibration_{kind}",
+                                              probe.names, probe.task)
+        for fmt in args.formats:
+            print(f"\n🔧 Exporting {model_path} to INT8 {fmt} ({len(calibration)} calibration frames)...")
+            try:
+                if fmt == "openvino":
+                    exported = export_openvino_int8(model_path, data_yaml, args.imgsz, models_dir)
+                else:
+                    exported = export_onnx_int8(model_path, calibration, args.imgsz, models_dir,
+                                                quantize_head=args.quantize_head)
+            except Exception as e:
+                section['models'][f"int8_{fmt}"] = {'error': f"{type(e).__name__}: {str(e).strip()}"}
+                print(f"❌ Export failed: {e}")
+                continue
+            candidates.append(str(exported))
+            print(f"✅ Exported: {exported}")
+    
+    print(f"\n▶️  Running FP32 {kind} model: {model_path}")
+    reference = run(model_path, clips, args.device)
+    section['fp32'] = {'model': model_path, 'speed': speed_summary(reference['timing'], None)}
+    
+    for candidate in candidates:
+        print(f"\n▶️  Running {kind} candidate: {candidate}")
+        try:
+            outputs = run(candidate, clips, args.device)
+        except Exception as e:
+            section['models'][candidate] = {'error': f"{type(e).__name__}: {str(e).strip()}"}
+            print(f"❌ Evaluation failed: {e}")
+            continue
+        
+        entry = {'model': candidate, 'speed': speed_summary(outputs['timing'], reference['timing'])}
+        if kind == "pose":
+            entry['keypoints'] = compare_keypoints(reference['poses'], outputs['poses'], args.min_confidence)
+            entry['shots'] = compare_shots(reference['sequences'], outputs['sequences'], args.shot_tolerance)
+        else:
+            entry['ball'] = compare_ball(reference['detections'], outputs['detections'], args.ball_radius)
+        entry['failures'] = check_tolerances(entry, args)
+        section['models'][candidate] = entry
+    
+    return section
+
+
+def print_report(report: Dict):
+    """Print the accuracy-vs-speed table."""
+    print("\n" + "="*60)
+    print("📊 INT8 vs FP32")
+    print("="*60)
+    
+    for kind in ("pose", "ball"):
+        section = report['sections'].get(kind)
+        if section is None:
+            continue
+        print(f"\n{kind.upper()} (reference: {section['reference']}, {section['fp32']['speed']['fps']:.1f} fps)")
+        for name, entry in section['models'].items():
+            if 'error' in entry:
+                print(f"   ❌ {name}: {entry['error'][:100]}")
+                continue
+            speed = entry['speed']
+            print(f"   {Path(name).name}: {speed['fps']:.1f} fps ({speed.get('speedup') or 0:.2f}x)")
+            if 'keypoints' in entry:
+                keypoints, shots = entry['keypoints'], entry['shots']
+                print(f"      keypoints: mean {keypoints['mean_px']} px, wrists {keypoints['wrist_mean_px']} px "
+                      f"(p95 {keypoints['wrist_p95_px']} px), players matched {keypoints['player_match_rate']}")
+                print(f"      shots: {shots['shots']} vs {shots['reference_shots']} FP32, "
+                      f"{shots['matched']} matched, {shots['missed']} missed, {shots['extra']} extra")
+            if 'ball' in entry:
+                ball = entry['ball']
+                print(f"      ball: recall {ball['recall']}, {ball['extra_detections']} extra, "
+                      f"mean offset {ball['mean_offset_px']} px")
+            if entry['failures']:
+                print(f"      ⚠️  Outside tolerances: {'; '.join(entry['failures'])}")
+            else:
+                print("      ✅ Within tolerances")
+
+
+def main():
+    """Run the quantization workflow."""
+    parser = argparse.ArgumentParser(description="Export INT8 models and compare them with FP32")
+    parser.add_argument("--videos", nargs="+", required=True, help="Videos or directories to calibrate and evaluate on")
+    parser.add_argument("--pose-model", type=str, default="yolo11n-pose.pt", help="FP32 pose model")
+    parser.add_argument("--ball-model", type=str, default="best.pt", help="FP32 ball model")
+    parser.add_argument("--models", type=str, default="pose,ball", help="Comma-separated models to quantize (pose, ball)")
+    parser.add_argument("--formats", type=str, default="openvino,onnx", help=f"INT8 formats ({', '.join(FORMATS)})")
+    parser.add_argument("--imgsz", type=int, default=640, help="Export input size")
+    parser.add_argument("--device", type=str, default="cpu", help="Inference device for the comparison")
+    parser.add_argument("--calibration-frames", type=int, default=300, help="Calibration frames over all videos")
+    parser.add_argument("--eval-frames", type=int, default=600, help="Evaluation clip length per video (frames)")
+    parser.add_argument("--quantize-head", action="store_true", help="Also quantize the detection head (ONNX)")
+    parser.add_argument("--skip-export", action="store_true", help="Only compare the given candidates")
+    parser.add_argument("--pose-candidates", nargs="*", default=[], help="Exported pose models to compare")
+    parser.add_argument("--ball-candidates", nargs="*", default=[], help="Exported ball models to compare")
+    parser.add_argument("--min-confidence", type=float, default=0.5, help="Keypoint visibility threshold")
+    parser.add_argument("--shot-tolerance", type=int, default=5, help="Peak frame tolerance for matching shots")
+    parser.add_argument("--ball-radius", type=float, default=10.0, help="Ball match radius (pixels)")
+    parser.add_argument("--max-wrist-error", type=float, default=5.0, help="Acceptable mean wrist error (pixels)")
+    parser.add_argument("--min-player-match", type=float, default=0.95, help="Acceptable player match rate")
+    parser.add_argument("--min-shot-match", type=float, default=0.9, help="Acceptable shot match rate")
+    parser.add_argument("--min-ball-recall", type=float, default=0.9, help="Acceptable ball recall")
+    parser.add_argument("--output", type=str, default="output/quantization", help="Output directory")
+    
+    args = parser.parse_args()
+    
+    args.formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in args.formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"Unknown formats: {', '.join(unknown)} (available: {', '.join(FORMATS)})")
+    kinds = [k.strip() for k in args.models.split(",") if k.strip()]
+    if any(k not in ("pose", "ball") for k in kinds):
+        parser.error("--models takes pose and/or ball")
+    
+    print("="*60)
+    print("🏓 PaddleCoach - INT8 Quantization")
+    print("="*60)
+    
+    videos = collect_videos(args.videos)
+    if not videos:
+        print("❌ No videos found")
+        sys.exit(1)
+    
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    print(f"\n🎞️  Sampling {len(videos)} video(s)...")
+    calibration, clips = sample_frames(videos, args.calibration_frames, args.eval_frames)
+    
+    report = {
+        'date': datetime.now().isoformat(),
+        'videos': [{'video': clip['video'], 'start_frame': clip['start_frame'], 'frames': len(clip['frames'])}
+                   for clip in clips],
+        'calibration_frames': len(calibration),
+        'imgsz': args.imgsz,
+        'device': args.device,
+        'tolerances': {'max_wrist_error_px': args.max_wrist_error, 'min_player_match': args.min_player_match,
+                       'min_shot_match': args.min_shot_match, 'min_ball_recall': args.min_ball_recall},
+        'sections': {}
+    }
+    
+    if "pose" in kinds:
+        report['sections']['pose'] = quantize_and_compare("pose", args.pose_model, list(args.pose_candidates),
+                                                          calibration, clips, output_dir, args)
+    if "ball" in kinds:
+        report['sections']['ball'] = quantize_and_compare("ball", args.ball_model, list(args.ball_candidates),
+                                                          calibration, clips, output_dir, args)
+    
+    print_report(report)
+    
+    report_path = output_dir / f"quantization_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
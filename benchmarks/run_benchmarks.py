@@ -0,0 +1,546 @@
+"""
+Benchmark suite for the PaddleCoach vision pipeline.
+Generates a deterministic synthetic match, times every pipeline stage on it,
+writes the results as JSON and compares them with a stored baseline.
+
+Usage:
+    python benchmarks/run_benchmarks.py --stub                    # No model weights needed
+    python benchmarks/run_benchmarks.py --stub --update-baseline  # Store the current numbers
+    python benchmarks/run_benchmarks.py --stages decode,ball_hsv --repeats 5
+
+Exits with status 1 when a stage regressed beyond the thresholds.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+from contextlib import redirect_stdout
+from datetime import datetime
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.append(str(BENCH_DIR))
+sys.path.append(str(BENCH_DIR.parent / "src"))
+
+from synthetic_match import SyntheticMatch, RIGHT_WRIST
+from stub_models import stub_models, StubYOLO
+
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+# Accuracy checks against the baseline: metric -> (+1 higher is better / -1 lower is better, tolerance)
+ACCURACY_TOLERANCES = {
+    "detection_rate": (+1, 0.05),
+    "mean_error_px": (-1, 2.0)
+}
+
+
+class BenchmarkContext:
+    """Shared inputs of all stages: the synthetic match, its video and decoded frames."""
+    
+    def __init__(self, match: SyntheticMatch, video_path: Path, workdir: Path, args):
+        self.match = match
+        self.video_path = video_path
+        self.workdir = workdir
+        self.args = args
+        self.timestamps = np.arange(match.num_frames) / match.fps
+        
+        # Decoded once so tracker stages do not include decode time
+        cap = cv2.VideoCapture(str(video_path))
+        self.frames: List[np.ndarray] = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            self.frames.append(frame)
+        cap.release()
+    
+    def ground_truth_poses(self) -> Dict[int, list]:
+        """PoseData per player built from the ground-truth keypoints."""
+        from models.pose_data import PoseData, Keypoint
+        
+        names = PoseData.get_coco_keypoint_names()
+        poses = {0: [], 1: []}
+        for frame_index, frame_keypoints in enumerate(self.match.keypoints):
+            for player_id in (0, 1):
+                keypoints = {name: Keypoint(x=float(x), y=float(y), confidence=float(c), name=name)
+                             for name, (x, y, c) in zip(names, frame_keypoints[player_id])}
+                pose = PoseData(frame_number=frame_index, timestamp=float(self.timestamps[frame_index]),
+                                player_id=player_id,
+                                left_wrist=keypoints["left_wrist"], left_elbow=keypoints["left_elbow"],
+                                right_wrist=keypoints["right_wrist"], right_elbow=keypoints["right_elbow"])
+                pose.all_keypoints = keypoints
+                pose.compute_arm_angles()
+                poses[player_id].append(pose)
+        return poses
+    
+    def ground_truth_dataframe(self):
+        """Pose DataFrame in the GameAnalyzer layout (1-based frames, Player_1/Player_2)."""
+        import pandas as pd
+        
+        rows = []
+        for frame_index, frame_keypoints in enumerate(self.match.keypoints):
+            for player_id in (0, 1):
+                row = {'frame': frame_index + 1, 'player_id': f'Player_{player_id + 1}',
+                       'timestamp': (frame_index + 1) / self.match.fps, 'rally_id': -1}
+                for i, (x, y, _) in enumerate(frame_keypoints[player_id]):
+                    row[f'x{i}'] = x
+                    row[f'y{i}'] = y
+                rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def measure(setup: Callable[[], Callable[[], int]], repeats: int) -> Dict:
+    """
+    Time a stage.
+    
+    Args:
+        setup: Builds the stage (untimed) and returns the work function, which
+               returns the number of items (frames, poses, ...) it processed
+        repeats: Number of timed runs; the best run is reported
+    
+    Returns:
+        Timing statistics
+    """
+    times = []
+    items = 0
+    for _ in range(repeats):
+        with redirect_stdout(io.StringIO()):
+            work = setup()
+            start = time.perf_counter()
+            items = work()
+            times.append(time.perf_counter() - start)
+    
+    best = min(times)
+    return {
+        "items": items,
+        "repeats": repeats,
+        "best_s": round(best, 6),
+        "median_s": round(statistics.median(times), 6),
+        "throughput": round(items / best, 2) if best > 0 else 0.0,
+        "ms_per_item": round(1000 * best / items, 4) if items else 0.0
+    }
+
+
+def ball_accuracy(match: SyntheticMatch, detections: List) -> Dict:
+    """Detection rate and position error of per-frame ball results against the ground truth."""
+    visible = match.ball[:, 2] > 0
+    found = np.array([d is not None for d in detections])
+    errors = [np.hypot(d.x - match.ball[i, 0], d.y - match.ball[i, 1])
+              for i, d in enumerate(detections) if d is not None and visible[i]]
+    return {
+        "detection_rate": round(float(found[visible].mean()) if visible.any() else 0.0, 4),
+        "mean_error_px": round(float(np.mean(errors)), 2) if errors else None,
+        "false_positive_rate": round(float(found[~visible].mean()) if (~visible).any() else 0.0, 4)
+    }
+
+
+def bench_decode_opencv(ctx: BenchmarkContext) -> Dict:
+    """cv2.VideoCapture.read() loop (one new array per frame)."""
+    def setup():
+        def work():
+            cap = cv2.VideoCapture(str(ctx.video_path))
+            count = 0
+            while cap.read()[0]:
+                count += 1
+            cap.release()
+            return count
+        return work
+    return measure(setup, ctx.args.repeats)
+
+
+def bench_decode_frame_source(ctx: BenchmarkContext) -> Dict:
+    """FrameSource (decoder thread, reused buffer ring)."""
+    from vision.frame_source import FrameSource
+    
+    def setup():
+        def work():
+            source = FrameSource(str(ctx.video_path))
+            count = 0
+            while source.read()[0]:
+                count += 1
+            source.release()
+            return count
+        return work
+    return measure(setup, ctx.args.repeats)
+
+
+def bench_ball_hsv(ctx: BenchmarkContext, fast_mode: bool = False) -> Dict:
+    """BallTrackerHSV.process_frame over all frames."""
+    from vision.ball_tracker_hsv import BallTrackerHSV
+    
+    detections = []
+    
+    def setup():
+        tracker = BallTrackerHSV(fast_mode=fast_mode)
+        
+        def work():
+            detections.clear()
+            for i, frame in enumerate(ctx.frames):
+                detections.append(tracker.process_frame(frame, i, ctx.timestamps[i]))
+            return len(ctx.frames)
+        return work
+    
+    result = measure(setup, ctx.args.repeats)
+    result["accuracy"] = ball_accuracy(ctx.match, detections)
+    return result
+
+
+def bench_ball_yolo(ctx: BenchmarkContext) -> Dict:
+    """BallTracker (YOLO, ROI search) over all frames."""
+    from vision.ball_tracker import BallTracker
+    
+    detections = []
+    
+    def setup():
+        tracker = BallTracker(model_path=ctx.args.ball_model, use_roi=True)
+        
+        def work():
+            detections.clear()
+            for i, frame in enumerate(ctx.frames):
+                detections.append(tracker.process_frame(frame, i, ctx.timestamps[i]))
+            return len(ctx.frames)
+        return work
+    
+    result = measure(setup, ctx.args.repeats)
+    result["accuracy"] = ball_accuracy(ctx.match, detections)
+    return result
+
+
+def bench_ball_yolo_tiled(ctx: BenchmarkContext) -> Dict:
+    """BallTracker (YOLO, tiled search) over all frames."""
+    from vision.ball_tracker import BallTracker
+    
+    detections = []
+    trackers = []
+    
+    def setup():
+        # Tiles of half the frame height, so the synthetic video gets a real tile grid
+        tracker = BallTracker(model_path=ctx.args.ball_model, tiled=True, tile_size=ctx.match.height // 2)
+        trackers.append(tracker)
+        
+        def work():
+            detections.clear()
+            for i, frame in enumerate(ctx.frames):
+                detections.append(tracker.process_frame(frame, i, ctx.timestamps[i]))
+            return len(ctx.frames)
+        return work
+    
+    result = measure(setup, ctx.args.repeats)
+    result["accuracy"] = ball_accuracy(ctx.match, detections)
+    result["search"] = trackers[-1].get_search_statistics()
+    return result
+
+
+def bench_player_tracker(ctx: BenchmarkContext) -> Dict:
+    """PlayerTracker.process_frame over all frames."""
+    from vision.player_tracker import PlayerTracker
+    
+    outputs = []
+    
+    def setup():
+        tracker = PlayerTracker(model_name=ctx.args.pose_model)
+        
+        def work():
+            outputs.clear()
+            for i, frame in enumerate(ctx.frames):
+                outputs.append(tracker.process_frame(frame, i, ctx.timestamps[i]))
+            return len(ctx.frames)
+        return work
+    
+    result = measure(setup, ctx.args.repeats)
+    
+    # Player 0 is the left player (IDs are assigned left to right)
+    errors = []
+    complete = 0
+    for i, poses in enumerate(outputs):
+        complete += len(poses) == 2
+        for pose in poses:
+            if pose.right_wrist is not None and pose.player_id < 2:
+                truth = ctx.match.keypoints[i, pose.player_id, RIGHT_WRIST]
+                errors.append(np.hypot(pose.right_wrist.x - truth[0], pose.right_wrist.y - truth[1]))
+    result["accuracy"] = {
+        "detection_rate": round(complete / len(outputs), 4) if outputs else 0.0,
+        "mean_error_px": round(float(np.mean(errors)), 2) if errors else None
+    }
+    return result
+
+
+def bench_shot_detector(ctx: BenchmarkContext) -> Dict:
+    """ShotDetector.detect_shots on ground-truth pose sequences of both players."""
+    from vision.shot_detector import ShotDetector
+    
+    poses = ctx.ground_truth_poses()
+    detector = ShotDetector()
+    shots = []
+    inner = 20  # One pass takes only milliseconds
+    
+    def setup():
+        def work():
+            for _ in range(inner):
+                shots[:] = [shot for player_id in (0, 1) for shot in detector.detect_shots(poses[player_id])]
+            return inner * sum(len(p) for p in poses.values())
+        return work
+    
+    result = measure(setup, ctx.args.repeats)
+    result["shots_found"] = len(shots)
+    result["shots_expected"] = len(ctx.match.hits)
+    return result
+
+
+def bench_game_analyzer(ctx: BenchmarkContext) -> Dict:
+    """GameAnalyzer shot detection and stroke metrics on a ground-truth DataFrame."""
+    from vision.game_analyzer import GameAnalyzer
+    
+    df = ctx.ground_truth_dataframe()
+    fps = int(ctx.match.fps)
+    # The default velocity threshold is in pixels/s of 1080p footage
+    velocity_threshold = 1000.0 * ctx.match.height / 1080
+    found = []
+    
+    def setup():
+        analyzer = GameAnalyzer(output_dir=str(ctx.workdir / "analysis"))
+        
+        def work():
+            found.clear()
+            for player_id in ("Player_1", "Player_2"):
+                for start, end, _ in analyzer.detect_shots(df, player_id, velocity_threshold, fps=fps):
+                    analyzer.analyze_stroke_metrics(df, player_id, start, end, fps)
+                    found.append(start)
+            return len(df)
+        return work
+    
+    result = measure(setup, ctx.args.repeats)
+    result["shots_found"] = len(found)
+    result["shots_expected"] = len(ctx.match.hits)
+    return result
+
+
+def bench_json_export(ctx: BenchmarkContext) -> Dict:
+    """VideoProcessor pose and shot JSON exports."""
+    from vision.video_processor import VideoProcessor
+    from vision.shot_detector import ShotDetector
+    
+    poses = ctx.ground_truth_poses()
+    shots = {player_id: ShotDetector().detect_shots(poses[player_id]) for player_id in (0, 1)}
+    
+    def setup():
+        processor = VideoProcessor(str(ctx.video_path), str(ctx.workdir / "export"))
+        processor.all_pose_data = poses
+        processor.detected_shots = shots
+        
+        def work():
+            processor.save_pose_data_json()
+            processor.save_shots_json()
+            return sum(len(p) for p in poses.values())
+        return work
+    
+    return measure(setup, ctx.args.repeats)
+
+
+def bench_end_to_end(ctx: BenchmarkContext) -> Dict:
+    """VideoProcessor.process_video without visualization (throughput in video frames/s)."""
+    from vision.video_processor import VideoProcessor
+    
+    stats = {}
+    
+    def setup():
+        processor = VideoProcessor(str(ctx.video_path), str(ctx.workdir / "end_to_end"),
+                                   use_motion_gate=True, segment_rallies=True, smooth_keypoints=True,
+                                   enable_timing=True)
+        processor.timer.metrics_dir = ctx.workdir / "metrics"  # Keep benchmark jobs out of the server metrics
+        
+        def work():
+            stats.update(processor.process_video(visualize=False, save_video=False))
+            return ctx.match.num_frames
+        return work
+    
+    result = measure(setup, ctx.args.repeats)
+    result["processed_frames"] = stats.get("processed_frames")
+    result["rallies"] = stats.get("rallies")
+    result["pose_inference_calls"] = stats.get("pose_inference", {}).get("pose_inference_calls")
+    result["stage_timing"] = stats.get("timing")
+    return result
+
+
+STAGES: Dict[str, Callable[[BenchmarkContext], Dict]] = {
+    "decode_opencv": bench_decode_opencv,
+    "decode_frame_source": bench_decode_frame_source,
+    "ball_hsv": bench_ball_hsv,
+    "ball_hsv_fast": lambda ctx: bench_ball_hsv(ctx, fast_mode=True),
+    "ball_yolo": bench_ball_yolo,
+    "ball_yolo_tiled": bench_ball_yolo_tiled,
+    "player_tracker": bench_player_tracker,
+    "shot_detector": bench_shot_detector,
+    "game_analyzer": bench_game_analyzer,
+    "json_export": bench_json_export,
+    "end_to_end": bench_end_to_end
+}
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, threshold: float) -> Tuple[Dict, List[str]]:
+    """
+    Compare stage results with a baseline.
+    
+    Args:
+        results: Current results
+        baseline: Stored baseline results
+        threshold: Allowed relative throughput drop (0.2 = 20%)
+    
+    Returns:
+        (per-stage comparison, list of regression messages)
+    """
+    comparison = {}
+    regressions = []
+    
+    for name, stage in results["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if base is None or "throughput" not in base:
+            continue
+        if "error" in stage:
+            comparison[name] = {"throughput_ratio": 0.0, "status": "regression"}
+            regressions.append(f"{name}: failed ({stage['error']})")
+            continue
+        
+        ratio = stage["throughput"] / base["throughput"] if base["throughput"] else 1.0
+        status = "ok"
+        if ratio < 1 - threshold:
+            status = "regression"
+            regressions.append(f"{name}: throughput {stage['throughput']:.1f}/s vs baseline "
+                               f"{base['throughput']:.1f}/s ({ratio - 1:+.0%})")
+        elif ratio > 1 + threshold:
+            status = "improved"
+        
+        for metric, (direction, tolerance) in ACCURACY_TOLERANCES.items():
+            current = stage.get("accuracy", {}).get(metric)
+            previous = base.get("accuracy", {}).get(metric)
+            if current is None or previous is None:
+                continue
+            if direction * (current - previous) < -tolerance:
+                status = "regression"
+                regressions.append(f"{name}: {metric} {current} vs baseline {previous}")
+        
+        comparison[name] = {"throughput_ratio": round(ratio, 3), "status": status}
+    
+    return comparison, regressions
+
+
+def main():
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Benchmark the vision pipeline on a synthetic match")
+    parser.add_argument("--stub", action="store_true", help="Use stub detectors instead of YOLO weights")
+    parser.add_argument("--stages", type=str, default=",".join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument("--width", type=int, default=640, help="Synthetic video width")
+    parser.add_argument("--height", type=int, default=360, help="Synthetic video height")
+    parser.add_argument("--fps", type=float, default=30.0, help="Synthetic video frame rate")
+    parser.add_argument("--duration", type=float, default=8.0, help="Synthetic video length (seconds)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic match seed")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per stage (best is reported)")
+    parser.add_argument("--ball-model", type=str, default="best.pt", help="Ball model weights")
+    parser.add_argument("--pose-model", type=str, default="yolo11n-pose.pt", help="Pose model weights")
+    parser.add_argument("--workdir", type=str, default="output/benchmarks", help="Scratch and output directory")
+    parser.add_argument("--output", type=str, default=None, help="Results JSON (default: <workdir>/results.json)")
+    parser.add_argument("--baseline", type=str, default=str(DEFAULT_BASELINE), help="Baseline JSON")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative throughput drop")
+    
+    args = parser.parse_args()
+    
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(unknown)} (available: {', '.join(STAGES)})")
+    
+    workdir = Path(args.workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    
+    print("="*60)
+    print("🏓 PaddleCoach - Pipeline Benchmarks")
+    print("="*60)
+    
+    match = SyntheticMatch(width=args.width, height=args.height, fps=args.fps,
+                           duration=args.duration, seed=args.seed)
+    video_path = match.write(str(workdir / f"synthetic_{args.width}x{args.height}_s{args.seed}.mp4"))
+    print(f"Synthetic match: {match.num_frames} frames at {args.width}x{args.height}, "
+          f"{len(match.hits)} shots, {len(match.rally_intervals())} rallies")
+    print(f"Detectors: {'stub' if args.stub else 'YOLO weights'}")
+    
+    ctx = BenchmarkContext(match, video_path, workdir, args)
+    
+    results = {
+        "metadata": {
+            "date": datetime.now().isoformat(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "stub_models": args.stub,
+            "video": {"width": args.width, "height": args.height, "fps": args.fps,
+                      "frames": match.num_frames, "seed": args.seed}
+        },
+        "stages": {}
+    }
+    
+    print(f"\n{'Stage':<22} {'Throughput':>14} {'ms/item':>10}")
+    print("-"*48)
+    for name in stages:
+        try:
+            if args.stub:
+                with stub_models(match):
+                    stage = STAGES[name](ctx)
+                stage["model_calls"] = StubYOLO.calls
+            else:
+                stage = STAGES[name](ctx)
+        except Exception as e:
+            results["stages"][name] = {"error": f"{type(e).__name__}: {str(e).strip()}"}
+            print(f"{name:<22} ❌ {type(e).__name__}: {str(e).strip()[:80]}")
+            continue
+        results["stages"][name] = stage
+        print(f"{name:<22} {stage['throughput']:>12.1f}/s {stage['ms_per_item']:>10.3f}")
+    
+    # Regression check against the baseline
+    exit_code = 0
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists() and not args.update_baseline:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get("metadata", {}).get("video") != results["metadata"]["video"] or \
+                baseline.get("metadata", {}).get("stub_models") != args.stub:
+            print(f"\n⚠️  Baseline {baseline_path} was recorded with different settings; not compared")
+        else:
+            comparison, regressions = compare_with_baseline(results, baseline, args.threshold)
+            results["comparison"] = comparison
+            print(f"\nCompared with baseline from {baseline.get('metadata', {}).get('date', '?')}:")
+            for name, entry in comparison.items():
+                print(f"  {name:<22} {entry['throughput_ratio']:>6.2f}x  {entry['status']}")
+            if regressions:
+                print("\n❌ Regressions:")
+                for message in regressions:
+                    print(f"   {message}")
+                exit_code = 1
+            else:
+                print("\n✅ No regressions")
+    
+    output_path = Path(args.output) if args.output else workdir / "results.json"
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved: {output_path}")
+    
+    if args.update_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Baseline updated: {baseline_path}")
+    
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
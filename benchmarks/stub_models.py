@@ -0,0 +1,156 @@
+"""
+Stub detectors that stand in for the YOLO models, so the benchmarks run
+without model weights or a GPU.
+Ball boxes come from an orange color mask of the input image (works on crops);
+poses come from the synthetic match ground truth via the frame index code.
+"""
+from contextlib import contextmanager
+from typing import List, Optional
+import sys
+import types
+import numpy as np
+
+from synthetic_match import SyntheticMatch
+from vision.model_registry import registry
+
+
+class StubTensor:
+    """The subset of the torch.Tensor interface the trackers use."""
+    
+    def __init__(self, data):
+        self.data = np.asarray(data, dtype=np.float32)
+    
+    def cpu(self):
+        return self
+    
+    def numpy(self) -> np.ndarray:
+        return self.data
+    
+    def tolist(self):
+        return self.data.tolist()
+    
+    def __getitem__(self, index):
+        return StubTensor(self.data[index])
+    
+    def __len__(self) -> int:
+        return len(self.data)
+    
+    def __float__(self) -> float:
+        return float(self.data)
+    
+    def __int__(self) -> int:
+        return int(self.data)
+
+
+class StubBoxes:
+    """Detection boxes in the ultralytics Boxes layout."""
+    
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.xyxy = StubTensor(xyxy)
+        self.xywh = StubTensor(np.column_stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2,
+                                                xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]]))
+        self.conf = StubTensor(conf)
+        self.cls = StubTensor(cls)
+    
+    def __len__(self) -> int:
+        return len(self.xyxy)
+    
+    def __getitem__(self, index):
+        index = slice(index, index + 1) if isinstance(index, int) else index
+        return StubBoxes(self.xyxy.data[index], self.conf.data[index], self.cls.data[index])
+    
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class StubKeypoints:
+    """Keypoints in the ultralytics Keypoints layout."""
+    
+    def __init__(self, data: np.ndarray):
+        self.data = StubTensor(data)
+        self.xy = StubTensor(np.asarray(data)[..., :2])
+
+
+class StubResult:
+    """One image's results."""
+    
+    def __init__(self, boxes: StubBoxes, keypoints: Optional[StubKeypoints] = None):
+        self.boxes = boxes
+        self.keypoints = keypoints
+
+
+class StubYOLO:
+    """
+    Drop-in for ultralytics.YOLO.
+    Pose models (name contains "pose") return the ground-truth skeletons of the
+    frame; other models return the orange ball found by a color mask.
+    """
+    
+    match: Optional[SyntheticMatch] = None  # Set by the benchmark runner
+    calls = 0
+    
+    def __init__(self, model: str = "", *args, **kwargs):
+        self.model_name = str(model)
+        self.is_pose = "pose" in self.model_name
+        self.names = {0: "person", 32: "sports ball"}
+    
+    def __call__(self, source=None, **kwargs) -> List[StubResult]:
+        images = source if isinstance(source, list) else [source]
+        StubYOLO.calls += len(images)
+        return [self._pose(image) if self.is_pose else self._ball(image) for image in images]
+    
+    def predict(self, source=None, **kwargs) -> List[StubResult]:
+        return self(source, **kwargs)
+    
+    def _ball(self, image: np.ndarray) -> StubResult:
+        """Box around the orange pixels of the image."""
+        b, g, r = image[..., 0].astype(np.int16), image[..., 1].astype(np.int16), image[..., 2]
+        mask = (r > 200) & (np.abs(g - 139) < 45) & (b < 110)
+        ys, xs = np.nonzero(mask)
+        if len(xs) < 4:
+            return StubResult(StubBoxes(np.zeros((0, 4)), np.zeros(0), np.zeros(0)))
+        box = [[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]]
+        return StubResult(StubBoxes(box, [0.85], [32]))
+    
+    def _pose(self, image: np.ndarray) -> StubResult:
+        """Ground-truth skeletons of the frame, scaled to the image size."""
+        match = StubYOLO.match
+        frame_index = match.decode_frame_index(image) if match is not None else -1
+        if frame_index < 0:
+            return StubResult(StubBoxes(np.zeros((0, 4)), np.zeros(0), np.zeros(0)),
+                              StubKeypoints(np.zeros((0, 17, 3))))
+        
+        keypoints = match.keypoints[frame_index].copy()
+        keypoints[..., :2] *= image.shape[1] / match.width
+        margin = 0.05 * match.player_height * image.shape[1] / match.width
+        boxes = np.column_stack([keypoints[..., 0].min(axis=1) - margin, keypoints[..., 1].min(axis=1) - margin,
+                                 keypoints[..., 0].max(axis=1) + margin, keypoints[..., 1].max(axis=1) + margin])
+        return StubResult(StubBoxes(boxes, np.full(len(boxes), 0.9), np.zeros(len(boxes))),
+                          StubKeypoints(keypoints))
+
+
+@contextmanager
+def stub_models(match: SyntheticMatch):
+    """
+    Make `from ultralytics import YOLO` return StubYOLO bound to a synthetic match.
+    The vision modules import ultralytics when a model is constructed, so
+    trackers created inside this context get the stub (ultralytics need not be installed).
+    """
+    StubYOLO.match = match
+    StubYOLO.calls = 0
+    stub_module = types.ModuleType("ultralytics")
+    stub_module.YOLO = StubYOLO
+    
+    # Only this entry is swapped: modules imported meanwhile (scipy, ...) must stay loaded
+    original = sys.modules.get("ultralytics")
+    sys.modules["ultralytics"] = stub_module
+    registry.evict()  # Models cached outside the context must not be handed out
+    try:
+        yield StubYOLO
+    finally:
+        registry.evict()  # Nor may stubs be handed out afterwards
+        if original is not None:
+            sys.modules["ultralytics"] = original
+        else:
+            del sys.modules["ultralytics"]
@@ -0,0 +1,208 @@
+"""
+Deterministic synthetic table tennis videos for benchmarking.
+Two stick-figure players swing at an orange ball that is played back and forth
+in rallies separated by dead time. Ground truth for the ball and all 17 COCO
+keypoints is kept per frame, and every frame carries its index as a block
+code in the top-left corner so a stub detector can look the truth up.
+"""
+from typing import List, Tuple
+import math
+import cv2
+import numpy as np
+from pathlib import Path
+
+
+# Standing pose in units of player height, origin between the feet (COCO keypoint order)
+SKELETON_TEMPLATE = np.array([
+    (0.00, -0.93),  # nose
+    (-0.02, -0.95), (0.02, -0.95),  # eyes
+    (-0.04, -0.94), (0.04, -0.94),  # ears
+    (-0.11, -0.80), (0.11, -0.80),  # shoulders
+    (-0.15, -0.63), (0.15, -0.63),  # elbows
+    (-0.17, -0.48), (0.17, -0.48),  # wrists
+    (-0.08, -0.50), (0.08, -0.50),  # hips
+    (-0.09, -0.27), (0.09, -0.27),  # knees
+    (-0.10, 0.00), (0.10, 0.00)  # ankles
+])
+
+BONES = [(0, 1), (0, 2), (1, 3), (2, 4), (5, 6), (5, 7), (7, 9), (6, 8), (8, 10),
+         (5, 11), (6, 12), (11, 12), (11, 13), (13, 15), (12, 14), (14, 16)]
+
+RIGHT_ELBOW, RIGHT_WRIST = 8, 10
+
+BALL_COLOR = (50, 139, 250)  # BGR, the orange the HSV tracker looks for
+CODE_BITS = 16
+
+
+class SyntheticMatch:
+    """
+    A synthetic match with per-frame ground truth.
+    
+    Rallies last rally_length seconds and are followed by dead_time seconds
+    without a ball. Within a rally the ball flies between the players' racket
+    wrists; each arrival coincides with a fast forward swing of that player.
+    """
+    
+    def __init__(self,
+                 width: int = 640,
+                 height: int = 360,
+                 fps: float = 30.0,
+                 duration: float = 8.0,
+                 rally_length: float = 4.0,
+                 dead_time: float = 2.0,
+                 seed: int = 0):
+        """
+        Build the ground truth for a synthetic match.
+        
+        Args:
+            width: Frame width in pixels
+            height: Frame height in pixels
+            fps: Frame rate
+            duration: Video length in seconds
+            rally_length: Seconds of play per rally
+            dead_time: Seconds without a ball between rallies
+            seed: Seed for the per-shot flight time variation
+        """
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.num_frames = int(round(duration * fps))
+        self.rally_length = rally_length
+        self.dead_time = dead_time
+        
+        self.player_height = 0.6 * height
+        self.feet = [(0.15 * width, 0.92 * height), (0.85 * width, 0.92 * height)]
+        self.code_block = max(6, width // 80)
+        
+        # Hit times per player: the ball arrives at alternating players within each rally
+        rng = np.random.default_rng(seed)
+        self.hits: List[Tuple[float, int]] = []  # (time, player)
+        rally_start = 0.5
+        while rally_start < duration:
+            t, player = rally_start, 0
+            while t < min(rally_start + rally_length, duration):
+                self.hits.append((t, player))
+                t += rng.uniform(0.7, 0.9)
+                player = 1 - player
+            rally_start += rally_length + dead_time
+        
+        times = np.arange(self.num_frames) / fps
+        self.keypoints = np.stack([self._keypoints_at(t) for t in times])  # (F, 2, 17, 3)
+        self.ball = np.stack([self._ball_at(t) for t in times])  # (F, 3): x, y, visible
+    
+    def rally_intervals(self) -> List[Tuple[int, int]]:
+        """(start_frame, end_frame) of the frames with the ball in play."""
+        visible = self.ball[:, 2] > 0
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], visible.astype(int), [0]])))
+        return [(int(start), int(end) - 1) for start, end in zip(edges[::2], edges[1::2])]
+    
+    def _swing_offset(self, t: float, player: int) -> float:
+        """Horizontal racket-wrist offset (player heights, towards the table) at time t."""
+        offset = 0.0
+        for hit_time, hit_player in self.hits:
+            if hit_player != player:
+                continue
+            s = t - hit_time
+            if -0.4 <= s < -0.1:
+                # Slow backswing
+                offset = -0.25 * (s + 0.4) / 0.3
+            elif -0.1 <= s < 0.1:
+                # Fast forward swing through the contact point
+                offset = -0.25 + 0.5 * (1 - math.cos(math.pi * (s + 0.1) / 0.2)) / 2
+            elif 0.1 <= s < 0.5:
+                # Recovery to the ready position
+                offset = 0.25 * (1 - (s - 0.1) / 0.4)
+        return offset
+    
+    def _keypoints_at(self, t: float) -> np.ndarray:
+        """(2, 17, 3) keypoints of both players at time t."""
+        players = []
+        for player in range(2):
+            foot_x, foot_y = self.feet[player]
+            sway = 0.01 * self.width * math.sin(2 * math.pi * 0.5 * t + player * math.pi)
+            direction = 1 if player == 0 else -1  # Towards the table
+            
+            points = SKELETON_TEMPLATE.copy()
+            points[:, 0] *= direction  # Mirror so the racket arm faces the table
+            swing = self._swing_offset(t, player) * direction
+            points[RIGHT_WRIST, 0] += swing
+            points[RIGHT_ELBOW, 0] += swing / 2
+            
+            xy = points * self.player_height + (foot_x + sway, foot_y)
+            players.append(np.column_stack([xy, np.full(len(xy), 0.9)]))
+        return np.stack(players)
+    
+    def _ball_at(self, t: float) -> np.ndarray:
+        """(x, y, visible) of the ball at time t."""
+        for (t0, p0), (t1, p1) in zip(self.hits, self.hits[1:]):
+            if not (t0 <= t < t1) or p0 == p1 or t1 - t0 > 1.0:
+                continue
+            u = (t - t0) / (t1 - t0)
+            x0, y0 = self._contact_point(t0, p0)
+            x1, y1 = self._contact_point(t1, p1)
+            arc = 0.25 * self.height * 4 * u * (1 - u)
+            return np.array([x0 + (x1 - x0) * u, y0 + (y1 - y0) * u - arc, 1.0])
+        return np.array([0.0, 0.0, 0.0])
+    
+    def _contact_point(self, t: float, player: int) -> Tuple[float, float]:
+        """Where the ball meets a player's racket wrist."""
+        wrist = self._keypoints_at(t)[player, RIGHT_WRIST]
+        return float(wrist[0]), float(wrist[1])
+    
+    def render_frame(self, frame_index: int) -> np.ndarray:
+        """Draw one frame (BGR)."""
+        w, h = self.width, self.height
+        frame = np.full((h, w, 3), 60, dtype=np.uint8)
+        
+        # Table and net
+        cv2.rectangle(frame, (int(0.3 * w), int(0.55 * h)), (int(0.7 * w), int(0.75 * h)), (110, 50, 20), -1)
+        cv2.line(frame, (w // 2, int(0.5 * h)), (w // 2, int(0.75 * h)), (230, 230, 230), 2)
+        
+        thickness = max(2, w // 240)
+        for player in range(2):
+            points = np.round(self.keypoints[frame_index, player, :, :2]).astype(np.int32)
+            cv2.polylines(frame, [points[list(bone)] for bone in BONES], False, (200, 200, 200), thickness)
+            for x, y in points:
+                cv2.circle(frame, (int(x), int(y)), thickness + 1, (255, 255, 255), -1)
+        
+        x, y, visible = self.ball[frame_index]
+        if visible:
+            cv2.circle(frame, (int(round(x)), int(round(y))), max(4, w // 128), BALL_COLOR, -1)
+        
+        # Frame index as black/white blocks
+        b = self.code_block
+        for bit in range(CODE_BITS):
+            value = 255 if (frame_index >> bit) & 1 else 0
+            frame[0:b, bit * b:(bit + 1) * b] = value
+        
+        return frame
+    
+    def write(self, path: str, fourcc: str = "mp4v") -> Path:
+        """Render the whole match to a video file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*fourcc), self.fps, (self.width, self.height))
+        for i in range(self.num_frames):
+            writer.write(self.render_frame(i))
+        writer.release()
+        return path
+    
+    def decode_frame_index(self, image: np.ndarray) -> int:
+        """
+        Read the frame index code from a frame (or a uniformly resized copy of one).
+        
+        Returns:
+            Frame index, or -1 if the code is not readable (e.g. a crop)
+        """
+        scale = image.shape[1] / self.width
+        b = self.code_block * scale
+        if abs(image.shape[0] / self.height - scale) > 0.02 or b < 2:
+            return -1
+        
+        y = int(b / 2)
+        index = 0
+        for bit in range(CODE_BITS):
+            x = int((bit + 0.5) * b)
+            if image[y, x].mean() > 127:
+                index |= 1 << bit
+        return index if index < self.num_frames else -1
@@ -24,6 +24,9 @@ class BallData:
     velocity_y: Optional[float] = None
     speed: Optional[float] = None  # Pixels per second
     
+    # True when the position was predicted across a detection dropout
+    predicted: bool = False
+    
     def to_dict(self) -> Dict:
         """Convert to dictionary for JSON serialization (compact)."""
         data = {
@@ -41,6 +44,8 @@ class BallData:
             data["vy"] = round(self.velocity_y, 1)
         if self.speed is not None:
             data["s"] = round(self.speed, 1)
+        if self.predicted:
+            data["p"] = 1
         
         return data
     
@@ -39,6 +39,10 @@ class PoseData:
     left_arm_angle: Optional[float] = None  # Angle at left elbow
     right_arm_angle: Optional[float] = None  # Angle at right elbow
     
+    # How the keypoints were obtained: "inferred" (pose model), "propagated" (optical flow)
+    # or "carried" (reused on a static frame)
+    source: str = "inferred"
+    
     @staticmethod
     def get_coco_keypoint_names() -> List[str]:
         """Return the 17 COCO keypoint names in order."""
@@ -72,8 +76,14 @@ class PoseData:
                 dy = self.right_wrist.y - self.right_elbow.y
                 self.right_arm_angle = math.degrees(math.atan2(dy, dx))
     
-    def to_dict(self) -> Dict:
-        """Convert to dictionary for JSON serialization (only essential data)."""
+    def to_dict(self, include_all_keypoints: bool = False) -> Dict:
+        """
+        Convert to dictionary for JSON serialization (only essential data).
+        
+        Args:
+            include_all_keypoints: Also store all 17 keypoints as [x, y, confidence] rows
+                                   (COCO order), so overlays can be rendered later
+        """
         def keypoint_to_dict(kp: Optional[Keypoint]) -> Optional[Dict]:
             if kp is None:
                 return None
@@ -83,10 +93,11 @@ class PoseData:
                 "confidence": round(kp.confidence, 3)
             }
         
-        return {
+        data = {
             "frame": self.frame_number,
             "time": round(self.timestamp, 3),
             "player": self.player_id,
+            "source": self.source,
             "left_wrist": keypoint_to_dict(self.left_wrist),
             "left_elbow": keypoint_to_dict(self.left_elbow),
             "right_wrist": keypoint_to_dict(self.right_wrist),
@@ -96,6 +107,16 @@ class PoseData:
                 "right_arm": round(self.right_arm_angle, 2) if self.right_arm_angle else None
             }
         }
+        
+        if include_all_keypoints:
+            keypoints = getattr(self, 'all_keypoints', None) or {}
+            data["keypoints"] = [
+                [round(kp.x, 1), round(kp.y, 1), round(kp.confidence, 3)] if kp else [0.0, 0.0, 0.0]
+                for kp in (keypoints.get(name) or getattr(self, name, None)
+                           for name in self.get_coco_keypoint_names())
+            ]
+        
+        return data
     
     @classmethod
     def from_yolo_result(cls, result, frame_number: int, timestamp: float, player_id: int):
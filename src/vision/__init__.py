@@ -1,10 +1,29 @@
 """
 PaddleCoach Vision Package
 Computer vision components for tracking and analysis.
+
+Components are imported on first access, so importing the package (or a
+light module such as vision.timing) does not load ultralytics, torch or pandas.
 """
+import importlib
 
-from .player_tracker import PlayerTracker
-from .video_processor import VideoProcessor
-from .game_analyzer import GameAnalyzer
+# Public name -> module that defines it
+_LAZY_IMPORTS = {
+    'PlayerTracker': '.player_tracker',
+    'VideoProcessor': '.video_processor',
+    'GameAnalyzer': '.game_analyzer',
+}
 
 __all__ = ['PlayerTracker', 'VideoProcessor', 'GameAnalyzer']
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value  # Later accesses skip __getattr__
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
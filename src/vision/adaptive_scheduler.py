@@ -0,0 +1,160 @@
+"""
+Adaptive frame-rate scheduler for pose processing.
+Samples at a low rate while the wrists move slowly and switches to full rate
+when a stroke starts, backfilling the frames skipped just before the trigger
+so the whole stroke is processed at full fidelity.
+"""
+from typing import List, Dict, Tuple, Optional
+from collections import deque
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from models.pose_data import PoseData
+
+
+class AdaptiveFrameScheduler:
+    """
+    Decides which frames to run pose inference on based on wrist velocity.
+    Frames skipped in low-rate mode are buffered so they can be processed
+    retroactively when the pre-trigger velocity is crossed.
+    """
+    
+    def __init__(self,
+                 low_rate_step: int = 4,
+                 pretrigger_velocity: float = 500.0,
+                 release_velocity: float = 250.0,
+                 hold_time: float = 0.5):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            low_rate_step: In low-rate mode, process every Nth frame
+            pretrigger_velocity: Wrist speed (px/s) that switches to full rate and triggers backfill
+            release_velocity: Wrist speed (px/s) below which full rate may end
+            hold_time: Seconds the wrists must stay below release_velocity before dropping to low rate
+        """
+        self.low_rate_step = low_rate_step
+        self.pretrigger_velocity = pretrigger_velocity
+        self.release_velocity = release_velocity
+        self.hold_time = hold_time
+        
+        # Start at full rate until the scene proves quiet
+        self.full_rate = True
+        self.frames_since_processed = 0
+        self.last_fast_time = 0.0
+        
+        # Frames skipped since the last processed frame: (frame, frame_number, timestamp)
+        self.skipped: deque = deque(maxlen=max(1, low_rate_step - 1))
+        
+        # Last wrist positions per player: player_id -> ((N, 2) wrists, timestamp)
+        self.last_wrists: Dict[int, Tuple[np.ndarray, float]] = {}
+        
+        # Every frame number that was processed, for the sampling segments
+        self.processed_frames: List[int] = []
+        self.backfilled_frames = 0
+        self.skipped_frames = 0
+    
+    def should_process(self) -> bool:
+        """Whether the next frame should run pose inference."""
+        return self.full_rate or self.frames_since_processed + 1 >= self.low_rate_step
+    
+    def skip(self, frame: np.ndarray, frame_number: int, timestamp: float):
+        """
+        Buffer a frame that is not processed now.
+        
+        Args:
+            frame: Input frame (BGR format); must not be reused by the caller
+            frame_number: Current frame number
+            timestamp: Timestamp in seconds from video start
+        """
+        self.skipped.append((frame, frame_number, timestamp))
+        self.frames_since_processed += 1
+        self.skipped_frames += 1
+    
+    def observe(self, pose_data_list: List[PoseData], frame_number: int,
+                timestamp: float) -> List[Tuple[np.ndarray, int, float]]:
+        """
+        Report the poses of a processed frame and update the sampling rate.
+        
+        Args:
+            pose_data_list: Poses inferred for the frame
+            frame_number: Frame number of the processed frame
+            timestamp: Timestamp in seconds from video start
+        
+        Returns:
+            Skipped frames to process now (oldest first) if a stroke just started, else []
+        """
+        self.processed_frames.append(frame_number)
+        self.frames_since_processed = 0
+        speed = self._max_wrist_speed(pose_data_list, timestamp)
+        
+        backfill = []
+        if speed >= self.release_velocity:
+            self.last_fast_time = timestamp
+        
+        if not self.full_rate and speed >= self.pretrigger_velocity:
+            # Stroke starting: switch to full rate and recover the frames just skipped
+            self.full_rate = True
+            backfill = list(self.skipped)
+            self.processed_frames.extend(number for _, number, _ in backfill)
+            self.skipped_frames -= len(backfill)
+            self.backfilled_frames += len(backfill)
+        elif self.full_rate and timestamp - self.last_fast_time >= self.hold_time:
+            self.full_rate = False
+        
+        self.skipped.clear()
+        return backfill
+    
+    def _max_wrist_speed(self, pose_data_list: List[PoseData], timestamp: float) -> float:
+        """Fastest wrist speed (px/s) of any player since that player's previous observation."""
+        speed = 0.0
+        for pose_data in pose_data_list:
+            wrists = np.array([(kp.x, kp.y) for kp in (pose_data.left_wrist, pose_data.right_wrist)
+                               if kp is not None and kp.confidence > 0.3])
+            if len(wrists) == 0:
+                continue
+            
+            previous = self.last_wrists.get(pose_data.player_id)
+            if previous is not None and len(previous[0]) == len(wrists) and timestamp > previous[1]:
+                displacement = np.linalg.norm(wrists - previous[0], axis=1).max()
+                speed = max(speed, displacement / (timestamp - previous[1]))
+            
+            self.last_wrists[pose_data.player_id] = (wrists, timestamp)
+        
+        return speed
+    
+    def get_segments(self) -> List[Dict]:
+        """
+        Get the sampling rate actually used over time.
+        
+        Returns:
+            List of {"start_frame", "end_frame", "step"} runs with a constant frame step
+        """
+        frames = np.unique(self.processed_frames)
+        if len(frames) < 2:
+            return [{"start_frame": int(f), "end_frame": int(f), "step": 1} for f in frames]
+        
+        gaps = np.diff(frames)
+        segments = []
+        start = 0
+        for i in range(1, len(gaps) + 1):
+            if i == len(gaps) or gaps[i] != gaps[start]:
+                segments.append({
+                    "start_frame": int(frames[start]),
+                    "end_frame": int(frames[i]),
+                    "step": int(gaps[start])
+                })
+                start = i
+        
+        return segments
+    
+    def get_statistics(self) -> Dict:
+        """Get counts of processed, skipped and backfilled frames."""
+        return {
+            'scheduled_frames': len(self.processed_frames),
+            'scheduler_skipped_frames': self.skipped_frames,
+            'backfilled_frames': self.backfilled_frames,
+            'sampling_segments': len(self.get_segments())
+        }
@@ -0,0 +1,184 @@
+"""
+Constant-acceleration Kalman filter for table tennis ball tracking.
+Smooths detections, estimates velocity in pixels per second and predicts
+the ball position across short detection dropouts.
+"""
+from typing import Optional, Tuple
+import numpy as np
+
+
+class BallKalmanFilter:
+    """
+    Kalman filter over the ball state [x, y, vx, vy, ax, ay].
+    Time steps come from frame timestamps, so velocity is in real px/s
+    even when frames are skipped or the camera frame rate fluctuates.
+    """
+
+    def __init__(self,
+                 process_noise: float = 5e5,
+                 measurement_noise: float = 4.0,
+                 max_gap: float = 0.1,
+                 gate_sigma: float = 3.0):
+        """
+        Initialize the filter.
+
+        Args:
+            process_noise: Jerk spectral density (px²/s⁵); higher follows bounces/hits faster
+            measurement_noise: Detection position variance (px²)
+            max_gap: Longest dropout (seconds) to predict across before the track is lost
+            gate_sigma: Search window size in standard deviations of the predicted position
+        """
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.max_gap = max_gap
+        self.gate_sigma = gate_sigma
+
+        # Measurement model: we observe position only
+        self.H = np.zeros((2, 6))
+        self.H[0, 0] = 1.0
+        self.H[1, 1] = 1.0
+        self.R = np.eye(2) * measurement_noise
+
+        self.state: Optional[np.ndarray] = None  # [x, y, vx, vy, ax, ay]
+        self.covariance: Optional[np.ndarray] = None
+        self.last_timestamp: Optional[float] = None  # Time of the current state
+        self.last_update: Optional[float] = None  # Time of the last measurement
+
+    @property
+    def initialized(self) -> bool:
+        """Whether the filter has received at least one measurement."""
+        return self.state is not None
+
+    def _transition(self, dt: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Build the state transition and process noise matrices for a time step."""
+        # Per-axis [position, velocity, acceleration] model, expanded to (x, y)
+        f_axis = np.array([
+            [1.0, dt, 0.5 * dt * dt],
+            [0.0, 1.0, dt],
+            [0.0, 0.0, 1.0]
+        ])
+        q_axis = self.process_noise * np.array([
+            [dt**5 / 20, dt**4 / 8, dt**3 / 6],
+            [dt**4 / 8, dt**3 / 3, dt**2 / 2],
+            [dt**3 / 6, dt**2 / 2, dt]
+        ])
+        identity = np.eye(2)
+        return np.kron(f_axis, identity), np.kron(q_axis, identity)
+
+    def reset(self):
+        """Forget the current track."""
+        self.state = None
+        self.covariance = None
+        self.last_timestamp = None
+        self.last_update = None
+
+    def predict(self, timestamp: float) -> Optional[Tuple[float, float]]:
+        """
+        Advance the state to a timestamp.
+
+        Args:
+            timestamp: Time in seconds to advance to
+
+        Returns:
+            Predicted (x, y) position, or None if the filter is not initialized
+        """
+        if not self.initialized:
+            return None
+
+        dt = timestamp - self.last_timestamp
+        if dt > 0:
+            F, Q = self._transition(dt)
+            self.state = F @ self.state
+            self.covariance = F @ self.covariance @ F.T + Q
+            self.last_timestamp = timestamp
+
+        return (float(self.state[0]), float(self.state[1]))
+
+    def update(self, x: float, y: float, timestamp: float) -> Tuple[float, float, float, float]:
+        """
+        Incorporate a detection.
+
+        Args:
+            x: Detected x position (pixels)
+            y: Detected y position (pixels)
+            timestamp: Detection time in seconds
+
+        Returns:
+            Filtered (x, y, vx, vy) with velocity in pixels per second
+        """
+        # (Re)start the track on the first detection or after a long dropout
+        if not self.initialized or self.is_lost(timestamp):
+            self.state = np.array([x, y, 0.0, 0.0, 0.0, 0.0])
+            self.covariance = np.diag([self.measurement_noise, self.measurement_noise,
+                                       1e6, 1e6, 1e8, 1e8])
+            self.last_timestamp = timestamp
+            self.last_update = timestamp
+            return (x, y, 0.0, 0.0)
+
+        self.predict(timestamp)
+
+        innovation = np.array([x, y]) - self.H @ self.state
+        S = self.H @ self.covariance @ self.H.T + self.R
+        K = self.covariance @ self.H.T @ np.linalg.inv(S)
+        self.state = self.state + K @ innovation
+        self.covariance = (np.eye(6) - K @ self.H) @ self.covariance
+        self.last_update = timestamp
+
+        return (float(self.state[0]), float(self.state[1]),
+                float(self.state[2]), float(self.state[3]))
+
+    def predict_position(self, timestamp: float) -> Optional[Tuple[float, float]]:
+        """
+        Predict the position at a timestamp without changing the filter state.
+
+        Args:
+            timestamp: Time in seconds
+
+        Returns:
+            Predicted (x, y) position, or None if the filter is not initialized
+        """
+        if not self.initialized:
+            return None
+
+        dt = max(0.0, timestamp - self.last_timestamp)
+        F, _ = self._transition(dt)
+        predicted = F @ self.state
+        return (float(predicted[0]), float(predicted[1]))
+
+    def search_radius(self, timestamp: float) -> Optional[float]:
+        """
+        Radius (pixels) of the gating window around the predicted position.
+
+        Args:
+            timestamp: Time in seconds
+
+        Returns:
+            gate_sigma standard deviations of the predicted position, or None if not initialized
+        """
+        if not self.initialized:
+            return None
+
+        dt = max(0.0, timestamp - self.last_timestamp)
+        F, Q = self._transition(dt)
+        covariance = F @ self.covariance @ F.T + Q
+        position_var = max(covariance[0, 0], covariance[1, 1]) + self.measurement_noise
+        return float(self.gate_sigma * np.sqrt(position_var))
+
+    def in_gate(self, x: float, y: float, timestamp: float) -> bool:
+        """Check whether a detection falls inside the predicted search window."""
+        predicted = self.predict_position(timestamp)
+        if predicted is None:
+            return True
+        return np.hypot(x - predicted[0], y - predicted[1]) <= self.search_radius(timestamp)
+
+    def is_lost(self, timestamp: float) -> bool:
+        """Whether the last detection is too old to keep predicting from."""
+        if self.last_update is None:
+            return True
+        return timestamp - self.last_update > self.max_gap
+
+    def get_velocity(self) -> Optional[Tuple[float, float]]:
+        """Current velocity estimate (px/s), or None if not initialized."""
+        if not self.initialized:
+            return None
+        return (float(self.state[2]), float(self.state[3]))
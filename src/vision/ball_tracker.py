@@ -2,16 +2,20 @@
 Ball tracker for table tennis using YOLO object detection.
 Tracks ball position and draws trajectory lines.
 """
-from typing import List, Tuple, Optional, Deque
+from typing import List, Tuple, Optional, Deque, Dict
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from pathlib import Path
 from collections import deque
 import sys
 
 sys.path.append(str(Path(__file__).parent.parent))
 from models.ball_data import BallData
+from vision.ball_kalman import BallKalmanFilter
+from vision.model_registry import get_model
+
+# Ultralytics input size when none is given
+DEFAULT_IMGSZ = 640
 
 
 class BallTracker:
@@ -20,24 +24,81 @@ class BallTracker:
     Maintains trajectory history and calculates ball speed.
     """
     
-    def __init__(self, model_path: str = "best.pt", max_trajectory: int = 30):
+    def __init__(self, model_path: str = "best.pt", max_trajectory: int = 30,
+                 use_roi: bool = False, roi_size: int = 320, full_search_interval: int = 30,
+                 fill_gaps: bool = False, use_half: bool = True, device: str = 'mps',
+                 imgsz: Optional[int] = None, tiled: bool = False, tile_size: int = 640,
+                 tile_overlap: float = 0.2, tile_confidence: float = 0.25,
+                 table_region: Optional[Tuple[float, float, float, float]] = None,
+                 nms_threshold: float = 0.5):
         """
         Initialize the ball tracker with YOLO model.
         
         Args:
             model_path: Path to YOLO model weights (best.pt for ball detection)
             max_trajectory: Maximum number of positions to keep in trajectory
+            use_roi: Search only a crop around the predicted ball position when possible; a miss
+                     in the crop is retried on the full frame at the next frame
+            roi_size: Minimum side length (pixels) of the square search crop
+            full_search_interval: Force a full-frame search every N frames in ROI mode
+            fill_gaps: Return predicted positions (BallData.predicted=True) during short dropouts
+            use_half: Use FP16 half-precision inference (ignored by exported INT8 models)
+            device: Inference device ('mps' for Apple Silicon, 'cpu', 'cuda:0', ...)
+            imgsz: Model input size (None = the model's default; see imgsz_autotuner)
+            tiled: Search overlapping full-resolution tiles in one batched call instead of the
+                   downscaled frame (for 1080p/4K footage, where the ball shrinks to a few pixels)
+            tile_size: Tile side length in pixels (tiles are sent to the model unscaled)
+            tile_overlap: Overlap between neighbouring tiles as a fraction of tile_size
+            tile_confidence: Minimum confidence in tiled mode (tiles keep the ball large enough
+                             for a realistic threshold)
+            table_region: Optional (x0, y0, x1, y1) area, as fractions of the frame, where the ball
+                          is in play (table and the space above it); tiles outside it are skipped
+                          while there is no predicted ball position
+            nms_threshold: Overlap (intersection over the smaller box) above which boxes from
+                           neighbouring tiles are merged
         """
+        # Shared with every other tracker in this process that uses the same weights, device and precision
         print(f"Loading ball detection model: {model_path}")
-        self.model = YOLO(model_path)
+        self.model = get_model(model_path, device=device, half=use_half)
         
         # Print model classes for debugging
         print(f"Model classes: {self.model.names}")
         
+        self.use_half = use_half
+        self.device = device
+        self.imgsz = imgsz
+        
         # Trajectory history (deque for efficient FIFO)
         self.trajectory: Deque[Tuple[int, int]] = deque(maxlen=max_trajectory)
         self.max_trajectory = max_trajectory
         
+        # Kalman filter for smoothed position, px/s velocity and dropout prediction
+        self.kalman = BallKalmanFilter()
+        self.fill_gaps = fill_gaps
+        
+        # Region-of-interest search (motion-predicted crop instead of full frame)
+        self.use_roi = use_roi
+        self.roi_size = roi_size
+        self.full_search_interval = full_search_interval
+        self.frames_since_full_search = 0
+        self.roi_missed = False  # Last crop search missed, next frame searches the full frame
+        self.roi_searches = 0
+        self.full_searches = 0
+        
+        # Tiled search (tiles near the predicted path or the table region only)
+        self.tiled = tiled
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_confidence = tile_confidence
+        self.table_region = table_region
+        self.nms_threshold = nms_threshold
+        self.tile_grids: Dict[Tuple[int, int], np.ndarray] = {}  # Frame (height, width) -> tiles
+        self.tiled_searches = 0
+        self.tiles_searched = 0
+        self.tiles_skipped = 0
+        self.raw_boxes = 0
+        self.merged_boxes = 0
+        
         # Minimum confidence threshold (very low for difficult table tennis ball detection)
         self.min_confidence = 0.01  # Ultra-low threshold for small, fast-moving table tennis balls
         
@@ -61,13 +122,168 @@ class BallTracker:
         Returns:
             BallData object if ball detected, None otherwise
         """
+        tracking = self.kalman.initialized and not self.kalman.is_lost(timestamp)
+        ball_data = self.detect(frame, frame_number, timestamp)
+        
+        if ball_data is None:
+            return self.handle_miss(frame_number, timestamp, tracking)
+        
+        # Smooth position and get real time-based velocity from the filter
+        x, y, vx, vy = self.kalman.update(ball_data.x, ball_data.y, timestamp)
+        ball_data.x, ball_data.y = x, y
+        if tracking:
+            ball_data.velocity_x = vx
+            ball_data.velocity_y = vy
+            ball_data.speed = float(np.hypot(vx, vy))
+        
+        # Add to trajectory
+        self.trajectory.append((int(ball_data.x), int(ball_data.y)))
+        
+        return ball_data
+    
+    def detect(self, frame: np.ndarray, frame_number: int, timestamp: float) -> Optional[BallData]:
+        """
+        Detect the ball without updating the trajectory or Kalman filter.
+        
+        Searches tiles in tiled mode, the predicted region in ROI mode, otherwise the full frame.
+        
+        Args:
+            frame: Input frame (BGR format)
+            frame_number: Current frame number
+            timestamp: Timestamp in seconds from video start
+            
+        Returns:
+            Raw BallData detection in full-frame coordinates, or None
+        """
+        if self.tiled:
+            return self._detect_tiled(frame, frame_number, timestamp)
+        
+        # Try the predicted region first
+        roi = self._get_search_roi(frame, timestamp) if self.use_roi else None
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            self.roi_searches += 1
+            self.frames_since_full_search += 1
+            ball_data = self._detect_in_image(frame[y0:y1, x0:x1], frame_number, timestamp,
+                                              offset=(x0, y0), crop=True)
+            self.roi_missed = ball_data is None
+            return ball_data
+        
+        # Full-frame search when there is no prediction to search around, after a crop miss
+        # or at the fixed interval
+        self.roi_missed = False
+        self.full_searches += 1
+        self.frames_since_full_search = 0
+        return self._detect_in_image(frame, frame_number, timestamp)
+    
+    def predict_position(self, timestamp: float) -> Optional[Tuple[float, float]]:
+        """
+        Predict the ball position at a timestamp from the Kalman filter.
+        
+        Args:
+            timestamp: Time in seconds from video start
+            
+        Returns:
+            Predicted (x, y) position, or None if the ball is not being tracked
+        """
+        if self.kalman.is_lost(timestamp):
+            return None
+        return self.kalman.predict_position(timestamp)
+    
+    def handle_miss(self, frame_number: int, timestamp: float, tracking: bool) -> Optional[BallData]:
+        """
+        Handle a frame without a detection.
+        
+        Args:
+            frame_number: Current frame number
+            timestamp: Timestamp in seconds from video start
+            tracking: Whether the track was live before this frame
+        
+        Returns:
+            Predicted BallData during a short dropout if gap filling is enabled, None otherwise
+        """
+        if not (self.fill_gaps and tracking):
+            return None
+        
+        x, y = self.kalman.predict(timestamp)
+        vx, vy = self.kalman.get_velocity()
+        self.trajectory.append((int(x), int(y)))
+        
+        return BallData(
+            frame_number=frame_number,
+            timestamp=timestamp,
+            x=x,
+            y=y,
+            confidence=0.0,
+            velocity_x=vx,
+            velocity_y=vy,
+            speed=float(np.hypot(vx, vy)),
+            predicted=True
+        )
+    
+    def _get_search_roi(self, frame: np.ndarray, timestamp: float) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Get the crop to search around the predicted ball position.
+        
+        Returns:
+            (x0, y0, x1, y1) crop in frame coordinates, or None for a full-frame search
+        """
+        if self.roi_missed or self.frames_since_full_search >= self.full_search_interval:
+            return None
+        
+        predicted = self.predict_position(timestamp)
+        if predicted is None:
+            return None
+        
+        height, width = frame.shape[:2]
+        
+        # Grow the crop with the prediction uncertainty so fast balls stay inside it
+        half = self.roi_size // 2 + int(self.kalman.search_radius(timestamp))
+        
+        x0 = max(0, int(predicted[0]) - half)
+        y0 = max(0, int(predicted[1]) - half)
+        x1 = min(width, int(predicted[0]) + half)
+        y1 = min(height, int(predicted[1]) + half)
+        
+        # Prediction left the frame or the crop covers most of it anyway
+        if x1 - x0 < 32 or y1 - y0 < 32:
+            return None
+        if (x1 - x0) * (y1 - y0) >= 0.5 * width * height:
+            return None
+        
+        return (x0, y0, x1, y1)
+    
+    def _detect_in_image(self, image: np.ndarray, frame_number: int, timestamp: float,
+                         offset: Tuple[int, int] = (0, 0), crop: bool = False) -> Optional[BallData]:
+        """
+        Run YOLO on an image (full frame or crop) and return the best ball detection.
+        
+        Args:
+            image: Image to search (BGR format)
+            frame_number: Current frame number
+            timestamp: Timestamp in seconds from video start
+            offset: (x, y) position of the image's top-left corner in the full frame
+            crop: The image is a search crop (run at its own size, not the model default)
+            
+        Returns:
+            BallData in full-frame coordinates, or None if no ball was found
+        """
         # Run YOLO detection with optimizations
+        inference_args = {}
+        image_size = -(-max(image.shape[:2]) // 32) * 32  # Rounded up to the 32 px stride
+        if self.imgsz:
+            # Crops are not upscaled beyond the tuned size
+            inference_args['imgsz'] = min(self.imgsz, image_size)
+        elif crop:
+            # Without a tuned size, a small crop would be letterboxed up to the default 640
+            inference_args['imgsz'] = min(DEFAULT_IMGSZ, image_size)
         results = self.model(
-            frame,
+            image,
             conf=self.min_confidence,
             verbose=False,
-            half=True,  # FP16 for speed
-            device='mps'  # Apple Metal GPU
+            half=self.use_half,  # FP16 for speed
+            device=self.device,  # Apple Metal GPU by default
+            **inference_args
         )
         
         if len(results) == 0 or results[0].boxes is None or len(results[0].boxes) == 0:
@@ -90,11 +306,7 @@ class BallTracker:
             if frame_number < 10 or frame_number % 100 == 0:
                 print(f"Frame {frame_number}: Detected '{class_name}' (class_id={class_id}) with conf={conf:.3f}")
             
-            # Check if class name matches any of our target classes or contains "ball"
-            is_ball = (class_name in self.target_classes or 
-                      "ball" in class_name.lower())
-            
-            if is_ball and conf > best_conf:
+            if self._is_ball_class(class_id) and conf > best_conf:
                 best_conf = conf
                 best_detection = box
                 if frame_number < 10:
@@ -103,23 +315,157 @@ class BallTracker:
         if best_detection is None:
             return None
         
-        # Create BallData
+        # Create BallData and map crop coordinates back to the full frame
         ball_data = BallData.from_detection(best_detection, frame_number, timestamp)
+        ball_data.x += offset[0]
+        ball_data.y += offset[1]
         
-        # Add to trajectory
-        self.trajectory.append((int(ball_data.x), int(ball_data.y)))
+        return ball_data
+    
+    def _is_ball_class(self, class_id: int) -> bool:
+        """Check if a class is one of our target classes or contains "ball"."""
+        class_name = self.model.names[class_id]
+        return class_name in self.target_classes or "ball" in class_name.lower()
+    
+    def _tile_grid(self, height: int, width: int) -> np.ndarray:
+        """
+        Get the overlapping tiles covering a frame (all the same size, so they batch).
         
-        # Calculate velocity if we have previous positions
-        if len(self.trajectory) >= 2:
-            prev_pos = self.trajectory[-2]
-            curr_pos = self.trajectory[-1]
+        Returns:
+            Array of (x0, y0, x1, y1) tiles
+        """
+        grid = self.tile_grids.get((height, width))
+        if grid is not None:
+            return grid
+        
+        def starts(length: int, tile: int) -> List[int]:
+            if tile >= length:
+                return [0]
+            count = int(np.ceil((length - tile) / (tile * (1 - self.tile_overlap)))) + 1
+            return np.linspace(0, length - tile, count).round().astype(int).tolist()
+        
+        tile_width = min(self.tile_size, width)
+        tile_height = min(self.tile_size, height)
+        grid = np.array([(x, y, x + tile_width, y + tile_height)
+                         for y in starts(height, tile_height) for x in starts(width, tile_width)])
+        self.tile_grids[(height, width)] = grid
+        return grid
+    
+    def _select_tiles(self, grid: np.ndarray, frame_shape: Tuple[int, ...], timestamp: float) -> np.ndarray:
+        """
+        Choose the tiles worth searching: those near the predicted ball position, or
+        inside the table region while the ball is not tracked. Every
+        full_search_interval frames all tiles are searched.
+        
+        Returns:
+            Boolean mask over the grid
+        """
+        everything = np.ones(len(grid), dtype=bool)
+        if self.frames_since_full_search >= self.full_search_interval:
+            return everything
+        
+        height, width = frame_shape[:2]
+        predicted = self.predict_position(timestamp)
+        if predicted is not None:
+            half = self.roi_size // 2 + self.kalman.search_radius(timestamp)
+            area = (predicted[0] - half, predicted[1] - half, predicted[0] + half, predicted[1] + half)
+        elif self.table_region is not None:
+            x0, y0, x1, y1 = self.table_region
+            area = (x0 * width, y0 * height, x1 * width, y1 * height)
+        else:
+            return everything
+        
+        selected = ((grid[:, 0] < area[2]) & (grid[:, 2] > area[0]) &
+                    (grid[:, 1] < area[3]) & (grid[:, 3] > area[1]))
+        
+        # Prediction left the frame
+        return selected if selected.any() else everything
+    
+    @staticmethod
+    def _merge_boxes(boxes: np.ndarray, scores: np.ndarray, threshold: float) -> np.ndarray:
+        """
+        Cross-tile non-maximum suppression.
+        Overlap is measured as intersection over the smaller box, so a ball cut
+        at a tile edge is merged with the full detection from the neighbouring tile.
+        
+        Returns:
+            Indices of the kept boxes, highest score first
+        """
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        order = np.argsort(-scores)
+        keep = []
+        while len(order) > 0:
+            best, rest = order[0], order[1:]
+            keep.append(best)
+            overlap_width = np.minimum(boxes[best, 2], boxes[rest, 2]) - np.maximum(boxes[best, 0], boxes[rest, 0])
+            overlap_height = np.minimum(boxes[best, 3], boxes[rest, 3]) - np.maximum(boxes[best, 1], boxes[rest, 1])
+            intersection = np.clip(overlap_width, 0, None) * np.clip(overlap_height, 0, None)
+            smaller = np.maximum(np.minimum(areas[best], areas[rest]), 1e-6)
+            order = rest[intersection / smaller <= threshold]
+        return np.array(keep, dtype=int)
+    
+    def _detect_tiled(self, frame: np.ndarray, frame_number: int, timestamp: float) -> Optional[BallData]:
+        """
+        Search the selected tiles in one batched model call and merge the boxes across tiles.
+        
+        Args:
+            frame: Input frame (BGR format)
+            frame_number: Current frame number
+            timestamp: Timestamp in seconds from video start
             
-            # Assuming consistent frame rate, velocity in pixels per frame
-            ball_data.velocity_x = curr_pos[0] - prev_pos[0]
-            ball_data.velocity_y = curr_pos[1] - prev_pos[1]
-            ball_data.speed = np.sqrt(ball_data.velocity_x**2 + ball_data.velocity_y**2)
+        Returns:
+            Best merged BallData in full-frame coordinates, or None
+        """
+        grid = self._tile_grid(*frame.shape[:2])
+        selected = self._select_tiles(grid, frame.shape, timestamp)
+        tiles = grid[selected]
         
-        return ball_data
+        self.tiled_searches += 1
+        self.tiles_searched += len(tiles)
+        self.tiles_skipped += len(grid) - len(tiles)
+        if selected.all():
+            self.frames_since_full_search = 0
+        else:
+            self.frames_since_full_search += 1
+        
+        # Tiles go in at their own resolution (rounded up to the 32 px stride), not downscaled
+        crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in tiles]
+        results = self.model(
+            crops,
+            conf=self.tile_confidence,
+            verbose=False,
+            half=self.use_half,
+            device=self.device,
+            imgsz=-(-int(max(tiles[0, 2] - tiles[0, 0], tiles[0, 3] - tiles[0, 1])) // 32) * 32
+        )
+        
+        boxes, scores = [], []
+        for (x0, y0, _, _), result in zip(tiles, results):
+            if result.boxes is None or len(result.boxes) == 0:
+                continue
+            is_ball = np.array([self._is_ball_class(int(c)) for c in result.boxes.cls.cpu().numpy()])
+            if not is_ball.any():
+                continue
+            boxes.append(result.boxes.xyxy.cpu().numpy()[is_ball] + np.array([x0, y0, x0, y0]))
+            scores.append(result.boxes.conf.cpu().numpy()[is_ball])
+        
+        if not boxes:
+            return None
+        
+        boxes = np.concatenate(boxes)
+        scores = np.concatenate(scores)
+        keep = self._merge_boxes(boxes, scores, self.nms_threshold)
+        self.raw_boxes += len(boxes)
+        self.merged_boxes += len(keep)
+        
+        best = keep[0]
+        return BallData(
+            frame_number=frame_number,
+            timestamp=timestamp,
+            x=float((boxes[best, 0] + boxes[best, 2]) / 2),
+            y=float((boxes[best, 1] + boxes[best, 3]) / 2),
+            confidence=float(scores[best])
+        )
     
     def visualize_ball(self, frame: np.ndarray, ball_data: Optional[BallData]) -> np.ndarray:
         """
@@ -166,7 +512,7 @@ class BallTracker:
                        0.5, (255, 255, 255), 2)
             
             # Draw speed if available
-            if ball_data.speed is not None and ball_data.speed > 5:
+            if ball_data.speed is not None and ball_data.speed > 150:
                 speed_text = f"{ball_data.speed:.0f} px/s"
                 cv2.putText(frame, speed_text,
                            (center[0] + 20, center[1] + 10),
@@ -175,6 +521,24 @@ class BallTracker:
         
         return frame
     
+    def get_search_statistics(self) -> Dict:
+        """Get counts of ROI, full-frame and tiled detector calls."""
+        stats = {
+            'roi_searches': self.roi_searches,
+            'full_frame_searches': self.full_searches
+        }
+        if self.tiled:
+            stats.update({
+                'tiled_searches': self.tiled_searches,
+                'tiles_searched': self.tiles_searched,
+                'tiles_skipped': self.tiles_skipped,
+                'raw_boxes': self.raw_boxes,
+                'merged_boxes': self.merged_boxes
+            })
+        return stats
+    
     def reset_trajectory(self):
         """Clear the trajectory history."""
         self.trajectory.clear()
+        self.kalman.reset()
+        self.roi_missed = False
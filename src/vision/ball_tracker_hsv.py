@@ -2,7 +2,7 @@
 Ball tracker for table tennis using HSV color detection.
 Tracks orange ball position and draws trajectory lines.
 """
-from typing import List, Tuple, Optional, Deque
+from typing import List, Tuple, Optional, Deque, Dict
 import cv2
 import numpy as np
 from pathlib import Path
@@ -11,6 +11,7 @@ import sys
 
 sys.path.append(str(Path(__file__).parent.parent))
 from models.ball_data import BallData
+from vision.ball_kalman import BallKalmanFilter
 
 
 class BallTrackerHSV:
@@ -19,7 +20,10 @@ class BallTrackerHSV:
     Maintains trajectory history and calculates ball speed.
     """
     
-    def __init__(self, hsv_lower: List[int] = None, hsv_upper: List[int] = None, max_trajectory: int = 50):
+    def __init__(self, hsv_lower: List[int] = None, hsv_upper: List[int] = None, max_trajectory: int = 50,
+                 fill_gaps: bool = False, fast_mode: bool = False, pyramid_levels: int = 1,
+                 roi_size: int = 256, full_search_interval: int = 30,
+                 candidate_method: str = "contours", ball_radius: Optional[float] = None):
         """
         Initialize the ball tracker with HSV color detection.
         
@@ -27,6 +31,16 @@ class BallTrackerHSV:
             hsv_lower: Lower HSV threshold [H, S, V] for orange ball
             hsv_upper: Upper HSV threshold [H, S, V] for orange ball
             max_trajectory: Maximum number of positions to keep in trajectory
+            fill_gaps: Return predicted positions (BallData.predicted=True) during short dropouts
+            fast_mode: Use the downscaled, buffer-reusing ROI pipeline (for high-fps cameras)
+            pyramid_levels: Maximum number of pyrDown halvings applied in fast mode; fewer are
+                            used when the ball would shrink below min_fast_radius pixels
+            roi_size: Side length (full-resolution pixels) of the fast-mode search window
+            full_search_interval: Force a full-frame search every N frames in fast mode
+            candidate_method: "contours" (per-contour scoring loop) or "components"
+                              (connected components + vectorized scoring, rejects hollow blobs)
+            ball_radius: Expected ball radius in full-resolution pixels, used to pick the fast-mode
+                         pyramid depth (None = frame width / 128, a full-table view)
         """
         print(f"Initializing HSV color-based ball tracker")
         
@@ -41,6 +55,10 @@ class BallTrackerHSV:
         self.trajectory: Deque[Tuple[int, int]] = deque(maxlen=max_trajectory)
         self.max_trajectory = max_trajectory
         
+        # Kalman filter for smoothed position, px/s velocity and dropout prediction
+        self.kalman = BallKalmanFilter()
+        self.fill_gaps = fill_gaps
+        
         # Ball color for visualization (orange: #fa8b32)
         self.ball_color = (50, 139, 250)  # BGR format (OpenCV uses BGR)
         self.trajectory_color = (255, 0, 0)  # Blue for trajectory line
@@ -49,6 +67,26 @@ class BallTrackerHSV:
         self.min_area = 50
         self.max_area = 5000
         self.min_circularity = 0.6  # Minimum circularity threshold (1.0 = perfect circle)
+        
+        # Candidate stage; the components method prefilters all blobs at once on
+        # cheap shape features before computing circularity
+        self.candidate_method = candidate_method
+        self.min_fill_ratio = 0.4  # Blob area / bounding box area (circle = 0.785)
+        self.max_aspect_ratio = 3.5  # Motion-blurred balls stay below this
+        
+        # Fast path: downscaled processing inside a fixed-size window around the prediction
+        self.fast_mode = fast_mode
+        self.pyramid_levels = pyramid_levels
+        self.ball_radius = ball_radius
+        self.min_fast_radius = 4.0  # Smaller blobs do not survive erosion and the area/circularity filters
+        self.roi_size = roi_size
+        self.full_search_interval = full_search_interval
+        self.frames_since_full_search = 0
+        self.roi_searches = 0
+        self.full_searches = 0
+        
+        # Preallocated dst buffers, keyed by input (height, width, pyramid levels)
+        self._buffers: Dict[Tuple[int, int, int], Dict] = {}
     
     def process_frame(self, frame: np.ndarray, frame_number: int, timestamp: float) -> Optional[BallData]:
         """
@@ -62,6 +100,58 @@ class BallTrackerHSV:
         Returns:
             BallData object if ball detected, None otherwise
         """
+        tracking = self.kalman.initialized and not self.kalman.is_lost(timestamp)
+        candidate = self.detect(frame, timestamp)
+        
+        if candidate is None:
+            return self.handle_miss(frame_number, timestamp, tracking)
+        
+        center_x, center_y, best_score = candidate
+        
+        # Create BallData with high confidence (HSV is reliable when it finds something)
+        ball_data = BallData(
+            frame_number=frame_number,
+            timestamp=timestamp,
+            x=float(center_x),
+            y=float(center_y),
+            confidence=min(best_score, 1.0)  # Normalize score to 0-1
+        )
+        
+        # Smooth position and get real time-based velocity from the filter
+        x, y, vx, vy = self.kalman.update(ball_data.x, ball_data.y, timestamp)
+        ball_data.x, ball_data.y = x, y
+        if tracking:
+            ball_data.velocity_x = vx
+            ball_data.velocity_y = vy
+            ball_data.speed = float(np.hypot(vx, vy))
+        
+        # Add to trajectory
+        self.trajectory.append((int(x), int(y)))
+        
+        return ball_data
+    
+    def detect(self, frame: np.ndarray, timestamp: float) -> Optional[Tuple[float, float, float]]:
+        """
+        Detect the ball without updating the trajectory or Kalman filter.
+        
+        Args:
+            frame: Input frame (BGR format)
+            timestamp: Timestamp in seconds from video start
+            
+        Returns:
+            (center_x, center_y, score) in full-resolution coordinates, or None
+        """
+        if self.fast_mode:
+            return self._detect_fast(frame, timestamp)
+        return self._detect_full(frame)
+    
+    def _detect_full(self, frame: np.ndarray) -> Optional[Tuple[float, float, float]]:
+        """
+        Detect the ball at full resolution over the whole frame.
+        
+        Returns:
+            (center_x, center_y, score) of the best candidate, or None
+        """
         # Blur and convert to HSV
         blurred = cv2.GaussianBlur(frame, (11, 11), 0)
         hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)
@@ -73,25 +163,179 @@ class BallTrackerHSV:
         mask = cv2.erode(mask, None, iterations=2)
         mask = cv2.dilate(mask, None, iterations=2)
         
-        # Find contours
-        contours, _ = cv2.findContours(mask.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        candidate = self._find_candidate(mask)
+        if candidate is None:
+            return None
+        
+        # Calculate center of the bounding rectangle
+        x, y, w, h, best_score = candidate
+        return (float(x + w // 2), float(y + h // 2), best_score)
+    
+    def _detect_fast(self, frame: np.ndarray, timestamp: float) -> Optional[Tuple[float, float, float]]:
+        """
+        Detect the ball on a downscaled window using preallocated buffers.
+        
+        Searches a fixed-size window around the predicted position while the ball
+        is tracked, otherwise the whole frame. Every OpenCV step writes into a
+        buffer reused across frames of the same window size.
+        
+        Returns:
+            (center_x, center_y, score) in full-resolution coordinates, or None
+        """
+        height, width = frame.shape[:2]
+        
+        roi = self._get_search_roi(width, height, timestamp)
+        if roi is not None:
+            self.roi_searches += 1
+            self.frames_since_full_search += 1
+        else:
+            roi = (0, 0, width, height)
+            self.full_searches += 1
+            self.frames_since_full_search = 0
+        
+        x0, y0, x1, y1 = roi
+        image = frame[y0:y1, x0:x1]
+        levels = self._fast_levels(width)
+        buffers = self._get_buffers(y1 - y0, x1 - x0, levels)
+        
+        # Downscale (pyrDown also low-pass filters), then the same pipeline as full resolution
+        for level in buffers['pyramid']:
+            image = cv2.pyrDown(image, dst=level)
+        
+        # Blur and morphology shrink with the image so the filters cover the same area
+        ksize = max(3, (11 >> levels) | 1)
+        iterations = max(1, 2 >> levels)
+        cv2.GaussianBlur(image, (ksize, ksize), 0, dst=buffers['blur'])
+        cv2.cvtColor(buffers['blur'], cv2.COLOR_BGR2HSV, dst=buffers['hsv'])
+        cv2.inRange(buffers['hsv'], self.hsv_lower, self.hsv_upper, dst=buffers['mask'])
+        cv2.erode(buffers['mask'], None, dst=buffers['morph'], iterations=iterations)
+        cv2.dilate(buffers['morph'], None, dst=buffers['mask'], iterations=iterations)
+        
+        scale = 2 ** levels
+        candidate = self._find_candidate(buffers['mask'], area_scale=scale * scale)
+        if candidate is None:
+            return None
+        
+        # Map the bounding box center back to full resolution
+        x, y, w, h, best_score = candidate
+        return (x0 + (x + w / 2) * scale, y0 + (y + h / 2) * scale, best_score)
+    
+    def _find_candidate(self, mask: np.ndarray,
+                        area_scale: float = 1.0) -> Optional[Tuple[int, int, int, int, float]]:
+        """
+        Find the best ball candidate in a binary mask.
+        
+        Args:
+            mask: Cleaned-up HSV mask (not modified)
+            area_scale: Factor converting mask pixel area to full-resolution pixels
+            
+        Returns:
+            (x, y, w, h, score) bounding box in mask coordinates, or None
+        """
+        if self.candidate_method == "contours":
+            # findContours no longer modifies its input, so no mask copy is needed
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            best_contour, best_score = self._score_contours(contours, area_scale)
+            if best_contour is None:
+                return None
+            x, y, w, h = cv2.boundingRect(best_contour)
+            return (x, y, w, h, best_score)
+        
+        return self._score_components(mask, area_scale)
+    
+    def _score_components(self, mask: np.ndarray,
+                          area_scale: float = 1.0) -> Optional[Tuple[int, int, int, int, float]]:
+        """
+        Score candidates from connected components instead of a per-contour loop.
+        
+        All components are filtered at once with NumPy on area, fill ratio and
+        aspect ratio. Circularity needs a contour, so it is only computed for the
+        survivors, best possible score first, stopping once no remaining
+        component can beat the current best. Scores match _score_contours,
+        except that hollow blobs are rejected instead of scored by their outline.
+        
+        Returns:
+            (x, y, w, h, score) bounding box in mask coordinates, or None
+        """
+        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        if num_labels <= 1:
+            return None
+        
+        # Skip the background label
+        stats = stats[1:]
+        x, y, w, h = stats[:, 0], stats[:, 1], stats[:, 2], stats[:, 3]
+        pixel_area = stats[:, cv2.CC_STAT_AREA].astype(np.float64)
+        
+        # Pixel counts overestimate the contour area by at most about one boundary ring
+        area = pixel_area * area_scale
+        boundary = 2.0 * (w + h) * area_scale
+        fill_ratio = pixel_area / (w * h)
+        aspect_ratio = np.maximum(w, h) / np.minimum(w, h)
         
-        if len(contours) == 0:
+        keep = ((area > self.min_area) &
+                (area - boundary < self.max_area) &
+                (fill_ratio >= self.min_fill_ratio) &
+                (aspect_ratio <= self.max_aspect_ratio))
+        survivors = np.flatnonzero(keep)
+        if len(survivors) == 0:
             return None
         
-        # Find the best candidate (most circular, reasonable size)
+        # Upper bound on the final score: a closed contour spanning its bounding box is at
+        # least as long as the inscribed diamond, which bounds circularity for long blobs
+        diagonal_sq = 4.0 * ((w - 1.0) ** 2 + (h - 1.0) ** 2)
+        circularity_bound = np.minimum(4 * np.pi * pixel_area / np.maximum(diagonal_sq, 1.0), 1.0)
+        upper_bound = circularity_bound * np.minimum(area / 500, 1.0)
+        
+        # Check the most promising (highest bound, then roundest) components first
+        roundness = np.abs(fill_ratio - np.pi / 4) + (aspect_ratio - 1.0)
+        order = np.lexsort((roundness[survivors], -upper_bound[survivors]))
+        survivors = survivors[order]
+        
+        best = None
+        best_score = 0
+        
+        for i in survivors:
+            if upper_bound[i] <= best_score:
+                break
+            
+            bx, by, bw, bh = int(x[i]), int(y[i]), int(w[i]), int(h[i])
+            component = (labels[by:by + bh, bx:bx + bw] == i + 1).astype(np.uint8)
+            contours, _ = cv2.findContours(component, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            
+            # Hollow blobs (rings, letters like "O") enclose more area than they fill
+            if cv2.contourArea(contours[0]) > pixel_area[i]:
+                continue
+            
+            _, score = self._score_contours(contours, area_scale)
+            if score > best_score:
+                best_score = score
+                best = (bx, by, bw, bh, score)
+        
+        return best
+    
+    def _score_contours(self, contours, area_scale: float = 1.0) -> Tuple[Optional[np.ndarray], float]:
+        """
+        Find the best candidate (most circular, reasonable size).
+        
+        Args:
+            contours: Contours from cv2.findContours
+            area_scale: Factor converting contour area to full-resolution pixels
+            
+        Returns:
+            (best_contour, best_score), or (None, 0) if no contour qualifies
+        """
         best_contour = None
         best_score = 0
         
         for c in contours:
-            area = cv2.contourArea(c)
+            area = cv2.contourArea(c) * area_scale
             
             # Filter by area
             if area > self.min_area and area < self.max_area:
                 perimeter = cv2.arcLength(c, True)
                 if perimeter > 0:
-                    # Calculate circularity (1.0 = perfect circle)
-                    circularity = 4 * np.pi * area / (perimeter * perimeter)
+                    # Calculate circularity (1.0 = perfect circle, scale invariant)
+                    circularity = 4 * np.pi * area / (perimeter * perimeter * area_scale)
                     
                     # Score based on circularity and area
                     if circularity > self.min_circularity:
@@ -101,39 +345,108 @@ class BallTrackerHSV:
                             best_score = score
                             best_contour = c
         
-        if best_contour is None:
+        return best_contour, best_score
+    
+    def _get_search_roi(self, width: int, height: int, timestamp: float) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Get the fast-mode search window around the predicted ball position.
+        
+        The window has a fixed size (clamped inside the frame) so its buffers
+        can be reused from frame to frame.
+        
+        Returns:
+            (x0, y0, x1, y1) window in frame coordinates, or None for a full-frame search
+        """
+        if self.frames_since_full_search >= self.full_search_interval:
             return None
         
-        # Get bounding rectangle
-        x, y, w, h = cv2.boundingRect(best_contour)
+        predicted = self.predict_position(timestamp)
+        if predicted is None:
+            return None
         
-        # Calculate center
-        center_x = x + w // 2
-        center_y = y + h // 2
+        roi_width = min(self.roi_size, width)
+        roi_height = min(self.roi_size, height)
+        if roi_width * roi_height >= 0.5 * width * height:
+            return None
         
-        # Create BallData with high confidence (HSV is reliable when it finds something)
-        ball_data = BallData(
-            frame_number=frame_number,
-            timestamp=timestamp,
-            x=float(center_x),
-            y=float(center_y),
-            confidence=min(best_score, 1.0)  # Normalize score to 0-1
-        )
+        x0 = int(np.clip(predicted[0] - roi_width // 2, 0, width - roi_width))
+        y0 = int(np.clip(predicted[1] - roi_height // 2, 0, height - roi_height))
+        return (x0, y0, x0 + roi_width, y0 + roi_height)
+    
+    def _fast_levels(self, frame_width: int) -> int:
+        """Pyramid depth for a frame width: as deep as allowed while the ball stays min_fast_radius wide."""
+        radius = self.ball_radius if self.ball_radius is not None else frame_width / 128
+        levels = 0
+        while levels < self.pyramid_levels and radius / 2 ** (levels + 1) >= self.min_fast_radius:
+            levels += 1
+        return levels
+    
+    def _get_buffers(self, height: int, width: int, levels: int) -> Dict:
+        """Get (or allocate once) the fast-path buffers for an input size and pyramid depth."""
+        key = (height, width, levels)
+        buffers = self._buffers.get(key)
         
-        # Add to trajectory
-        self.trajectory.append((center_x, center_y))
+        if buffers is None:
+            pyramid = []
+            for _ in range(levels):
+                height, width = (height + 1) // 2, (width + 1) // 2
+                pyramid.append(np.empty((height, width, 3), dtype=np.uint8))
+            
+            buffers = {
+                'pyramid': pyramid,
+                'blur': np.empty((height, width, 3), dtype=np.uint8),
+                'hsv': np.empty((height, width, 3), dtype=np.uint8),
+                'mask': np.empty((height, width), dtype=np.uint8),
+                'morph': np.empty((height, width), dtype=np.uint8)
+            }
+            self._buffers[key] = buffers
+        
+        return buffers
+    
+    def predict_position(self, timestamp: float) -> Optional[Tuple[float, float]]:
+        """
+        Predict the ball position at a timestamp from the Kalman filter.
         
-        # Calculate velocity if we have previous positions
-        if len(self.trajectory) >= 2:
-            prev_pos = self.trajectory[-2]
-            curr_pos = self.trajectory[-1]
+        Args:
+            timestamp: Time in seconds from video start
             
-            # Velocity in pixels per frame
-            ball_data.velocity_x = curr_pos[0] - prev_pos[0]
-            ball_data.velocity_y = curr_pos[1] - prev_pos[1]
-            ball_data.speed = np.sqrt(ball_data.velocity_x**2 + ball_data.velocity_y**2)
+        Returns:
+            Predicted (x, y) position, or None if the ball is not being tracked
+        """
+        if self.kalman.is_lost(timestamp):
+            return None
+        return self.kalman.predict_position(timestamp)
+    
+    def handle_miss(self, frame_number: int, timestamp: float, tracking: bool) -> Optional[BallData]:
+        """
+        Handle a frame without a detection.
         
-        return ball_data
+        Args:
+            frame_number: Current frame number
+            timestamp: Timestamp in seconds from video start
+            tracking: Whether the track was live before this frame
+        
+        Returns:
+            Predicted BallData during a short dropout if gap filling is enabled, None otherwise
+        """
+        if not (self.fill_gaps and tracking):
+            return None
+        
+        x, y = self.kalman.predict(timestamp)
+        vx, vy = self.kalman.get_velocity()
+        self.trajectory.append((int(x), int(y)))
+        
+        return BallData(
+            frame_number=frame_number,
+            timestamp=timestamp,
+            x=x,
+            y=y,
+            confidence=0.0,
+            velocity_x=vx,
+            velocity_y=vy,
+            speed=float(np.hypot(vx, vy)),
+            predicted=True
+        )
     
     def visualize_ball(self, frame: np.ndarray, ball_data: Optional[BallData]) -> np.ndarray:
         """
@@ -185,8 +498,8 @@ class BallTrackerHSV:
                        0.5, (255, 255, 255), 2)
             
             # Draw speed if available
-            if ball_data.speed is not None and ball_data.speed > 1:
-                speed_text = f"Speed: {ball_data.speed:.0f} px/f"
+            if ball_data.speed is not None and ball_data.speed > 30:
+                speed_text = f"Speed: {ball_data.speed:.0f} px/s"
                 cv2.putText(frame, speed_text,
                            (x1, y2 + 40),
                            cv2.FONT_HERSHEY_SIMPLEX,
@@ -197,3 +510,4 @@ class BallTrackerHSV:
     def reset_trajectory(self):
         """Clear the trajectory history."""
         self.trajectory.clear()
+        self.kalman.reset()
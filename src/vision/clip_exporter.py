@@ -0,0 +1,392 @@
+"""
+Per-shot clip extraction.
+Cuts a short clip around each detected shot without re-encoding the match:
+the keyframe-aligned middle of a clip is stream-copied and only the partial
+GOPs at its two ends are re-encoded (smart cut). Clips are cut in parallel and
+listed in a clip index JSON next to them.
+"""
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import cv2
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from vision.video_writer import create_video_writer
+
+
+# Source codec -> (encoder for the boundary GOPs, Annex B bitstream filter for MPEG-TS parts)
+SMART_CUT_CODECS = {
+    "h264": ("libx264", "h264_mp4toannexb"),
+    "hevc": ("libx265", "hevc_mp4toannexb")
+}
+
+
+def probe_video(video_path: str, ffprobe_path: str = "ffprobe") -> Dict:
+    """
+    Read the video stream parameters with ffprobe.
+    
+    Args:
+        video_path: Video file
+        ffprobe_path: ffprobe executable
+    
+    Returns:
+        Dictionary with codec, profile, pix_fmt, width, height, fps, start_time and duration
+    """
+    completed = subprocess.run(
+        [ffprobe_path, "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "stream=codec_name,profile,pix_fmt,width,height,r_frame_rate:format=start_time,duration",
+         "-of", "json", str(video_path)],
+        capture_output=True, text=True, check=True
+    )
+    data = json.loads(completed.stdout)
+    stream = data["streams"][0]
+    numerator, denominator = stream.get("r_frame_rate", "30/1").split("/")
+    return {
+        "codec": stream.get("codec_name"),
+        "profile": stream.get("profile"),
+        "pix_fmt": stream.get("pix_fmt", "yuv420p"),
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "fps": float(numerator) / float(denominator) if float(denominator) > 0 else 30.0,
+        "start_time": float(data["format"].get("start_time", 0.0)),
+        "duration": float(data["format"].get("duration", 0.0))
+    }
+
+
+def probe_keyframes(video_path: str, ffprobe_path: str = "ffprobe") -> List[Tuple[float, int]]:
+    """
+    List the keyframes of the video stream from the packet index (no decoding).
+    
+    Args:
+        video_path: Video file
+        ffprobe_path: ffprobe executable
+    
+    Returns:
+        Sorted (presentation time in seconds, byte offset in the file) per keyframe
+    """
+    completed = subprocess.run(
+        [ffprobe_path, "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,pos,flags", "-of", "json", str(video_path)],
+        capture_output=True, text=True, check=True
+    )
+    keyframes = []
+    for packet in json.loads(completed.stdout).get("packets", []):
+        if "K" not in packet.get("flags", "") or packet.get("pts_time") in (None, "N/A"):
+            continue
+        position = packet.get("pos")
+        keyframes.append((float(packet["pts_time"]), int(position) if position not in (None, "N/A") else -1))
+    keyframes.sort()
+    return keyframes
+
+
+class ClipExporter:
+    """
+    Exports one clip per shot.
+    
+    With ffmpeg, each clip is planned as up to three segments: the frames before
+    the first keyframe inside the clip (re-encoded), the whole GOPs after it
+    (stream copy) and the frames after the last keyframe (re-encoded). The
+    segments are joined without another encode. Clips without a keyframe inside
+    them, or in codecs we cannot match, are re-encoded whole. Without ffmpeg,
+    clips are decoded and re-encoded with OpenCV. Clips are video only.
+    """
+    
+    def __init__(self,
+                 video_path: str,
+                 output_dir: str,
+                 padding: float = 0.5,
+                 workers: Optional[int] = None,
+                 preset: str = "veryfast",
+                 crf: int = 18,
+                 ffmpeg_path: str = "ffmpeg",
+                 ffprobe_path: str = "ffprobe"):
+        """
+        Initialize the exporter.
+        
+        Args:
+            video_path: Video the shots were detected on
+            output_dir: Directory for the clips and clip_index.json
+            padding: Seconds added before the shot start and after the shot end
+            workers: Clips cut at the same time (None = CPU count)
+            preset: x264/x265 preset for the re-encoded boundary GOPs
+            crf: CRF for the re-encoded boundary GOPs (low, so they match the copied frames)
+            ffmpeg_path: ffmpeg executable
+            ffprobe_path: ffprobe executable
+        """
+        self.video_path = Path(video_path)
+        self.output_dir = Path(output_dir)
+        self.padding = padding
+        self.workers = workers or os.cpu_count() or 1
+        self.preset = preset
+        self.crf = crf
+        self.ffmpeg_path = ffmpeg_path
+        
+        self.use_ffmpeg = shutil.which(ffmpeg_path) is not None and shutil.which(ffprobe_path) is not None
+        if self.use_ffmpeg:
+            self.info = probe_video(str(self.video_path), ffprobe_path)
+            # Keyframe times relative to the start of the file, as -ss expects them
+            self.keyframes = [t - self.info["start_time"] for t, _ in probe_keyframes(str(self.video_path), ffprobe_path)]
+        else:
+            cap = cv2.VideoCapture(str(self.video_path))
+            if not cap.isOpened():
+                raise ValueError(f"Could not open video file: {video_path}")
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            self.info = {
+                "codec": None,
+                "fps": fps,
+                "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                "duration": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) / fps
+            }
+            cap.release()
+            self.keyframes = []
+        
+        self.fps = self.info["fps"]
+        self.total_frames = int(round(self.info["duration"] * self.fps))
+    
+    def plan_clip(self, start_frame: int, end_frame: int) -> List[Tuple[str, int, int]]:
+        """
+        Split a frame range into re-encoded and stream-copied segments.
+        
+        Args:
+            start_frame: First frame of the clip
+            end_frame: Last frame of the clip (inclusive)
+        
+        Returns:
+            List of ("encode" | "copy", first frame, last frame)
+        """
+        if not self.use_ffmpeg or self.info["codec"] not in SMART_CUT_CODECS:
+            return [("encode", start_frame, end_frame)]
+        
+        # Keyframes as frame numbers inside the clip
+        inside = sorted({int(round(t * self.fps)) for t in self.keyframes
+                         if start_frame <= int(round(t * self.fps)) <= end_frame})
+        if not inside:
+            return [("encode", start_frame, end_frame)]
+        
+        first, last = inside[0], inside[-1]
+        segments = []
+        if first > start_frame:
+            segments.append(("encode", start_frame, first - 1))
+        if last > first:
+            segments.append(("copy", first, last - 1))
+        # The last GOP is partial unless the clip ends exactly where it does
+        segments.append(("copy" if self._gop_end(last) == end_frame else "encode", last, end_frame))
+        
+        # Neighbouring encoded segments (a single keyframe inside the clip) are one encode
+        merged = [segments[0]]
+        for kind, first_frame, last_frame in segments[1:]:
+            if kind == merged[-1][0]:
+                merged[-1] = (kind, merged[-1][1], last_frame)
+            else:
+                merged.append((kind, first_frame, last_frame))
+        return merged
+    
+    def _gop_end(self, keyframe: int) -> int:
+        """Last frame of the GOP that starts at a keyframe."""
+        later = [int(round(t * self.fps)) for t in self.keyframes if int(round(t * self.fps)) > keyframe]
+        return (min(later) if later else self.total_frames) - 1
+    
+    def export(self, shots: List, video_name: Optional[str] = None) -> Dict:
+        """
+        Export a clip for every shot and write the clip index.
+        
+        Args:
+            shots: Shot objects (or Shot.to_dict() dictionaries)
+            video_name: Prefix for the clip file names (default: the video's file name)
+        
+        Returns:
+            The clip index
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        video_name = video_name or self.video_path.stem
+        padding_frames = int(round(self.padding * self.fps))
+        
+        jobs = []
+        for index, shot in enumerate(sorted(shots, key=self._shot_frames)):
+            start, peak, end = self._shot_frames(shot)
+            player = shot["player"] if isinstance(shot, dict) else shot.player_id
+            clip_start = max(0, start - padding_frames)
+            clip_end = min(self.total_frames - 1, end + padding_frames)
+            jobs.append({
+                "index": index,
+                "file": f"{video_name}_shot{index:03d}_p{player}_f{peak}.mp4",
+                "shot": shot if isinstance(shot, dict) else shot.to_dict(),
+                "start_frame": clip_start,
+                "end_frame": clip_end
+            })
+        
+        print(f"\n✂️  Exporting {len(jobs)} shot clips ({self.padding:.1f}s padding, {self.workers} workers)...")
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            clips = list(executor.map(self._export_clip, jobs))
+        elapsed = time.time() - start_time
+        
+        copied = sum(clip["copied_frames"] for clip in clips)
+        encoded = sum(clip["encoded_frames"] for clip in clips)
+        index = {
+            "video": str(self.video_path),
+            "created": datetime.now().isoformat(),
+            "fps": self.fps,
+            "padding_seconds": self.padding,
+            "method": "smart_cut" if self.use_ffmpeg else "opencv",
+            "summary": {
+                "clips": len(clips),
+                "failed": sum(1 for clip in clips if clip.get("error")),
+                "export_time": round(elapsed, 3),
+                "copied_frames": copied,
+                "encoded_frames": encoded,
+                "copy_ratio": round(copied / (copied + encoded), 4) if copied + encoded > 0 else 0.0
+            },
+            "clips": clips
+        }
+        
+        index_path = self.output_dir / "clip_index.json"
+        with open(index_path, 'w') as f:
+            json.dump(index, f, indent=2)
+        
+        print(f"   {len(clips)} clips in {elapsed:.1f}s ({index['summary']['copy_ratio']:.0%} of frames stream-copied)")
+        if index["summary"]["failed"]:
+            print(f"   ⚠️  {index['summary']['failed']} clips failed (see 'error' in the clip index)")
+        print(f"   Clip index: {index_path}")
+        return index
+    
+    @staticmethod
+    def _shot_frames(shot) -> Tuple[int, int, int]:
+        """(start, peak, end) frame of a Shot or shot dictionary."""
+        if isinstance(shot, dict):
+            return shot["frames"]["start"], shot["frames"]["peak"], shot["frames"]["end"]
+        return shot.start_frame, shot.peak_frame, shot.end_frame
+    
+    def _export_clip(self, job: Dict) -> Dict:
+        """Cut one clip; returns its clip index entry."""
+        output_path = self.output_dir / job["file"]
+        entry = {
+            "file": job["file"],
+            "player": job["shot"].get("player"),
+            "rally": job["shot"].get("rally"),
+            "hand": job["shot"].get("hand"),
+            "shot_frames": job["shot"].get("frames"),
+            "start_frame": job["start_frame"],
+            "end_frame": job["end_frame"],
+            "start_time": round(job["start_frame"] / self.fps, 3),
+            "end_time": round((job["end_frame"] + 1) / self.fps, 3),
+            "copied_frames": 0,
+            "encoded_frames": 0
+        }
+        
+        try:
+            if self.use_ffmpeg:
+                segments = self.plan_clip(job["start_frame"], job["end_frame"])
+                self._smart_cut(segments, output_path)
+            else:
+                segments = [("encode", job["start_frame"], job["end_frame"])]
+                self._opencv_cut(job["start_frame"], job["end_frame"], output_path)
+        except (subprocess.CalledProcessError, OSError, RuntimeError) as e:
+            stderr = getattr(e, "stderr", None)
+            entry["error"] = (stderr.decode(errors="replace") if isinstance(stderr, bytes) else str(e)).strip()[-300:]
+            return entry
+        
+        for kind, first, last in segments:
+            entry["copied_frames" if kind == "copy" else "encoded_frames"] += last - first + 1
+        entry["segments"] = [{"method": kind, "start_frame": first, "end_frame": last} for kind, first, last in segments]
+        entry["size_bytes"] = output_path.stat().st_size
+        return entry
+    
+    def _smart_cut(self, segments: List[Tuple[str, int, int]], output_path: Path):
+        """Cut the segments with ffmpeg and join them into one MP4."""
+        if len(segments) == 1 and segments[0][0] == "encode":
+            self._run_segment(segments[0], output_path)
+            return
+        
+        # MPEG-TS parts carry their parameter sets in-band, so copied and re-encoded
+        # parts can be joined with stream copy
+        with tempfile.TemporaryDirectory(dir=self.output_dir) as tmp_dir:
+            part_paths = [Path(tmp_dir) / f"part_{i}.ts" for i in range(len(segments))]
+            for segment, part_path in zip(segments, part_paths):
+                self._run_segment(segment, part_path)
+            
+            list_path = Path(tmp_dir) / "parts.txt"
+            list_path.write_text("".join(f"file '{path.resolve()}'\n" for path in part_paths))
+            subprocess.run(
+                [self.ffmpeg_path, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                 "-i", str(list_path), "-c", "copy", "-movflags", "+faststart", str(output_path)],
+                check=True, capture_output=True
+            )
+    
+    def _run_segment(self, segment: Tuple[str, int, int], output_path: Path):
+        """Stream-copy or re-encode one frame range."""
+        kind, first, last = segment
+        frames = last - first + 1
+        
+        if kind == "copy":
+            # Input seek lands on the keyframe at or before the position; nudge past rounding
+            seek = first / self.fps + 0.25 / self.fps
+            codec_args = ["-c:v", "copy", "-bsf:v", SMART_CUT_CODECS[self.info["codec"]][1]]
+        else:
+            # Input seek with re-encoding is frame accurate (decodes from the previous keyframe)
+            seek = first / self.fps
+            encoder = SMART_CUT_CODECS.get(self.info["codec"], ("libx264", None))[0]
+            codec_args = ["-c:v", encoder, "-preset", self.preset, "-crf", str(self.crf),
+                          "-pix_fmt", self.info.get("pix_fmt") or "yuv420p"]
+            if self.info["codec"] not in SMART_CUT_CODECS:
+                codec_args += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+            if output_path.suffix == ".mp4":
+                codec_args += ["-movflags", "+faststart"]
+        
+        subprocess.run(
+            [self.ffmpeg_path, "-y", "-loglevel", "error", "-ss", f"{seek:.6f}", "-i", str(self.video_path),
+             "-map", "0:v:0", "-an", "-frames:v", str(frames)] + codec_args + [str(output_path)],
+            check=True, capture_output=True
+        )
+    
+    def _opencv_cut(self, start_frame: int, end_frame: int, output_path: Path):
+        """Decode and re-encode a frame range with OpenCV (no ffmpeg installed)."""
+        cap = cv2.VideoCapture(str(self.video_path))
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        writer = create_video_writer(str(output_path), self.fps, (self.info["width"], self.info["height"]),
+                                     backend="opencv")
+        for _ in range(end_frame - start_frame + 1):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(frame)
+        writer.release()
+        cap.release()
+
+
+def main():
+    """Export shot clips for a processed video."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Export one clip per detected shot")
+    parser.add_argument("video_path", type=str, help="Video the shots were detected on")
+    parser.add_argument("--shots", type=str, required=True, help="Shots JSON from VideoProcessor.save_shots_json")
+    parser.add_argument("--output-dir", type=str, default=None, help="Clip directory (default: <video>_clips)")
+    parser.add_argument("--padding", type=float, default=0.5, help="Seconds before and after each shot")
+    parser.add_argument("--workers", type=int, default=None, help="Clips cut at the same time")
+    parser.add_argument("--player", type=int, default=None, help="Only export this player's shots")
+    
+    args = parser.parse_args()
+    
+    with open(args.shots, 'r') as f:
+        data = json.load(f)
+    shots = [shot for key in ("player_0", "player_1") for shot in data.get("shots", {}).get(key, [])]
+    if args.player is not None:
+        shots = [shot for shot in shots if shot["player"] == args.player]
+    
+    output_dir = args.output_dir or str(Path(args.video_path).with_name(f"{Path(args.video_path).stem}_clips"))
+    exporter = ClipExporter(args.video_path, output_dir, padding=args.padding, workers=args.workers)
+    exporter.export(shots)
+
+
+if __name__ == "__main__":
+    main()
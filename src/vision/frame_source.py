@@ -0,0 +1,200 @@
+"""
+Threaded frame source for video files and cameras.
+A decoder thread fills a ring of preallocated frame buffers ahead of the
+consumer, so frame loops neither allocate a new array per frame nor wait for
+decoding in line with inference.
+"""
+from typing import Callable, Dict, Optional, Tuple, Union
+import queue
+import threading
+import cv2
+import numpy as np
+
+
+class FrameSource:
+    """
+    Reads frames on a background thread into a ring of reused buffers.
+    
+    read() hands out read-only views into the ring. A view stays valid until the
+    next read(); copy it to keep it longer or to draw on it.
+    """
+    
+    def __init__(self,
+                 source: Union[str, int, cv2.VideoCapture],
+                 ring_size: int = 4,
+                 frame_filter: Optional[Callable[[int], bool]] = None,
+                 live: bool = False):
+        """
+        Open the source and start decoding.
+        
+        Args:
+            source: Video path, camera index, or an opened cv2.VideoCapture (taken over)
+            ring_size: Number of preallocated frame buffers (frames decoded ahead + 1)
+            frame_filter: Called with each 0-based frame index; frames it rejects are only
+                          grabbed (not decoded) and returned as (True, None)
+            live: Camera mode: when the consumer falls behind, drop the oldest decoded
+                  frame instead of blocking the capture
+        """
+        self.cap = source if isinstance(source, cv2.VideoCapture) else cv2.VideoCapture(source)
+        self.ring_size = max(2, ring_size)
+        self.frame_filter = frame_filter
+        self.live = live
+        
+        # Properties are read up front; the capture belongs to the decoder thread afterwards
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        
+        # Sized from the reported resolution; a wrong report is corrected on the first read
+        self.buffers = [np.empty((max(0, self.height), max(0, self.width), 3), dtype=np.uint8)
+                        for _ in range(self.ring_size)]
+        self.free_slots: queue.Queue = queue.Queue()
+        for slot in range(self.ring_size):
+            self.free_slots.put(slot)
+        # Decoded frames in order: (slot or None for grabbed-only frames, success, frame index)
+        self.ready: queue.Queue = queue.Queue(maxsize=256)
+        
+        self.held_slot: Optional[int] = None
+        self.frame_index = -1
+        self.finished = False
+        
+        # Statistics
+        self.frames_decoded = 0
+        self.frames_grabbed = 0
+        self.buffer_reuses = 0
+        self.buffer_allocations = 0
+        self.decoder_stalls = 0
+        self.dropped_frames = 0
+        
+        self.stopped = threading.Event()
+        self.thread = None
+        if self.cap.isOpened():
+            self.thread = threading.Thread(target=self._decode, daemon=True)
+            self.thread.start()
+    
+    def is_opened(self) -> bool:
+        """Whether the source was opened successfully."""
+        return self.thread is not None
+    
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Get the next frame.
+        
+        Returns:
+            (success, frame): frame is a read-only view valid until the next read(), or None
+            for frames rejected by frame_filter. success is False at the end of the stream.
+            The frame's 0-based index is in self.frame_index.
+        """
+        if self.finished or self.thread is None:
+            return False, None
+        
+        # The previous frame's buffer can be refilled now
+        if self.held_slot is not None:
+            self.free_slots.put(self.held_slot)
+            self.held_slot = None
+        
+        if self.ready.empty():
+            self.decoder_stalls += 1
+        slot, success, index = self.ready.get()
+        if not success:
+            self.finished = True
+            return False, None
+        
+        self.frame_index = index
+        if slot is None:
+            return True, None
+        
+        self.held_slot = slot
+        frame = self.buffers[slot].view()
+        frame.flags.writeable = False
+        return True, frame
+    
+    def _decode(self):
+        """Decoder thread: fill free buffers in frame order."""
+        index = 0
+        while not self.stopped.is_set():
+            if self.frame_filter is not None and not self.frame_filter(index):
+                success = self.cap.grab()
+                if success:
+                    self.frames_grabbed += 1
+                self._put((None, success, index))
+                if not success:
+                    return
+                index += 1
+                continue
+            
+            slot = self._next_free_slot()
+            if slot is None:
+                return
+            
+            buffer = self.buffers[slot]
+            success, frame = self.cap.read(image=buffer)
+            if success:
+                self.frames_decoded += 1
+                if frame is buffer:
+                    self.buffer_reuses += 1
+                else:
+                    # Size or type differed from the ring (e.g. wrong reported size); adopt it
+                    self.buffer_allocations += 1
+                    self.buffers[slot] = frame
+                self._put((slot, True, index))
+            else:
+                self.free_slots.put(slot)
+                self._put((None, False, index))
+                return
+            index += 1
+    
+    def _next_free_slot(self) -> Optional[int]:
+        """Wait for a free buffer; in live mode take back the oldest undelivered frame instead."""
+        while not self.stopped.is_set():
+            try:
+                return self.free_slots.get(timeout=0.001 if self.live else 0.1)
+            except queue.Empty:
+                pass
+            
+            if self.live:
+                try:
+                    slot, _, _ = self.ready.get_nowait()
+                except queue.Empty:
+                    continue
+                if slot is not None:
+                    self.dropped_frames += 1
+                    return slot
+        return None
+    
+    def _put(self, item: Tuple):
+        """Hand a decoded frame to the consumer without blocking past release()."""
+        while not self.stopped.is_set():
+            try:
+                self.ready.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+    
+    def release(self):
+        """Stop the decoder thread and close the capture."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.cap.release()
+        self.finished = True
+    
+    def get_statistics(self) -> Dict:
+        """Get decode, buffer reuse and stall counts."""
+        return {
+            'frames_decoded': self.frames_decoded,
+            'frames_grabbed': self.frames_grabbed,
+            'buffer_reuses': self.buffer_reuses,
+            'buffer_allocations': self.buffer_allocations,
+            'buffer_reuse_ratio': self.buffer_reuses / self.frames_decoded if self.frames_decoded > 0 else 0.0,
+            'decoder_stalls': self.decoder_stalls,
+            'dropped_frames': self.dropped_frames,
+            'ring_size': self.ring_size
+        }
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
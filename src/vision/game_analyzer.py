@@ -5,10 +5,19 @@ Inspired by analyze_game.py with optimizations for the vision system.
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple, Optional
-from ultralytics import YOLO
 import cv2
 from pathlib import Path
 from datetime import datetime
+import sys
+import time
+
+sys.path.append(str(Path(__file__).parent.parent))
+from vision.motion_gate import MotionGate
+from vision.keypoint_smoother import KeypointSmoother
+from vision.rally_segmenter import RallySegmenter, Rally, find_rally, rally_starts
+from vision.frame_source import FrameSource
+from vision.timing import StageTimer
+from vision.model_registry import get_model
 
 
 # --- YOLOv11 Keypoint Mappings (Standard COCO 17-point setup) ---
@@ -26,42 +35,81 @@ class GameAnalyzer:
     Analyzes table tennis game videos to extract biomechanical metrics.
     """
     
-    def __init__(self, output_dir: str = "analysis_output"):
+    def __init__(self, output_dir: str = "analysis_output", use_motion_gate: bool = False,
+                 segment_rallies: bool = False, smooth_keypoints: bool = False,
+                 enable_timing: bool = False, use_half: bool = True, device: str = 'mps'):
         """
         Initialize the game analyzer.
         
         Args:
             output_dir: Directory to save analysis output files
+            use_motion_gate: Skip pose inference on static frames and carry the last pose forward
+            segment_rallies: Scan for rallies first and only analyze frames inside them
+            smooth_keypoints: Savitzky-Golay smooth each player's keypoints before analysis
+            enable_timing: Time each analysis stage (timing_stats and output/metrics)
+            use_half: Use FP16 half-precision inference
+            device: Inference device ('mps' for Apple Silicon, 'cpu', 'cuda:0', ...)
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True, parents=True)
         
-        # Load YOLOv11 pose model
-        self.model = YOLO("yolo11n-pose.pt")
+        # YOLOv11 pose model, loaded on first use (analyzing a DataFrame needs no model)
+        self.model_name = "yolo11n-pose.pt"
+        self._model = None
+        self.use_half = use_half
+        self.device = device
+        
+        self.use_motion_gate = use_motion_gate
+        self.motion_gate_stats: Dict = {}
+        
+        self.segment_rallies = segment_rallies
+        self.rallies: List[Rally] = []
+        
+        self.smoother = KeypointSmoother() if smooth_keypoints else None
+        
+        # Per-stage span timers (one job per report)
+        self.enable_timing = enable_timing
+        self.timer = StageTimer("game_analysis", enabled=enable_timing)
+        self.timing_stats: Dict = {}
         
-    def load_pose_data_from_video(self, video_path: str, fps: int = 30) -> pd.DataFrame:
+    @property
+    def model(self):
+        """
+        The YOLOv11 pose model, fetched from the shared registry on first access.
+        Same instance as a PlayerTracker's with the same device and precision.
+        """
+        if self._model is None:
+            self._model = get_model(self.model_name, device=self.device, half=self.use_half)
+        return self._model
+    
+    def load_pose_data_from_video(self, video_path: str, fps: int = 30,
+                                  rallies: Optional[List[Rally]] = None) -> pd.DataFrame:
         """
         Loads pose data from a video file using YOLOv11 pose detection.
         
         Args:
             video_path: Path to the video file
             fps: Frames per second for velocity calculations
+            rallies: Only run pose detection inside these rallies (None = every frame)
             
         Returns:
-            DataFrame with columns: 'frame', 'player_id', and keypoint coordinates
+            DataFrame with columns: 'frame', 'player_id', 'rally_id' and keypoint coordinates
         """
         print(f"\n{'='*60}")
         print(f"Loading pose data from: {video_path}")
         print(f"{'='*60}")
         
-        cap = cv2.VideoCapture(video_path)
+        # Frames between rallies are only grabbed, not decoded
+        starts = rally_starts(rallies) if rallies else []
+        frame_filter = (lambda frame_index: find_rally(rallies, frame_index, starts) is not None) if rallies else None
+        source = FrameSource(video_path, frame_filter=frame_filter)
         
-        if not cap.isOpened():
+        if not source.is_opened():
             print(f"Error: Could not open video file at {video_path}")
             return pd.DataFrame()
         
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        video_fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = source.total_frames
+        video_fps = source.fps
         
         print(f"Video FPS: {video_fps:.2f}")
         print(f"Total frames: {total_frames}")
@@ -70,15 +118,40 @@ class GameAnalyzer:
         all_data = []
         frame_num = 0
         
-        while cap.isOpened():
-            ret, frame = cap.read()
+        # Static frames between rallies reuse the previous frame's rows
+        motion_gate = MotionGate() if self.use_motion_gate else None
+        last_rows = []
+        
+        while True:
+            with self.timer.span("decode"):
+                ret, frame = source.read()
             if not ret:
                 break
             
+            if frame is None:
+                frame_num += 1
+                continue
+            
+            # Rally frames are 0-based, DataFrame frames are 1-based
+            rally = find_rally(rallies, frame_num, starts) if rallies else None
             frame_num += 1
             
+            with self.timer.span("motion_gate"):
+                static = motion_gate is not None and not motion_gate.should_process(frame)
+            if static:
+                # The pose carries over, the rally is this frame's own
+                rally_id = rally.rally_id if rally is not None else -1
+                for row in last_rows:
+                    all_data.append({**row, 'frame': frame_num, 'timestamp': frame_num / fps,
+                                     'rally_id': rally_id})
+                continue
+            
+            frame_start = len(all_data)
+            
             # Run pose detection
-            results = self.model.predict(source=frame, conf=0.5, classes=0, verbose=False)
+            with self.timer.span("pose"):
+                results = self.model.predict(source=frame, conf=0.5, classes=0, verbose=False,
+                                             half=self.use_half, device=self.device)
             
             # Extract keypoints for each detected person
             if results[0].keypoints is not None and len(results[0].keypoints.xy) > 0:
@@ -94,6 +167,7 @@ class GameAnalyzer:
                         'frame': frame_num,
                         'player_id': player_id,
                         'timestamp': frame_num / fps,
+                        'rally_id': rally.rally_id if rally is not None else -1,
                     }
                     
                     # Add keypoint coordinates
@@ -107,18 +181,55 @@ class GameAnalyzer:
                     
                     all_data.append(row_data)
             
+            last_rows = all_data[frame_start:]
+            
             # Progress indicator
             if frame_num % 100 == 0:
                 progress = (frame_num / total_frames) * 100
                 print(f"  Progress: {progress:.1f}% ({frame_num}/{total_frames} frames)")
         
-        cap.release()
+        source.release()
         
         df = pd.DataFrame(all_data)
         print(f"\nLoaded {len(df)} pose detections from {frame_num} frames")
         
+        if motion_gate is not None:
+            self.motion_gate_stats = motion_gate.get_statistics()
+            print(f"Motion gate skipped {self.motion_gate_stats['skipped_frames']} static frames "
+                  f"({self.motion_gate_stats['skip_ratio']:.1%})")
+        
         return df.sort_values(by=['frame', 'player_id']).reset_index(drop=True)
     
+    def smooth_pose_dataframe(self, df: pd.DataFrame, fps: int = 30) -> pd.DataFrame:
+        """
+        Smooth all 17 keypoints of each player over time (batch mode).
+        
+        Args:
+            df: DataFrame from load_pose_data_from_video
+            fps: Frames per second used for the frame timestamps
+            
+        Returns:
+            DataFrame with smoothed keypoint columns (undetected zeros are kept)
+        """
+        if df.empty or self.smoother is None:
+            return df
+        
+        df = df.copy()
+        x_cols = [f'x{i}' for i in range(17)]
+        y_cols = [f'y{i}' for i in range(17)]
+        
+        for _, player_df in df.groupby('player_id'):
+            points = np.stack([player_df[x_cols].to_numpy(dtype=float),
+                               player_df[y_cols].to_numpy(dtype=float)], axis=-1)
+            valid = (points[..., 0] > 0) & (points[..., 1] > 0)
+            timestamps = player_df['frame'].to_numpy() / fps
+            
+            smoothed = self.smoother.smooth_array(points, timestamps, valid)
+            df.loc[player_df.index, x_cols] = smoothed[..., 0]
+            df.loc[player_df.index, y_cols] = smoothed[..., 1]
+        
+        return df
+    
     @staticmethod
     def calculate_angle(p1: Tuple[float, float], p2: Tuple[float, float], 
                        p3: Tuple[float, float]) -> float:
@@ -379,17 +490,32 @@ class GameAnalyzer:
         Returns:
             Path to the generated report file
         """
+        self.timer = StageTimer("game_analysis", enabled=self.enable_timing)
+        
+        # Find rallies first so pose detection skips dead time
+        self.rallies = []
+        if self.segment_rallies:
+            with self.timer.span("rally_scan"):
+                self.rallies = RallySegmenter(pose_model=self.model).scan_video(video_path)
+            if not self.rallies:
+                print("⚠️  No rallies found, analyzing the whole video")
+        
         # Load pose data from video
-        df_pose = self.load_pose_data_from_video(video_path, fps)
+        df_pose = self.load_pose_data_from_video(video_path, fps, rallies=self.rallies or None)
         
         if df_pose.empty:
             print("Error: No pose data loaded. Cannot generate report.")
             return ""
         
+        # Remove keypoint jitter before velocities and angles are computed
+        with self.timer.span("smoothing"):
+            df_pose = self.smooth_pose_dataframe(df_pose, fps)
+        
         # Generate report
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         video_name = Path(video_path).stem
         report_path = self.output_dir / f"analysis_{video_name}_{timestamp}.txt"
+        report_start = time.perf_counter()
         
         with open(report_path, 'w') as f:
             # Header
@@ -401,7 +527,11 @@ class GameAnalyzer:
             f.write(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write(f"Processing FPS: {fps}\n")
             f.write(f"Total Frames Analyzed: {df_pose['frame'].max()}\n")
-            f.write(f"Total Detections: {len(df_pose)}\n\n")
+            f.write(f"Total Detections: {len(df_pose)}\n")
+            if self.motion_gate_stats:
+                f.write(f"Static Frames Skipped: {self.motion_gate_stats['skipped_frames']} "
+                        f"({self.motion_gate_stats['skip_ratio']:.1%})\n")
+            f.write("\n")
             
             # Get unique players
             players = df_pose['player_id'].unique()
@@ -415,7 +545,15 @@ class GameAnalyzer:
             
             all_shots = {}
             for player in players:
-                shots = self.detect_shots(df_pose, player, velocity_threshold, fps)
+                with self.timer.span("shot_detection"):
+                    if self.rallies:
+                        # Per rally, so no shot spans dead time
+                        shots = []
+                        for rally in self.rallies:
+                            rally_df = df_pose[df_pose['rally_id'] == rally.rally_id]
+                            shots.extend(self.detect_shots(rally_df, player, velocity_threshold, fps))
+                    else:
+                        shots = self.detect_shots(df_pose, player, velocity_threshold, fps)
                 all_shots[player] = shots
                 
                 f.write(f"{player}:\n")
@@ -438,6 +576,28 @@ class GameAnalyzer:
                         f.write(f"    ... and {len(shots) - 10} more shots\n")
                     f.write("\n")
             
+            # Rally segments
+            if self.rallies:
+                f.write("="*70 + "\n")
+                f.write("                          RALLY SEGMENTS\n")
+                f.write("="*70 + "\n\n")
+                
+                rally_time = sum(rally.duration for rally in self.rallies)
+                f.write(f"Rallies Found: {len(self.rallies)}\n")
+                f.write(f"Active Play: {rally_time:.1f}s\n\n")
+                
+                for rally in self.rallies:
+                    f.write(f"  Rally {rally.rally_id + 1}: {rally.start_time:7.2f}s - {rally.end_time:7.2f}s "
+                            f"({rally.duration:.1f}s) | Ball seen: {rally.ball_ratio:.0%}\n")
+                    for player in players:
+                        metrics = self.analyze_stroke_metrics(df_pose, player, rally.start_frame + 1,
+                                                              rally.end_frame + 1, fps)
+                        if not metrics:
+                            continue
+                        f.write(f"    {player}: Max Velocity {metrics['max_racket_velocity']:8.2f} px/s | "
+                                f"CoG Movement {metrics['cog_x_movement']:6.1f} px\n")
+                f.write("\n")
+            
             # Biomechanical analysis
             f.write("="*70 + "\n")
             f.write("                      BIOMECHANICAL ANALYSIS\n")
@@ -546,6 +706,13 @@ class GameAnalyzer:
             f.write(f"\nReport generated by PaddleCoach Vision System v1.0\n")
             f.write(f"Output file: {report_path}\n")
         
+        # The report stage spans shot detection and the stroke metrics computed for it
+        self.timer.record("report", time.perf_counter() - report_start)
+        if self.timer.enabled:
+            self.timing_stats = self.timer.get_statistics()
+            self.timer.print_summary()
+            self.timer.save()
+        
         print(f"\n{'='*60}")
         print(f"Analysis report generated: {report_path}")
         print(f"{'='*60}")
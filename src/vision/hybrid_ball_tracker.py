@@ -0,0 +1,185 @@
+"""
+Hybrid ball tracker for table tennis: cheap HSV detection first, YOLO only when needed.
+Falls back to YOLO when HSV finds nothing, is unsure, or disagrees with the motion model.
+"""
+from typing import List, Tuple, Optional, Deque, Dict
+import cv2
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from models.ball_data import BallData
+from vision.ball_tracker import BallTracker
+from vision.ball_tracker_hsv import BallTrackerHSV
+
+
+class HybridBallTracker:
+    """
+    Cascaded ball tracker: BallTrackerHSV on every frame, BallTracker (YOLO) as fallback.
+    Both detectors share one trajectory and Kalman filter, and confident YOLO
+    detections recalibrate the HSV color range.
+    """
+    
+    def __init__(self, model_path: str = "best.pt", max_trajectory: int = 50,
+                 hsv_confidence_threshold: float = 0.2,
+                 recalibration_confidence: float = 0.3,
+                 recalibration_rate: float = 0.2,
+                 fill_gaps: bool = False):
+        """
+        Initialize both detectors.
+        
+        Args:
+            model_path: Path to YOLO model weights for the fallback detector
+            max_trajectory: Maximum number of positions to keep in trajectory
+            hsv_confidence_threshold: HSV scores (circularity x size, 0-1) below this are confirmed with YOLO
+            recalibration_confidence: Minimum YOLO confidence to recalibrate HSV thresholds from
+            recalibration_rate: How far (0-1) each recalibration moves the HSV range
+            fill_gaps: Return predicted positions (BallData.predicted=True) during short dropouts
+        """
+        print(f"Initializing hybrid HSV + YOLO ball tracker")
+        
+        self.hsv_tracker = BallTrackerHSV(max_trajectory=max_trajectory, fill_gaps=fill_gaps, fast_mode=True)
+        self.yolo_tracker = BallTracker(model_path=model_path, max_trajectory=max_trajectory, use_roi=True)
+        
+        # One track for both detectors: the YOLO tracker searches around the same prediction
+        self.trajectory = self.hsv_tracker.trajectory
+        self.kalman = self.hsv_tracker.kalman
+        self.yolo_tracker.kalman = self.kalman
+        
+        self.hsv_confidence_threshold = hsv_confidence_threshold
+        self.recalibration_confidence = recalibration_confidence
+        self.recalibration_rate = recalibration_rate
+        
+        # Cascade statistics
+        self.total_frames = 0
+        self.yolo_frames = 0
+        self.yolo_reasons: Dict[str, int] = {'no_candidate': 0, 'low_confidence': 0, 'motion_outlier': 0}
+        self.recalibrations = 0
+    
+    def process_frame(self, frame: np.ndarray, frame_number: int, timestamp: float) -> Optional[BallData]:
+        """
+        Process a single frame, escalating to YOLO only when HSV is not trustworthy.
+        
+        Args:
+            frame: Input frame (BGR format)
+            frame_number: Current frame number
+            timestamp: Timestamp in seconds from video start
+        
+        Returns:
+            BallData object if ball detected, None otherwise
+        """
+        self.total_frames += 1
+        tracking = self.kalman.initialized and not self.kalman.is_lost(timestamp)
+        
+        candidate = self.hsv_tracker.detect(frame, timestamp)
+        
+        # Decide whether the HSV result needs the expensive detector
+        reason = None
+        if candidate is None:
+            reason = 'no_candidate'
+        elif candidate[2] < self.hsv_confidence_threshold:
+            reason = 'low_confidence'
+        elif tracking and not self.kalman.in_gate(candidate[0], candidate[1], timestamp):
+            reason = 'motion_outlier'
+        
+        ball_data = None
+        if reason is None:
+            ball_data = BallData(
+                frame_number=frame_number,
+                timestamp=timestamp,
+                x=float(candidate[0]),
+                y=float(candidate[1]),
+                confidence=min(candidate[2], 1.0)
+            )
+        else:
+            self.yolo_frames += 1
+            self.yolo_reasons[reason] += 1
+            ball_data = self.yolo_tracker.detect(frame, frame_number, timestamp)
+            
+            if ball_data is not None and ball_data.confidence >= self.recalibration_confidence:
+                self._recalibrate_hsv(frame, ball_data)
+            elif ball_data is None and reason == 'low_confidence':
+                # YOLO saw nothing either; a weak HSV hit that fits the motion is still the best guess
+                if not tracking or self.kalman.in_gate(candidate[0], candidate[1], timestamp):
+                    ball_data = BallData(
+                        frame_number=frame_number,
+                        timestamp=timestamp,
+                        x=float(candidate[0]),
+                        y=float(candidate[1]),
+                        confidence=min(candidate[2], 1.0)
+                    )
+        
+        # The HSV tracker owns the shared track, so it handles gap filling
+        if ball_data is None:
+            return self.hsv_tracker.handle_miss(frame_number, timestamp, tracking)
+        
+        # Smooth position and get real time-based velocity from the shared filter
+        x, y, vx, vy = self.kalman.update(ball_data.x, ball_data.y, timestamp)
+        ball_data.x, ball_data.y = x, y
+        if tracking:
+            ball_data.velocity_x = vx
+            ball_data.velocity_y = vy
+            ball_data.speed = float(np.hypot(vx, vy))
+        
+        # Add to trajectory
+        self.trajectory.append((int(x), int(y)))
+        
+        return ball_data
+    
+    def _recalibrate_hsv(self, frame: np.ndarray, ball_data: BallData, patch_radius: int = 3):
+        """
+        Move the HSV thresholds toward the ball color seen at a YOLO detection.
+        
+        Args:
+            frame: Input frame (BGR format)
+            ball_data: Confident YOLO detection
+            patch_radius: Half-size (pixels) of the color sample around the ball center
+        """
+        height, width = frame.shape[:2]
+        cx, cy = int(ball_data.x), int(ball_data.y)
+        x0, x1 = max(0, cx - patch_radius), min(width, cx + patch_radius + 1)
+        y0, y1 = max(0, cy - patch_radius), min(height, cy + patch_radius + 1)
+        if x1 <= x0 or y1 <= y0:
+            return
+        
+        patch = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2HSV).reshape(-1, 3)
+        h, s, v = np.median(patch, axis=0)
+        
+        # Too gray or dark to describe the ball color
+        if s < 60 or v < 60:
+            return
+        
+        target_lower = np.array([h - 8, s - 70, v - 70])
+        target_upper = np.array([h + 8, 255, 255])
+        
+        rate = self.recalibration_rate
+        lower = (1 - rate) * self.hsv_tracker.hsv_lower + rate * target_lower
+        upper = (1 - rate) * self.hsv_tracker.hsv_upper + rate * target_upper
+        
+        self.hsv_tracker.hsv_lower = np.clip(np.round(lower), [0, 0, 0], [179, 255, 255]).astype(int)
+        self.hsv_tracker.hsv_upper = np.clip(np.round(upper), [0, 0, 0], [179, 255, 255]).astype(int)
+        self.recalibrations += 1
+    
+    def get_search_statistics(self) -> Dict:
+        """Get the share of frames served by each detector."""
+        yolo_share = self.yolo_frames / self.total_frames if self.total_frames > 0 else 0.0
+        
+        return {
+            'hsv_frames': self.total_frames - self.yolo_frames,
+            'yolo_frames': self.yolo_frames,
+            'yolo_frame_share': yolo_share,
+            'yolo_reasons': dict(self.yolo_reasons),
+            'hsv_recalibrations': self.recalibrations,
+            'hsv_lower': self.hsv_tracker.hsv_lower.tolist(),
+            'hsv_upper': self.hsv_tracker.hsv_upper.tolist(),
+            **self.yolo_tracker.get_search_statistics()
+        }
+    
+    def visualize_ball(self, frame: np.ndarray, ball_data: Optional[BallData]) -> np.ndarray:
+        """Draw ball position and trajectory on frame."""
+        return self.hsv_tracker.visualize_ball(frame, ball_data)
+    
+    def reset_trajectory(self):
+        """Clear the trajectory history."""
+        self.hsv_tracker.reset_trajectory()
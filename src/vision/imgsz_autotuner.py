@@ -0,0 +1,303 @@
+"""
+Input-resolution autotuner for the YOLO trackers.
+Profiles a short clip at several model input sizes, measures speed and
+detection quality against the largest size, and picks the smallest size that
+reaches the target FPS without dropping below the quality floor. Choices are
+cached per tracker, model, device and source resolution, so a 4K upload and a
+720p webcam each get their own size and later runs skip the profiling.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+from contextlib import redirect_stdout
+from datetime import datetime
+import io
+import json
+import math
+import os
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+
+
+DEFAULT_CACHE_PATH = Path("output/cache/imgsz_autotune.json")
+
+# Candidate input sizes (multiples of the 32 px model stride)
+DEFAULT_SIZES = (320, 416, 480, 640, 800, 960, 1280)
+
+
+def sample_clip(video_path: str, num_frames: int) -> List[np.ndarray]:
+    """
+    Read a contiguous clip from the middle of a video.
+    
+    Args:
+        video_path: Video file
+        num_frames: Clip length
+    
+    Returns:
+        Frames (BGR), fewer if the video is shorter
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total > num_frames:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, (total - num_frames) // 2)
+    
+    frames = []
+    while len(frames) < num_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+class ImgszAutotuner:
+    """
+    Chooses the model input size (imgsz) for a BallTracker or PlayerTracker.
+    
+    Quality is measured against the largest candidate size on the same clip:
+    ball recall for the ball tracker, keypoint agreement (share of visible
+    keypoints within a tolerance) for the pose tracker.
+    """
+    
+    def __init__(self, target_fps: float = 30.0, min_ball_recall: float = 0.9,
+                 min_keypoint_agreement: float = 0.9, sizes: Tuple[int, ...] = DEFAULT_SIZES,
+                 clip_frames: int = 60, warmup_frames: int = 3, keypoint_tolerance: float = 0.02,
+                 ball_radius: float = 0.01, min_keypoint_confidence: float = 0.5,
+                 cache_path: Optional[str] = None):
+        """
+        Initialize the autotuner.
+        
+        Args:
+            target_fps: Tracker frames per second the chosen size must reach
+            min_ball_recall: Quality floor for the ball tracker (share of reference detections found)
+            min_keypoint_agreement: Quality floor for the pose tracker (share of reference keypoints matched)
+            sizes: Candidate input sizes
+            clip_frames: Frames profiled per size
+            warmup_frames: Untimed frames per size (the first call at a new size sets up the predictor)
+            keypoint_tolerance: Keypoint match distance as a fraction of the frame height
+            ball_radius: Ball match distance as a fraction of the frame width
+            min_keypoint_confidence: Confidence for a reference keypoint to count as visible
+            cache_path: JSON file with tuned sizes (default: output/cache/imgsz_autotune.json)
+        """
+        self.target_fps = target_fps
+        self.min_ball_recall = min_ball_recall
+        self.min_keypoint_agreement = min_keypoint_agreement
+        self.sizes = tuple(sorted(sizes))
+        self.clip_frames = clip_frames
+        self.warmup_frames = warmup_frames
+        self.keypoint_tolerance = keypoint_tolerance
+        self.ball_radius = ball_radius
+        self.min_keypoint_confidence = min_keypoint_confidence
+        self.cache_path = Path(cache_path) if cache_path is not None else DEFAULT_CACHE_PATH
+    
+    @staticmethod
+    def cache_key(kind: str, model_name: str, device: str, width: int, height: int) -> str:
+        """Cache key of one tracker configuration at one source resolution."""
+        return f"{kind}|{Path(str(model_name)).name}|{device}|{width}x{height}"
+    
+    def candidate_sizes(self, width: int, height: int) -> List[int]:
+        """Candidate sizes for a source resolution (no larger than the source, rounded up to the stride)."""
+        limit = int(math.ceil(max(width, height) / 32) * 32)
+        sizes = [size for size in self.sizes if size <= limit]
+        return sizes or [self.sizes[0]]
+    
+    def tune_ball(self, tracker, frames: List[np.ndarray], use_cache: bool = True) -> Dict:
+        """
+        Tune and apply the input size of a BallTracker.
+        
+        Args:
+            tracker: BallTracker (its imgsz is set to the chosen size)
+            frames: Clip from the video or camera (BGR)
+            use_cache: Reuse a cached choice for this resolution
+        
+        Returns:
+            Tuning result (see tune)
+        """
+        def run(size: int, clip: List[np.ndarray]) -> List[Optional[Tuple[float, float]]]:
+            tracker.imgsz = size
+            positions = []
+            for i, frame in enumerate(clip):
+                ball = tracker._detect_in_image(frame, i + 1, i / 30.0)
+                positions.append((ball.x, ball.y) if ball is not None else None)
+            return positions
+        
+        radius = self.ball_radius * frames[0].shape[1]
+        
+        def quality(reference: List, outputs: List) -> Optional[float]:
+            return self._ball_recall(reference, outputs, radius)
+        
+        result = self.tune("ball", tracker, frames, run, quality, self.min_ball_recall, use_cache)
+        tracker.imgsz = result['imgsz']
+        return result
+    
+    def tune_pose(self, tracker, frames: List[np.ndarray], use_cache: bool = True) -> Dict:
+        """
+        Tune and apply the input size of a PlayerTracker.
+        
+        Args:
+            tracker: PlayerTracker (its imgsz is set to the chosen size)
+            frames: Clip from the video or camera (BGR)
+            use_cache: Reuse a cached choice for this resolution
+        
+        Returns:
+            Tuning result (see tune)
+        """
+        def run(size: int, clip: List[np.ndarray]) -> List[Dict]:
+            tracker.imgsz = size
+            tracker.reset()
+            poses = []
+            for i, frame in enumerate(clip):
+                # Always the model (no optical-flow propagation): this profiles the model
+                pose_data_list = tracker._infer_poses(frame, i, i / 30.0)
+                poses.append({pose.player_id: pose for pose in pose_data_list})
+            tracker.reset()
+            return poses
+        
+        tolerance = self.keypoint_tolerance * frames[0].shape[0]
+        
+        def quality(reference: List, outputs: List) -> Optional[float]:
+            return self._keypoint_agreement(reference, outputs, tolerance)
+        
+        result = self.tune("pose", tracker, frames, run, quality, self.min_keypoint_agreement, use_cache)
+        tracker.imgsz = result['imgsz']
+        return result
+    
+    def tune(self, kind: str, tracker, frames: List[np.ndarray], run: Callable[[int, List[np.ndarray]], List],
+             quality: Callable[[List, List], Optional[float]], quality_floor: float,
+             use_cache: bool = True) -> Dict:
+        """
+        Profile the candidate sizes and choose one.
+        
+        The largest candidate is the quality reference. Smaller sizes are then
+        tried from the smallest up, stopping at the first one that reaches both
+        the target FPS and the quality floor. If none does, the smallest size
+        that meets the quality floor is used (nothing larger is faster).
+        
+        Args:
+            kind: "ball" or "pose"
+            tracker: Tracker being tuned (model name and device go into the cache key)
+            frames: Clip to profile
+            run: Runs the tracker on frames at a size and returns one output per frame
+            quality: Scores outputs against the reference outputs (None = nothing to compare)
+            quality_floor: Minimum quality
+            use_cache: Reuse a cached choice
+        
+        Returns:
+            Dictionary with 'imgsz', 'meets_target_fps', 'meets_quality', per-size 'profiles',
+            'resolution' and 'cached'
+        """
+        if not frames:
+            raise ValueError("No frames to profile")
+        
+        height, width = frames[0].shape[:2]
+        key = self.cache_key(kind, tracker.model.model_path, tracker.device, width, height)
+        settings = {'target_fps': self.target_fps, 'quality_floor': quality_floor}
+        
+        cache = self._load_cache()
+        cached = cache.get(key)
+        if use_cache and cached is not None and cached.get('settings') == settings:
+            print(f"🎯 Autotune ({kind}): imgsz {cached['imgsz']} for {width}x{height} (cached)")
+            return {**cached, 'cached': True}
+        
+        frames = frames[:self.warmup_frames + self.clip_frames]
+        sizes = self.candidate_sizes(width, height)
+        reference_size = sizes[-1]
+        print(f"🎯 Autotune ({kind}): profiling sizes {sizes} on {len(frames)} frames at {width}x{height}...")
+        
+        profiles = {}
+        reference_outputs, reference_fps = self._profile(run, frames, reference_size)
+        profiles[reference_size] = {'fps': reference_fps, 'quality': 1.0}
+        
+        chosen = None
+        for size in sizes[:-1]:
+            outputs, fps = self._profile(run, frames, size)
+            size_quality = quality(reference_outputs[self.warmup_frames:], outputs[self.warmup_frames:])
+            profiles[size] = {'fps': fps, 'quality': round(size_quality, 4) if size_quality is not None else None}
+            print(f"   imgsz {size:>5}: {fps:6.1f} fps, quality {profiles[size]['quality']}")
+            if fps >= self.target_fps and (size_quality is None or size_quality >= quality_floor):
+                chosen = size
+                break
+        
+        if chosen is None:
+            passing = [size for size in sorted(profiles)
+                       if profiles[size]['quality'] is None or profiles[size]['quality'] >= quality_floor]
+            chosen = passing[0] if passing else reference_size
+        
+        result = {
+            'imgsz': chosen,
+            'reference_imgsz': reference_size,
+            'fps': profiles[chosen]['fps'],
+            'quality': profiles[chosen]['quality'],
+            'meets_target_fps': profiles[chosen]['fps'] >= self.target_fps,
+            'meets_quality': profiles[chosen]['quality'] is None or profiles[chosen]['quality'] >= quality_floor,
+            'profiles': {str(size): profile for size, profile in sorted(profiles.items())},
+            'resolution': f"{width}x{height}",
+            'settings': settings,
+            'tuned_at': datetime.now().isoformat()
+        }
+        
+        cache[key] = result
+        self._save_cache(cache)
+        
+        status = "" if result['meets_target_fps'] else f" (below the {self.target_fps:.0f} fps target)"
+        print(f"🎯 Autotune ({kind}): imgsz {chosen} at {result['fps']:.1f} fps{status}")
+        return {**result, 'cached': False}
+    
+    def _profile(self, run: Callable[[int, List[np.ndarray]], List], frames: List[np.ndarray],
+                 size: int) -> Tuple[List, float]:
+        """Run one size and return its outputs and the FPS after the warmup frames."""
+        warmup = frames[:self.warmup_frames]
+        timed = frames[self.warmup_frames:]
+        
+        # Trackers print per-frame debug output
+        with redirect_stdout(io.StringIO()):
+            warmup_outputs = run(size, warmup) if warmup else []
+            start = time.perf_counter()
+            outputs = run(size, timed)
+            elapsed = time.perf_counter() - start
+        
+        fps = len(timed) / elapsed if elapsed > 0 else 0.0
+        return warmup_outputs + outputs, round(fps, 2)
+    
+    def _ball_recall(self, reference: List, outputs: List, radius: float) -> Optional[float]:
+        """Share of reference ball detections found within radius pixels."""
+        found = total = 0
+        for expected, detected in zip(reference, outputs):
+            if expected is None:
+                continue
+            total += 1
+            if detected is not None and math.hypot(expected[0] - detected[0], expected[1] - detected[1]) <= radius:
+                found += 1
+        return found / total if total > 0 else None
+    
+    def _keypoint_agreement(self, reference: List[Dict], outputs: List[Dict], tolerance: float) -> Optional[float]:
+        """Share of visible reference keypoints matched within tolerance pixels (same player ID)."""
+        matched = total = 0
+        for expected_poses, poses in zip(reference, outputs):
+            for player_id, expected in expected_poses.items():
+                pose = poses.get(player_id)
+                for name, keypoint in expected.all_keypoints.items():
+                    if keypoint.confidence < self.min_keypoint_confidence:
+                        continue
+                    total += 1
+                    other = pose.all_keypoints.get(name) if pose is not None else None
+                    if other is not None and math.hypot(keypoint.x - other.x, keypoint.y - other.y) <= tolerance:
+                        matched += 1
+        return matched / total if total > 0 else None
+    
+    def _load_cache(self) -> Dict:
+        """Read the cache (empty if missing or unreadable)."""
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+    
+    def _save_cache(self, cache: Dict):
+        """Write the cache atomically (batch workers may tune at the same time)."""
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(f"{self.cache_path.suffix}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
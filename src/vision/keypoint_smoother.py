@@ -0,0 +1,301 @@
+"""
+Temporal keypoint smoothing for pose tracks.
+Filters all 17 COCO keypoints of every player at once, either streaming
+(One-Euro filter, for live use) or in batch over a player's pose sequence
+(Savitzky-Golay or One-Euro), to remove frame-to-frame YOLO jitter.
+"""
+from typing import List, Optional, Dict
+import copy
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from models.pose_data import PoseData, Keypoint
+
+
+class OneEuroFilter:
+    """
+    Vectorized One-Euro filter over arrays of 2D points.
+    Low jitter at rest (low cutoff), low lag during fast swings (cutoff grows with speed).
+    """
+    
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.05, d_cutoff: float = 1.0):
+        """
+        Initialize the filter.
+        
+        Args:
+            min_cutoff: Cutoff frequency (Hz) at rest; lower = smoother
+            beta: Cutoff increase per px/s of speed; higher = less lag on fast motion
+            d_cutoff: Cutoff frequency (Hz) for the speed estimate
+        """
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        
+        self.x_prev: Optional[np.ndarray] = None  # (..., 2) filtered positions
+        self.dx_prev: Optional[np.ndarray] = None  # (..., 2) filtered velocities (px/s)
+        self.t_prev: Optional[np.ndarray] = None  # (...) time of each point's last update
+    
+    @staticmethod
+    def _alpha(cutoff: np.ndarray, dt: np.ndarray) -> np.ndarray:
+        """Smoothing factor of a first-order low-pass filter."""
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+    
+    def reset(self, mask: Optional[np.ndarray] = None):
+        """
+        Forget the filter state.
+        
+        Args:
+            mask: Boolean array over the point dimensions to reset (None = all)
+        """
+        if mask is None or self.x_prev is None:
+            self.x_prev = None
+            self.dx_prev = None
+            self.t_prev = None
+        else:
+            self.t_prev[mask] = np.nan
+    
+    def __call__(self, x: np.ndarray, t: np.ndarray, valid: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Filter one sample of points.
+        
+        Args:
+            x: (..., 2) raw positions
+            t: Sample time in seconds, broadcastable to x.shape[:-1]
+            valid: Boolean mask over x.shape[:-1]; invalid points pass through and keep their state
+        
+        Returns:
+            (..., 2) filtered positions
+        """
+        x = np.asarray(x, dtype=float)
+        t = np.broadcast_to(np.asarray(t, dtype=float), x.shape[:-1])
+        if valid is None:
+            valid = np.ones(x.shape[:-1], dtype=bool)
+        
+        if self.x_prev is None:
+            self.x_prev = x.copy()
+            self.dx_prev = np.zeros_like(x)
+            self.t_prev = np.where(valid, t, np.nan)
+            return x.copy()
+        
+        dt = t - self.t_prev
+        # Points without usable history (new, reset or out-of-order) restart from the raw value
+        fresh = valid & ~(dt > 0)
+        update = valid & (dt > 0)
+        dt = np.where(update, dt, 1.0)[..., None]
+        
+        dx = (x - self.x_prev) / dt
+        a_d = self._alpha(self.d_cutoff, dt)
+        dx_hat = a_d * dx + (1 - a_d) * self.dx_prev
+        
+        cutoff = self.min_cutoff + self.beta * np.linalg.norm(dx_hat, axis=-1, keepdims=True)
+        a = self._alpha(cutoff, dt)
+        x_hat = a * x + (1 - a) * self.x_prev
+        
+        out = np.where(update[..., None], x_hat, x)
+        
+        self.x_prev = np.where((update | fresh)[..., None], out, self.x_prev)
+        self.dx_prev = np.where(update[..., None], dx_hat, np.where(fresh[..., None], 0.0, self.dx_prev))
+        self.t_prev = np.where(update | fresh, t, self.t_prev)
+        
+        return out
+
+
+class KeypointSmoother:
+    """
+    Smoothing stage for PoseData.
+    Streaming mode filters each frame's players as they arrive; batch mode
+    filters a whole per-player pose sequence, splitting it at time gaps.
+    """
+    
+    def __init__(self,
+                 method: str = "savgol",
+                 min_cutoff: float = 1.0,
+                 beta: float = 0.05,
+                 window: int = 7,
+                 polyorder: int = 2,
+                 min_confidence: float = 0.3,
+                 max_gap: float = 0.5,
+                 max_players: int = 2):
+        """
+        Initialize the smoother.
+        
+        Args:
+            method: Batch method, "savgol" or "one_euro" (streaming always uses One-Euro)
+            min_cutoff: One-Euro cutoff frequency (Hz) at rest
+            beta: One-Euro speed coefficient
+            window: Savitzky-Golay window length in samples (odd)
+            polyorder: Savitzky-Golay polynomial order
+            min_confidence: Keypoints below this confidence are passed through unfiltered
+            max_gap: Time gap (seconds) after which a track restarts instead of being smoothed across
+            max_players: Number of player IDs handled in streaming mode
+        """
+        self.method = method
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.window = window
+        self.polyorder = polyorder
+        self.min_confidence = min_confidence
+        self.max_gap = max_gap
+        self.max_players = max_players
+        
+        self.num_keypoints = len(PoseData.get_coco_keypoint_names())
+        
+        # Streaming state: one filter over (players, 17, 2)
+        self.stream_filter = OneEuroFilter(min_cutoff, beta)
+        self.last_seen = np.full(max_players, -np.inf)
+    
+    def pose_to_array(self, pose_data: PoseData) -> np.ndarray:
+        """
+        Pack a pose into a (17, 3) array of (x, y, confidence).
+        Poses without all_keypoints only fill the wrists and elbows.
+        """
+        array = np.zeros((self.num_keypoints, 3))
+        keypoints = getattr(pose_data, 'all_keypoints', None) or {
+            "left_wrist": pose_data.left_wrist, "left_elbow": pose_data.left_elbow,
+            "right_wrist": pose_data.right_wrist, "right_elbow": pose_data.right_elbow
+        }
+        for i, name in enumerate(PoseData.get_coco_keypoint_names()):
+            kp = keypoints.get(name)
+            if kp is not None:
+                array[i] = (kp.x, kp.y, kp.confidence)
+        return array
+    
+    @staticmethod
+    def array_to_pose(pose_data: PoseData, array: np.ndarray) -> PoseData:
+        """
+        Build a copy of a pose with keypoint positions taken from a (17, 2+) array.
+        New Keypoint objects are created, so poses sharing keypoints are not modified.
+        """
+        smoothed = copy.copy(pose_data)
+        original = getattr(pose_data, 'all_keypoints', None)
+        
+        keypoints: Dict[str, Keypoint] = {}
+        for i, name in enumerate(PoseData.get_coco_keypoint_names()):
+            source = original.get(name) if original else getattr(pose_data, name, None)
+            if source is None:
+                continue
+            keypoints[name] = Keypoint(x=float(array[i, 0]), y=float(array[i, 1]),
+                                       confidence=source.confidence, name=name)
+        
+        if original:
+            smoothed.all_keypoints = keypoints
+        smoothed.left_wrist = keypoints.get("left_wrist")
+        smoothed.left_elbow = keypoints.get("left_elbow")
+        smoothed.right_wrist = keypoints.get("right_wrist")
+        smoothed.right_elbow = keypoints.get("right_elbow")
+        smoothed.left_arm_angle = None
+        smoothed.right_arm_angle = None
+        smoothed.compute_arm_angles()
+        return smoothed
+    
+    def update(self, pose_data_list: List[PoseData]) -> List[PoseData]:
+        """
+        Smooth one frame of poses (streaming mode).
+        
+        Args:
+            pose_data_list: Poses of the current frame, at most one per player ID
+        
+        Returns:
+            Smoothed copies of the poses, in the same order
+        """
+        if not pose_data_list:
+            return []
+        
+        points = np.zeros((self.max_players, self.num_keypoints, 2))
+        valid = np.zeros((self.max_players, self.num_keypoints), dtype=bool)
+        times = np.zeros(self.max_players)
+        
+        for pose_data in pose_data_list:
+            pid = pose_data.player_id
+            array = self.pose_to_array(pose_data)
+            points[pid] = array[:, :2]
+            valid[pid] = array[:, 2] >= self.min_confidence
+            times[pid] = pose_data.timestamp
+            
+            # Player was gone too long; do not smooth across the gap
+            if pose_data.timestamp - self.last_seen[pid] > self.max_gap:
+                reset_mask = np.zeros((self.max_players, self.num_keypoints), dtype=bool)
+                reset_mask[pid] = True
+                self.stream_filter.reset(reset_mask)
+            self.last_seen[pid] = pose_data.timestamp
+        
+        present = np.zeros(self.max_players, dtype=bool)
+        present[[p.player_id for p in pose_data_list]] = True
+        smoothed = self.stream_filter(points, times[:, None], valid & present[:, None])
+        
+        return [self.array_to_pose(p, smoothed[p.player_id]) for p in pose_data_list]
+    
+    def reset(self):
+        """Clear the streaming state."""
+        self.stream_filter.reset()
+        self.last_seen[:] = -np.inf
+    
+    def smooth_sequence(self, pose_data_list: List[PoseData]) -> List[PoseData]:
+        """
+        Smooth a whole pose sequence of one player (batch mode).
+        
+        Args:
+            pose_data_list: Poses of one player, sorted by time
+        
+        Returns:
+            Smoothed copies of the poses
+        """
+        if not pose_data_list:
+            return []
+        
+        arrays = np.stack([self.pose_to_array(p) for p in pose_data_list])
+        timestamps = np.array([p.timestamp for p in pose_data_list])
+        smoothed = self.smooth_array(arrays[..., :2], timestamps, arrays[..., 2] >= self.min_confidence)
+        
+        return [self.array_to_pose(p, smoothed[i]) for i, p in enumerate(pose_data_list)]
+    
+    def smooth_array(self, points: np.ndarray, timestamps: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """
+        Smooth a (T, K, 2) keypoint array over time.
+        
+        Args:
+            points: (T, K, 2) positions
+            timestamps: (T,) sample times in seconds
+            valid: (T, K) mask of usable keypoints; invalid ones are returned unchanged
+        
+        Returns:
+            (T, K, 2) smoothed positions
+        """
+        points = np.asarray(points, dtype=float)
+        out = points.copy()
+        
+        # Never smooth across a gap (dead time, missed detections)
+        breaks = np.flatnonzero(np.diff(timestamps) > self.max_gap) + 1
+        for segment in np.split(np.arange(len(points)), breaks):
+            if self.method == "savgol":
+                out[segment] = self._savgol_segment(points[segment], valid[segment])
+            else:
+                one_euro = OneEuroFilter(self.min_cutoff, self.beta)
+                for i in segment:
+                    out[i] = one_euro(points[i], timestamps[i], valid[i])
+        
+        return out
+    
+    def _savgol_segment(self, points: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """Savitzky-Golay filter one gap-free segment, interpolating over invalid keypoints."""
+        length = len(points)
+        window = min(self.window, length if length % 2 == 1 else length - 1)
+        if window <= self.polyorder:
+            return points
+        
+        filled = points.copy()
+        frames = np.arange(length)
+        for k in range(points.shape[1]):
+            good = valid[:, k]
+            if good.sum() < 2:
+                continue
+            if not good.all():
+                for axis in range(2):
+                    filled[~good, k, axis] = np.interp(frames[~good], frames[good], points[good, k, axis])
+        
+        from scipy.signal import savgol_filter  # scipy.signal takes about a second to import
+        smoothed = savgol_filter(filled, window, self.polyorder, axis=0, mode="interp")
+        return np.where(valid[..., None], smoothed, points)
@@ -0,0 +1,262 @@
+"""
+Process-wide registry of YOLO models.
+Each model configuration is loaded and warmed up once per process; trackers
+and analyzers get a shared, lock-protected handle to it instead of loading
+their own copy of the weights.
+"""
+from typing import Dict, List, Optional, Tuple
+import gc
+import os
+import sys
+import threading
+import time
+import numpy as np
+from pathlib import Path
+
+
+class SharedModel:
+    """
+    Thread-safe handle to a shared model.
+    Inference calls are serialized with a per-model lock (an ultralytics model
+    keeps per-call predictor state); other attributes (names, task, ...) are
+    passed through to the model.
+    """
+    
+    def __init__(self, key: Tuple, model):
+        self._key = key
+        self._model = model
+        self._lock = threading.Lock()
+        self.calls = 0
+    
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            return self._model(*args, **kwargs)
+    
+    def predict(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            return self._model.predict(*args, **kwargs)
+    
+    @property
+    def model_path(self) -> str:
+        """Weights the model was loaded from (absolute path for local files)."""
+        return self._key[0]
+    
+    def __getattr__(self, name):
+        # Only called for attributes not found on the handle itself
+        return getattr(self._model, name)
+    
+    def __repr__(self) -> str:
+        return f"SharedModel({self._key[0]!r})"
+
+
+class ModelRegistry:
+    """
+    Loads each (weights, task, device, precision) configuration once and hands out
+    shared handles. Device and precision are part of the key because ultralytics
+    sets them up on the first call only: a model warmed up on the CPU in FP32 stays
+    there even if later calls ask for 'mps' and half=True.
+    Models stay loaded until evicted; evicting only drops the registry's
+    reference, so trackers still holding a handle keep working.
+    """
+    
+    def __init__(self, warmup: bool = True, warmup_size: int = 640):
+        """
+        Initialize the registry.
+        
+        Args:
+            warmup: Run one inference on a blank image after loading, so the first real
+                    frame does not pay for lazy initialization (device transfer, fusing)
+            warmup_size: Side length of the warmup image
+        """
+        self.warmup = warmup
+        self.warmup_size = warmup_size
+        self._models: Dict[Tuple, Dict] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _weights_name(model_path: str) -> str:
+        """Local weights by absolute path, hub names as given."""
+        path = Path(model_path)
+        return str(path.resolve()) if path.exists() else str(model_path)
+    
+    @classmethod
+    def _key(cls, model_path: str, task: Optional[str], device: Optional[str], half: bool) -> Tuple:
+        """Registry key: weights, task, inference device and precision."""
+        return (cls._weights_name(model_path), task, device, bool(half))
+    
+    def get(self, model_path: str, task: Optional[str] = None,
+            device: Optional[str] = None, half: bool = False) -> SharedModel:
+        """
+        Get the shared model for a weights file, loading it on first use.
+        
+        Args:
+            model_path: YOLO weights path or name (e.g. "yolo11n-pose.pt")
+            task: Optional ultralytics task override ("detect", "pose", ...)
+            device: Inference device ('mps', 'cpu', 'cuda:0', ...; None = ultralytics default)
+            half: FP16 inference
+        
+        Returns:
+            Shared, thread-safe model handle (callers must infer with the same device and half)
+        """
+        key = self._key(model_path, task, device, half)
+        
+        # Loading happens under the lock, so concurrent callers never load the same weights twice
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                entry = self._load(key, model_path, task, device, half)
+                self._models[key] = entry
+            entry['handouts'] += 1
+            entry['last_used'] = time.time()
+            return entry['model']
+    
+    def _load(self, key: Tuple, model_path: str, task: Optional[str],
+              device: Optional[str], half: bool) -> Dict:
+        """Load and warm up one model on its device and precision."""
+        # Imported here: ultralytics pulls in torch, which takes seconds to load
+        from ultralytics import YOLO
+        
+        start = time.time()
+        model = YOLO(model_path, task=task) if task is not None else YOLO(model_path)
+        load_time = time.time() - start
+        
+        warmup_time = 0.0
+        if self.warmup:
+            start = time.time()
+            blank = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+            # The first call builds the predictor, which moves and casts the weights
+            model(blank, verbose=False, device=device, half=half)
+            warmup_time = time.time() - start
+        
+        print(f"📦 Model registry: loaded {model_path} ({device or 'default device'}, "
+              f"{'FP16' if half else 'FP32'}) in {load_time:.2f}s (warmup {warmup_time:.2f}s)")
+        return {
+            'model': SharedModel(key, model),
+            'load_time': load_time,
+            'warmup_time': warmup_time,
+            'loaded_at': time.time(),
+            'last_used': time.time(),
+            'handouts': 0,
+            'parameter_bytes': self._parameter_bytes(model)
+        }
+    
+    @staticmethod
+    def _parameter_bytes(model) -> Optional[int]:
+        """Size of a model's weights (None if it does not expose torch parameters)."""
+        try:
+            return int(sum(p.numel() * p.element_size() for p in model.model.parameters()))
+        except (AttributeError, TypeError):
+            return None
+    
+    def evict(self, model_path: Optional[str] = None, task: Optional[str] = None) -> int:
+        """
+        Drop models from the registry.
+        
+        Args:
+            model_path: Weights to evict, on every device and precision (None = all models)
+            task: Only evict the weights loaded with this task (None = any task)
+        
+        Returns:
+            Number of evicted models
+        """
+        with self._lock:
+            if model_path is None:
+                evicted = len(self._models)
+                self._models.clear()
+            else:
+                name = self._weights_name(model_path)
+                keys = [key for key in self._models if key[0] == name and (task is None or key[1] == task)]
+                for key in keys:
+                    del self._models[key]
+                evicted = len(keys)
+        
+        if evicted:
+            self._release_device_memory()
+        return evicted
+    
+    def evict_idle(self, max_idle: float) -> int:
+        """
+        Drop models not handed out for max_idle seconds.
+        
+        Returns:
+            Number of evicted models
+        """
+        now = time.time()
+        with self._lock:
+            idle = [key for key, entry in self._models.items() if now - entry['last_used'] > max_idle]
+            for key in idle:
+                del self._models[key]
+        
+        if idle:
+            self._release_device_memory()
+        return len(idle)
+    
+    @staticmethod
+    def _release_device_memory():
+        """Return cached GPU memory after evicting (only if torch is already loaded)."""
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    
+    def loaded_models(self) -> List[str]:
+        """Weights currently loaded."""
+        with self._lock:
+            return [key[0] for key in self._models]
+    
+    def memory_report(self) -> Dict:
+        """
+        Report loaded models and process memory.
+        
+        Returns:
+            Dictionary with per-model weight sizes and usage, and the process RSS
+        """
+        with self._lock:
+            models = [{
+                'model': key[0],
+                'task': key[1],
+                'device': key[2],
+                'half': key[3],
+                'parameter_mb': round(entry['parameter_bytes'] / 1e6, 2) if entry['parameter_bytes'] else None,
+                'load_time': round(entry['load_time'], 3),
+                'warmup_time': round(entry['warmup_time'], 3),
+                'handouts': entry['handouts'],
+                'inference_calls': entry['model'].calls,
+                'idle_seconds': round(time.time() - entry['last_used'], 1)
+            } for key, entry in self._models.items()]
+        
+        return {
+            'models': models,
+            'model_count': len(models),
+            'parameter_mb': round(sum(m['parameter_mb'] or 0 for m in models), 2),
+            'process_rss_mb': self._process_rss_mb(),
+            # Loads avoided because a configuration was already in memory
+            'shared_handouts': sum(max(0, m['handouts'] - 1) for m in models)
+        }
+    
+    @staticmethod
+    def _process_rss_mb() -> Optional[float]:
+        """Resident memory of this process."""
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().rss / 1e6, 1)
+        except ImportError:
+            pass
+        try:
+            with open("/proc/self/statm") as f:
+                pages = int(f.read().split()[1])
+            return round(pages * os.sysconf("SC_PAGE_SIZE") / 1e6, 1)
+        except (OSError, ValueError, AttributeError):
+            return None
+
+
+# Shared by everything in this process
+registry = ModelRegistry()
+
+
+def get_model(model_path: str, task: Optional[str] = None,
+              device: Optional[str] = None, half: bool = False) -> SharedModel:
+    """Get the process-wide shared model for a weights file (see ModelRegistry.get)."""
+    return registry.get(model_path, task, device, half)
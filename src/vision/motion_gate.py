@@ -0,0 +1,141 @@
+"""
+Motion gate for skipping inference on static frames.
+Compares downscaled grayscale frames so quiet stretches between rallies
+(players walking, picking up the ball, toweling off) can skip or thin out
+YOLO inference.
+"""
+from typing import Dict, Optional
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Decides per frame whether the scene changed enough to run inference.
+    The scene only counts as quiet after several consecutive low-motion frames,
+    so brief pauses inside a rally still get full-rate inference.
+    """
+    
+    def __init__(self,
+                 downscale_width: int = 160,
+                 pixel_threshold: int = 15,
+                 motion_threshold: float = 0.002,
+                 quiet_frames: int = 15,
+                 quiet_interval: int = 10):
+        """
+        Initialize the motion gate.
+        
+        Args:
+            downscale_width: Width (pixels) frames are shrunk to before differencing
+            pixel_threshold: Gray-level change (0-255) for a pixel to count as moving
+            motion_threshold: Fraction of moving pixels above which the frame is active
+            quiet_frames: Consecutive low-motion frames before the scene counts as quiet
+            quiet_interval: While quiet, still run inference every N frames (0 = never)
+        """
+        self.downscale_width = downscale_width
+        self.pixel_threshold = pixel_threshold
+        self.motion_threshold = motion_threshold
+        self.quiet_frames = quiet_frames
+        self.quiet_interval = quiet_interval
+        
+        # Reused downscaled buffers (previous and current frame)
+        self._previous: Optional[np.ndarray] = None
+        self._current: Optional[np.ndarray] = None
+        self._diff: Optional[np.ndarray] = None
+        
+        self.last_motion = 0.0
+        self.quiet_count = 0
+        self.frames_since_inference = 0
+        
+        # Statistics
+        self.total_frames = 0
+        self.inferred_frames = 0
+        self.skipped_frames = 0
+    
+    def measure_motion(self, frame: np.ndarray) -> float:
+        """
+        Measure the fraction of pixels that changed since the previous frame.
+        
+        Args:
+            frame: Input frame (BGR format)
+        
+        Returns:
+            Fraction (0-1) of downscaled pixels that moved, 1.0 for the first frame
+        """
+        height, width = frame.shape[:2]
+        small_size = (self.downscale_width, max(1, int(height * self.downscale_width / width)))
+        
+        if self._current is None or self._current.shape[::-1] != small_size:
+            self._current = np.empty(small_size[::-1], dtype=np.uint8)
+            self._diff = np.empty(small_size[::-1], dtype=np.uint8)
+            self._previous = None
+        
+        gray = cv2.cvtColor(cv2.resize(frame, small_size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        # Blur away sensor noise and compression flicker
+        cv2.GaussianBlur(gray, (5, 5), 0, dst=self._current)
+        
+        if self._previous is None:
+            motion = 1.0
+            self._previous = self._current.copy()
+        else:
+            cv2.absdiff(self._current, self._previous, dst=self._diff)
+            moving = np.count_nonzero(self._diff > self.pixel_threshold)
+            motion = moving / self._diff.size
+            self._previous, self._current = self._current, self._previous
+        
+        self.last_motion = motion
+        return motion
+    
+    def should_process(self, frame: np.ndarray) -> bool:
+        """
+        Check whether inference should run on a frame.
+        
+        Args:
+            frame: Input frame (BGR format)
+        
+        Returns:
+            True to run inference, False to reuse the previous result
+        """
+        self.total_frames += 1
+        motion = self.measure_motion(frame)
+        
+        if motion > self.motion_threshold:
+            self.quiet_count = 0
+        else:
+            self.quiet_count += 1
+        
+        process = True
+        if self.quiet_count >= self.quiet_frames:
+            # Quiet scene: thin out inference instead of stopping it completely
+            process = self.quiet_interval > 0 and self.frames_since_inference + 1 >= self.quiet_interval
+        
+        if process:
+            self.inferred_frames += 1
+            self.frames_since_inference = 0
+        else:
+            self.skipped_frames += 1
+            self.frames_since_inference += 1
+        
+        return process
+    
+    @property
+    def is_quiet(self) -> bool:
+        """Whether the scene is currently considered static."""
+        return self.quiet_count >= self.quiet_frames
+    
+    def reset(self):
+        """Forget the previous frame and quiet streak."""
+        self._previous = None
+        self.quiet_count = 0
+        self.frames_since_inference = 0
+    
+    def get_statistics(self) -> Dict:
+        """Get counts of gated frames."""
+        skip_ratio = self.skipped_frames / self.total_frames if self.total_frames > 0 else 0.0
+        
+        return {
+            'gated_frames': self.total_frames,
+            'inferred_frames': self.inferred_frames,
+            'skipped_frames': self.skipped_frames,
+            'skip_ratio': skip_ratio
+        }
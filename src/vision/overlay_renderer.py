@@ -0,0 +1,400 @@
+"""
+Post-hoc overlay rendering for table tennis videos.
+Draws stored pose and ball results onto the original video in a separate pass,
+so overlay styles can change without re-running the models and inference runs
+do not have to draw at all.
+"""
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from models.pose_data import PoseData
+from models.ball_data import BallData
+from vision.video_writer import create_video_writer
+
+
+KEYPOINT_NAMES = PoseData.get_coco_keypoint_names()
+
+# Skeleton connections (COCO format) as keypoint index pairs
+SKELETON_EDGES = np.array([
+    [KEYPOINT_NAMES.index(start), KEYPOINT_NAMES.index(end)] for start, end in [
+        # Face
+        ("nose", "left_eye"), ("nose", "right_eye"),
+        ("left_eye", "left_ear"), ("right_eye", "right_ear"),
+        # Upper body
+        ("left_shoulder", "right_shoulder"),
+        ("left_shoulder", "left_elbow"), ("left_elbow", "left_wrist"),
+        ("right_shoulder", "right_elbow"), ("right_elbow", "right_wrist"),
+        # Torso
+        ("left_shoulder", "left_hip"), ("right_shoulder", "right_hip"), ("left_hip", "right_hip"),
+        # Lower body
+        ("left_hip", "left_knee"), ("left_knee", "left_ankle"),
+        ("right_hip", "right_knee"), ("right_knee", "right_ankle")
+    ]
+])
+
+# Keypoint groups drawn with one color and radius: (indices, color or None for player color, radius)
+KEYPOINT_STYLES = [
+    (np.array([i for i, n in enumerate(KEYPOINT_NAMES) if "wrist" in n]), (0, 255, 255), 6),  # Yellow wrists
+    (np.array([i for i, n in enumerate(KEYPOINT_NAMES) if "elbow" in n or "knee" in n]), None, 5),
+    (np.array([i for i, n in enumerate(KEYPOINT_NAMES) if "shoulder" in n or "hip" in n]), (255, 255, 0), 5),
+    (np.array([i for i, n in enumerate(KEYPOINT_NAMES)
+               if not any(part in n for part in ("wrist", "elbow", "knee", "shoulder", "hip"))]),
+     (255, 255, 255), 4)
+]
+
+PLAYER_COLORS = {0: (0, 255, 0), 1: (255, 0, 0)}
+
+
+class OverlayRenderer:
+    """
+    Renders pose skeletons and ball trajectories from stored results.
+    Results are packed into per-player arrays once; each frame then needs one
+    index lookup and a single polylines call per skeleton.
+    """
+    
+    def __init__(self,
+                 video_path: str,
+                 confidence_threshold: float = 0.3,
+                 max_hold: float = 0.2,
+                 trail_length: int = 15,
+                 workers: Optional[int] = None,
+                 show_info: bool = True,
+                 video_backend: str = "auto",
+                 preset: str = "veryfast",
+                 crf: int = 23):
+        """
+        Initialize the renderer.
+        
+        Args:
+            video_path: Original (unannotated) video the results were computed on
+            confidence_threshold: Keypoints below this confidence are not drawn
+            max_hold: Seconds a stored pose stays on screen on frames without their own result
+                      (frame skipping, rally dead time, adaptive sampling)
+            trail_length: Number of past ball positions drawn as the trajectory
+            workers: Parallel render chunks (None = CPU count); needs ffmpeg to join the chunks
+            show_info: Draw the frame/time/player info overlay
+            video_backend: Writer backend, "ffmpeg" (H.264), "opencv" (mp4v) or "auto"
+            preset: x264 preset for the ffmpeg backend
+            crf: x264 CRF for the ffmpeg backend
+        """
+        self.video_path = Path(video_path)
+        self.confidence_threshold = confidence_threshold
+        self.max_hold = max_hold
+        self.trail_length = trail_length
+        self.workers = workers or os.cpu_count() or 1
+        self.show_info = show_info
+        self.video_backend = video_backend
+        self.preset = preset
+        self.crf = crf
+        
+        cap = cv2.VideoCapture(str(self.video_path))
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video file: {video_path}")
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        
+        # Per player: sorted frame numbers (N,) and keypoints (N, 17, 3)
+        self.pose_frames: Dict[int, np.ndarray] = {}
+        self.pose_points: Dict[int, np.ndarray] = {}
+        
+        # Ball: sorted frame numbers (M,) and positions (M, 2)
+        self.ball_frames = np.zeros(0, dtype=int)
+        self.ball_points = np.zeros((0, 2))
+    
+    def set_poses(self, pose_data: Dict[int, List[PoseData]]):
+        """
+        Use in-memory pose results.
+        
+        Args:
+            pose_data: Player ID -> list of PoseData (as VideoProcessor.all_pose_data)
+        """
+        for player_id, pose_list in pose_data.items():
+            rows = [(p.frame_number, self._pose_to_array(p)) for p in pose_list]
+            self._set_player_track(player_id, rows)
+    
+    def load_pose_json(self, json_path: str):
+        """
+        Load pose results saved by VideoProcessor.save_pose_data_json.
+        Full skeletons need the file saved with include_all_keypoints; otherwise
+        only the arms are drawn.
+        """
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        
+        for key, pose_list in data.items():
+            if not key.startswith("player_"):
+                continue
+            rows = []
+            for pose in pose_list:
+                array = np.zeros((len(KEYPOINT_NAMES), 3))
+                if "keypoints" in pose:
+                    array[:] = pose["keypoints"]
+                else:
+                    for name in ("left_wrist", "left_elbow", "right_wrist", "right_elbow"):
+                        kp = pose.get(name)
+                        if kp:
+                            array[KEYPOINT_NAMES.index(name)] = (kp["x"], kp["y"], kp["confidence"])
+                rows.append((pose["frame"], array))
+            self._set_player_track(int(key.split("_")[1]), rows)
+    
+    def set_ball(self, ball_data: List[BallData]):
+        """Use in-memory ball results."""
+        self._set_ball_track([(b.frame_number, b.x, b.y) for b in ball_data])
+    
+    def load_ball_json(self, json_path: str):
+        """
+        Load ball results stored as compact BallData dicts, either as a plain list
+        or under a "detections" key.
+        """
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        
+        detections = data.get("detections", []) if isinstance(data, dict) else data
+        self._set_ball_track([(d["f"], d["x"], d["y"]) for d in detections])
+    
+    def _set_player_track(self, player_id: int, rows: List[Tuple[int, np.ndarray]]):
+        """Store one player's poses as frame-sorted arrays."""
+        rows.sort(key=lambda row: row[0])
+        self.pose_frames[player_id] = np.array([row[0] for row in rows], dtype=int)
+        self.pose_points[player_id] = (np.stack([row[1] for row in rows]) if rows
+                                       else np.zeros((0, len(KEYPOINT_NAMES), 3)))
+    
+    def _set_ball_track(self, rows: List[Tuple[int, float, float]]):
+        """Store ball positions as frame-sorted arrays."""
+        rows.sort(key=lambda row: row[0])
+        self.ball_frames = np.array([row[0] for row in rows], dtype=int)
+        self.ball_points = np.array([row[1:] for row in rows], dtype=float).reshape(-1, 2)
+    
+    @staticmethod
+    def _pose_to_array(pose_data: PoseData) -> np.ndarray:
+        """Pack a pose into a (17, 3) array of (x, y, confidence)."""
+        array = np.zeros((len(KEYPOINT_NAMES), 3))
+        keypoints = getattr(pose_data, 'all_keypoints', None) or {}
+        for i, name in enumerate(KEYPOINT_NAMES):
+            kp = keypoints.get(name) or getattr(pose_data, name, None)
+            if kp is not None:
+                array[i] = (kp.x, kp.y, kp.confidence)
+        return array
+    
+    def pose_indices(self, frame_numbers: np.ndarray) -> Dict[int, np.ndarray]:
+        """
+        Find the pose to draw for each frame.
+        
+        Args:
+            frame_numbers: (F,) video frame indices
+        
+        Returns:
+            Player ID -> (F,) index into that player's pose arrays (-1 = nothing to draw)
+        """
+        max_hold_frames = int(round(self.max_hold * self.fps))
+        indices = {}
+        for player_id, frames in self.pose_frames.items():
+            idx = np.searchsorted(frames, frame_numbers, side='right') - 1
+            held = idx >= 0
+            held[held] = frame_numbers[held] - frames[idx[held]] <= max_hold_frames
+            indices[player_id] = np.where(held, idx, -1)
+        return indices
+    
+    def draw_frame(self, frame: np.ndarray, frame_number: int,
+                   pose_index: Optional[Dict[int, int]] = None) -> np.ndarray:
+        """
+        Draw all overlays for one frame in place.
+        
+        Args:
+            frame: Video frame (BGR format)
+            frame_number: Video frame index
+            pose_index: Precomputed player ID -> pose index (from pose_indices)
+        
+        Returns:
+            The annotated frame
+        """
+        if pose_index is None:
+            pose_index = {pid: int(idx[0]) for pid, idx in self.pose_indices(np.array([frame_number])).items()}
+        
+        players = 0
+        for player_id, idx in pose_index.items():
+            if idx < 0:
+                continue
+            self.draw_skeleton(frame, self.pose_points[player_id][idx], player_id)
+            players += 1
+        
+        self.draw_ball(frame, frame_number)
+        
+        if self.show_info:
+            info_y = 30
+            cv2.putText(frame, f"Frame: {frame_number}/{self.total_frames}",
+                        (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            info_y += 25
+            cv2.putText(frame, f"Time: {frame_number / self.fps:.2f}s",
+                        (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            info_y += 25
+            cv2.putText(frame, f"Players: {players}",
+                        (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        return frame
+    
+    def draw_skeleton(self, frame: np.ndarray, keypoints: np.ndarray, player_id: int):
+        """
+        Draw one player's skeleton from a (17, 3) keypoint array.
+        All bones go out in a single polylines call.
+        """
+        color = PLAYER_COLORS.get(player_id, (0, 165, 255))
+        visible = keypoints[:, 2] > self.confidence_threshold
+        points = np.round(keypoints[:, :2]).astype(np.int32)
+        
+        edges = SKELETON_EDGES[visible[SKELETON_EDGES[:, 0]] & visible[SKELETON_EDGES[:, 1]]]
+        if len(edges) > 0:
+            cv2.polylines(frame, points[edges], False, color, 2)
+        
+        for indices, point_color, radius in KEYPOINT_STYLES:
+            for x, y in points[indices[visible[indices]]]:
+                cv2.circle(frame, (int(x), int(y)), radius, point_color or color, -1)
+        
+        # Label above the head (topmost visible keypoint)
+        if visible.any():
+            top = points[visible][np.argmin(points[visible][:, 1])]
+            cv2.putText(frame, f"Player {player_id}", (int(top[0]) - 40, int(top[1]) - 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    
+    def draw_ball(self, frame: np.ndarray, frame_number: int):
+        """Draw the ball trajectory up to a frame and the current position."""
+        end = np.searchsorted(self.ball_frames, frame_number, side='right')
+        if end == 0:
+            return
+        start = max(0, end - self.trail_length)
+        trail = self.ball_points[start:end][self.ball_frames[start:end] > frame_number - 2 * self.trail_length]
+        trail = np.round(trail).astype(np.int32)
+        
+        if len(trail) >= 2:
+            cv2.polylines(frame, [trail], False, (255, 0, 255), 3)
+        
+        if self.ball_frames[end - 1] == frame_number:
+            center = (int(trail[-1][0]), int(trail[-1][1]))
+            cv2.circle(frame, center, 15, (0, 165, 255), 2)
+            cv2.circle(frame, center, 8, (0, 165, 255), -1)
+    
+    def render(self, output_path: str, start_frame: int = 0, end_frame: Optional[int] = None) -> Dict:
+        """
+        Render the annotated video.
+        The frame range is split into contiguous chunks rendered in parallel and joined
+        without re-encoding; without ffmpeg the range is rendered in one chunk.
+        
+        Args:
+            output_path: Output video path
+            start_frame: First video frame to render
+            end_frame: Last video frame to render (inclusive, None = end of video)
+        
+        Returns:
+            Dictionary with rendering statistics
+        """
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        if end_frame is None or end_frame >= self.total_frames:
+            end_frame = self.total_frames - 1
+        
+        workers = self.workers if shutil.which("ffmpeg") else 1
+        bounds = np.linspace(start_frame, end_frame + 1, min(workers, end_frame - start_frame + 1) + 1).astype(int)
+        chunks = list(zip(bounds[:-1], bounds[1:] - 1))
+        
+        print(f"\n🎨 Rendering overlays for frames {start_frame}-{end_frame} in {len(chunks)} chunk(s)...")
+        start_time = time.time()
+        
+        if len(chunks) == 1:
+            frames_written = self._render_chunk(chunks[0][0], chunks[0][1], output_path)
+        else:
+            with tempfile.TemporaryDirectory(dir=output_path.parent) as tmp_dir:
+                part_paths = [Path(tmp_dir) / f"part_{i:03d}.mp4" for i in range(len(chunks))]
+                with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+                    frames_written = sum(executor.map(
+                        lambda job: self._render_chunk(job[0][0], job[0][1], job[1]),
+                        zip(chunks, part_paths)))
+                self._concat_parts(part_paths, output_path)
+        
+        elapsed = time.time() - start_time
+        render_fps = frames_written / elapsed if elapsed > 0 else 0
+        print(f"   Rendered {frames_written} frames in {elapsed:.1f}s ({render_fps:.1f} FPS)")
+        print(f"   Saved to: {output_path}")
+        
+        return {
+            "rendered_frames": frames_written,
+            "render_chunks": len(chunks),
+            "render_time": elapsed,
+            "render_fps": render_fps
+        }
+    
+    def _render_chunk(self, start_frame: int, end_frame: int, output_path: Path) -> int:
+        """Render one contiguous frame range into its own file; returns the frames written."""
+        cap = cv2.VideoCapture(str(self.video_path))
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        
+        writer = create_video_writer(str(output_path), self.fps, (self.width, self.height),
+                                     backend=self.video_backend, preset=self.preset, crf=self.crf)
+        
+        frame_numbers = np.arange(start_frame, end_frame + 1)
+        indices = self.pose_indices(frame_numbers)
+        
+        written = 0
+        for i, frame_number in enumerate(frame_numbers):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            self.draw_frame(frame, int(frame_number), {pid: int(idx[i]) for pid, idx in indices.items()})
+            writer.write(frame)
+            written += 1
+        
+        cap.release()
+        writer.release()
+        return written
+    
+    @staticmethod
+    def _concat_parts(part_paths: List[Path], output_path: Path):
+        """Join chunk files in order with ffmpeg's concat demuxer (stream copy)."""
+        list_path = part_paths[0].parent / "parts.txt"
+        list_path.write_text("".join(f"file '{path.resolve()}'\n" for path in part_paths))
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", str(list_path), "-c", "copy", "-movflags", "+faststart", str(output_path)],
+            check=True
+        )
+
+
+def main():
+    """Render overlays for a processed video from its saved results."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Render pose/ball overlays from saved results")
+    parser.add_argument("video_path", type=str, help="Original input video")
+    parser.add_argument("--poses", type=str, default=None, help="Pose JSON from VideoProcessor")
+    parser.add_argument("--ball", type=str, default=None, help="Ball JSON (compact BallData dicts)")
+    parser.add_argument("--output", type=str, default=None, help="Output video path")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel render chunks")
+    
+    args = parser.parse_args()
+    
+    renderer = OverlayRenderer(args.video_path, workers=args.workers)
+    if args.poses:
+        renderer.load_pose_json(args.poses)
+    if args.ball:
+        renderer.load_ball_json(args.ball)
+    
+    output = args.output or str(Path(args.video_path).with_name(f"{Path(args.video_path).stem}_annotated.mp4"))
+    renderer.render(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,13 @@ Tracks two table tennis players and extracts pose data.
 from typing import List, Dict, Tuple, Optional
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from pathlib import Path
 import sys
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
 from models.pose_data import PoseData, Keypoint
+from vision.model_registry import get_model
 
 
 class PlayerTracker:
@@ -20,7 +20,12 @@ class PlayerTracker:
     Maintains consistent player IDs across frames.
     """
     
-    def __init__(self, model_name: str = "yolo11n-pose.pt", use_half: bool = True):
+    def __init__(self, model_name: str = "yolo11n-pose.pt", use_half: bool = True,
+                 max_players: int = 2, min_height_ratio: float = 0.2,
+                 player_region: Optional[Tuple[float, float, float, float]] = None,
+                 max_match_distance: float = 0.25, lost_after: int = 30,
+                 inference_interval: int = 1, flow_error_threshold: float = 20.0,
+                 min_flow_ratio: float = 0.7, device: str = 'mps', imgsz: Optional[int] = None):
         """
         Initialize the player tracker with YOLOv11n pose model.
         Optimized for Apple Silicon M-series chips.
@@ -28,81 +33,221 @@ class PlayerTracker:
         Args:
             model_name: YOLOv11 pose model name (default: yolo11n-pose.pt)
             use_half: Use FP16 half-precision for faster inference (recommended for Apple Silicon)
+            max_players: Number of players to track
+            min_height_ratio: Minimum person box height as a fraction of frame height
+                              (drops distant spectators)
+            player_region: Optional (x0, y0, x1, y1) area, as fractions of the frame, that
+                           player box centers must lie in (excludes umpire / stands)
+            max_match_distance: Largest jump (fraction of frame diagonal) a tracked player
+                                can make between processed frames
+            lost_after: Processed frames without a match before a player ID is freed
+            inference_interval: Run the pose model every N frames and propagate keypoints
+                                with optical flow in between (1 = infer every frame)
+            flow_error_threshold: Maximum Lucas-Kanade error for a keypoint to count as tracked
+            min_flow_ratio: Share of keypoints that must be tracked (and both wrists) to keep
+                            propagating; otherwise the pose model runs early
+            device: Inference device ('mps' for Apple Silicon, 'cpu', 'cuda:0', ...)
+            imgsz: Model input size (None = the model's default; see imgsz_autotuner)
         """
+        # Shared with every other tracker/analyzer in this process that uses the same weights,
+        # device and precision
         print(f"Loading YOLOv11 pose model: {model_name}")
-        self.model = YOLO(model_name)
+        self.model = get_model(model_name, device=device, half=use_half)
         
         # Optimize for Apple Silicon
         self.use_half = use_half
+        self.device = device
+        self.imgsz = imgsz
         
-        # Track player positions across frames for ID consistency
-        self.player_history: Dict[int, List[Tuple[float, float]]] = {0: [], 1: []}
+        # Candidate filtering (umpires, spectators, people walking past)
+        self.max_players = max_players
+        self.min_height_ratio = min_height_ratio
+        self.player_region = player_region
+        
+        # Matching cost: normalized center distance + (1 - IoU) with the last box
+        self.max_match_distance = max_match_distance
+        self.iou_weight = 0.5
+        self.new_track_cost = 1.0  # Cost of starting a new track on a free player ID
+        self.lost_after = lost_after
+        
+        # Track player positions across frames for ID consistency (ring buffers per player)
         self.max_history = 10  # Reduced from 30 for better performance
+        self.player_history = np.zeros((max_players, self.max_history, 2))
+        self.history_length = np.zeros(max_players, dtype=int)
+        self.history_index = np.zeros(max_players, dtype=int)
+        self.last_boxes = np.zeros((max_players, 4))  # Last matched box (x1, y1, x2, y2)
+        self.frames_since_seen = np.zeros(max_players, dtype=int)
         
         # Minimum confidence threshold (lowered for faster processing)
         self.min_confidence = 0.4
+        
+        # Sparse inference: optical-flow propagation between pose model calls
+        self.inference_interval = inference_interval
+        self.flow_error_threshold = flow_error_threshold
+        self.min_flow_ratio = min_flow_ratio
+        self.flow_params = dict(
+            winSize=(21, 21),
+            maxLevel=3,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+        )
+        self.prev_gray: Optional[np.ndarray] = None
+        self.last_poses: List[PoseData] = []
+        self.last_frame_number: Optional[int] = None
+        self.frames_since_inference = 0
+        
+        # Statistics
+        self.inference_calls = 0
+        self.propagated_frames = 0
+        self.early_reinferences = 0
     
-    def _assign_player_id(self, bbox_centers: List[Tuple[float, float]]) -> List[int]:
+    def _select_candidates(self, boxes: np.ndarray, frame_shape: Tuple[int, ...]) -> np.ndarray:
         """
-        Assign consistent player IDs based on spatial proximity to previous frames.
+        Drop person detections that cannot be players before any keypoints are read.
         
         Args:
-            bbox_centers: List of (x, y) centers for detected players
+            boxes: (N, 4) person boxes (x1, y1, x2, y2)
+            frame_shape: Shape of the frame the boxes come from
             
         Returns:
-            List of player IDs (0 or 1) corresponding to each detection
+            Indices of the boxes that may be players
         """
-        if len(bbox_centers) == 0:
-            return []
+        height, width = frame_shape[:2]
         
-        # If no history, assign based on x-position (left player = 0, right player = 1)
-        if not self.player_history[0] and not self.player_history[1]:
-            if len(bbox_centers) == 1:
-                return [0]
-            else:
-                # Sort by x-coordinate
-                sorted_indices = sorted(range(len(bbox_centers)), key=lambda i: bbox_centers[i][0])
-                player_ids = [0] * len(bbox_centers)
-                player_ids[sorted_indices[0]] = 0
-                player_ids[sorted_indices[1]] = 1
-                return player_ids
-        
-        # Match with previous positions using Hungarian algorithm (simple nearest neighbor)
-        player_ids = []
-        used_ids = set()
-        
-        for center in bbox_centers:
-            min_dist = float('inf')
-            best_id = 0
-            
-            for player_id in [0, 1]:
-                if player_id in used_ids:
-                    continue
-                
-                if self.player_history[player_id]:
-                    # Calculate distance to last known position
-                    last_pos = self.player_history[player_id][-1]
-                    dist = np.sqrt((center[0] - last_pos[0])**2 + (center[1] - last_pos[1])**2)
-                    
-                    if dist < min_dist:
-                        min_dist = dist
-                        best_id = player_id
+        # Distant spectators are small
+        keep = (boxes[:, 3] - boxes[:, 1]) >= self.min_height_ratio * height
+        
+        if self.player_region is not None:
+            x0, y0, x1, y1 = self.player_region
+            cx = (boxes[:, 0] + boxes[:, 2]) / (2 * width)
+            cy = (boxes[:, 1] + boxes[:, 3]) / (2 * height)
+            keep &= (cx >= x0) & (cx <= x1) & (cy >= y0) & (cy <= y1)
+        
+        return np.flatnonzero(keep)
+    
+    @staticmethod
+    def _pairwise_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+        """IoU between every box in boxes_a (M, 4) and boxes_b (N, 4), shape (M, N)."""
+        x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+        y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+        x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+        y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+        intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        
+        area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+        area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+        union = area_a[:, None] + area_b[None, :] - intersection
+        
+        return intersection / np.maximum(union, 1e-6)
+    
+    def _assign_player_id(self, boxes: np.ndarray, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Assign consistent player IDs with an optimal (Hungarian) matching.
+        
+        Args:
+            boxes: (N, 4) candidate player boxes (x1, y1, x2, y2)
+            frame_shape: Shape of the frame the boxes come from
             
-            player_ids.append(best_id)
-            used_ids.add(best_id)
+        Returns:
+            (N,) array of player IDs, -1 for detections that are not matched to a player
+        """
+        player_ids = np.full(len(boxes), -1, dtype=int)
+        if len(boxes) == 0:
+            return player_ids
+        
+        height, width = frame_shape[:2]
+        diagonal = np.hypot(width, height)
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        tracked = self.history_length > 0
+        
+        # If no history, take the largest people and assign by x-position (left player = 0)
+        if not tracked.any():
+            largest = np.argsort(-areas)[:self.max_players]
+            left_to_right = largest[np.argsort(centers[largest, 0])]
+            player_ids[left_to_right] = np.arange(len(left_to_right))
+            return player_ids
+        
+        # Cost matrix (players x detections)
+        last_centers = self.player_history[np.arange(self.max_players), (self.history_index - 1) % self.max_history]
+        distance = np.linalg.norm(last_centers[:, None, :] - centers[None, :, :], axis=2) / diagonal
+        iou = self._pairwise_iou(self.last_boxes, boxes)
+        cost = distance + self.iou_weight * (1.0 - iou)
+        
+        # Free IDs accept any detection at a fixed cost, slightly preferring large boxes
+        size_penalty = 0.1 * (1.0 - areas / areas.max())
+        cost[~tracked] = self.new_track_cost + size_penalty[None, :]
+        
+        from scipy.optimize import linear_sum_assignment  # Imported on first use (slow to import)
+        rows, cols = linear_sum_assignment(cost)
+        for player_id, det_idx in zip(rows, cols):
+            # Reject jumps that are too large to be the same player
+            if tracked[player_id] and distance[player_id, det_idx] > self.max_match_distance:
+                continue
+            player_ids[det_idx] = player_id
         
         return player_ids
     
-    def _update_player_history(self, player_id: int, center: Tuple[float, float]):
+    def _update_player_history(self, player_id: int, box: np.ndarray):
         """Update player position history."""
-        self.player_history[player_id].append(center)
-        if len(self.player_history[player_id]) > self.max_history:
-            self.player_history[player_id].pop(0)
+        idx = self.history_index[player_id]
+        self.player_history[player_id, idx] = (box[:2] + box[2:]) / 2
+        self.history_index[player_id] = (idx + 1) % self.max_history
+        self.history_length[player_id] = min(self.history_length[player_id] + 1, self.max_history)
+        self.last_boxes[player_id] = box
+        self.frames_since_seen[player_id] = 0
+    
+    def get_player_history(self, player_id: int) -> np.ndarray:
+        """
+        Get a player's recent box centers.
+        
+        Args:
+            player_id: Player identifier
+            
+        Returns:
+            (K, 2) array of centers, oldest first
+        """
+        length = self.history_length[player_id]
+        order = (self.history_index[player_id] - length + np.arange(length)) % self.max_history
+        return self.player_history[player_id, order]
+    
+    def reset(self):
+        """Forget all player tracks."""
+        self.history_length[:] = 0
+        self.history_index[:] = 0
+        self.frames_since_seen[:] = 0
+        self.prev_gray = None
+        self.last_poses = []
+        self.frames_since_inference = 0
+    
+    def get_state(self) -> Dict:
+        """
+        Snapshot the tracking state (player IDs, history, optical-flow reference).
+        
+        Returns:
+            State to hand back to set_state, e.g. to process skipped frames before a later one
+        """
+        return {
+            'player_history': self.player_history.copy(),
+            'history_length': self.history_length.copy(),
+            'history_index': self.history_index.copy(),
+            'last_boxes': self.last_boxes.copy(),
+            'frames_since_seen': self.frames_since_seen.copy(),
+            'prev_gray': self.prev_gray,
+            'last_poses': self.last_poses,
+            'last_frame_number': self.last_frame_number,
+            'frames_since_inference': self.frames_since_inference
+        }
+    
+    def set_state(self, state: Dict):
+        """Restore a snapshot from get_state."""
+        for name, value in state.items():
+            setattr(self, name, value)
     
     def process_frame(self, frame: np.ndarray, frame_number: int, timestamp: float) -> List[PoseData]:
         """
         Process a single frame and extract pose data for both players.
-        Optimized for speed - only extracts wrists and elbows.
+        With inference_interval > 1, most frames are propagated with optical flow
+        instead of running the pose model (PoseData.source tells which).
         
         Args:
             frame: Input frame (BGR format)
@@ -112,17 +257,151 @@ class PlayerTracker:
         Returns:
             List of PoseData objects (one per detected player)
         """
+        if self.inference_interval <= 1:
+            self.inference_calls += 1
+            return self._infer_poses(frame, frame_number, timestamp)
+        
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        # Propagate only forward, between nearby calls within the inference interval
+        can_propagate = (
+            self.prev_gray is not None and
+            self.last_poses and
+            self.frames_since_inference + 1 < self.inference_interval and
+            0 < frame_number - self.last_frame_number <= self.inference_interval
+        )
+        
+        pose_data_list = None
+        if can_propagate:
+            pose_data_list = self._propagate_poses(gray, frame_number, timestamp)
+            if pose_data_list is None:
+                # Flow lost the players; run the model now instead of waiting
+                self.early_reinferences += 1
+        
+        if pose_data_list is not None:
+            self.propagated_frames += 1
+            self.frames_since_inference += 1
+        else:
+            self.inference_calls += 1
+            pose_data_list = self._infer_poses(frame, frame_number, timestamp)
+            self.frames_since_inference = 0
+        
+        self.prev_gray = gray
+        self.last_poses = pose_data_list
+        self.last_frame_number = frame_number
+        
+        return pose_data_list
+    
+    def _propagate_poses(self, gray: np.ndarray, frame_number: int,
+                         timestamp: float) -> Optional[List[PoseData]]:
+        """
+        Move the last poses' keypoints to the current frame with pyramidal Lucas-Kanade flow.
+        
+        Args:
+            gray: Current frame in grayscale
+            frame_number: Current frame number
+            timestamp: Timestamp in seconds from video start
+            
+        Returns:
+            Propagated PoseData list, or None if flow is too unreliable
+        """
+        keypoint_names = PoseData.get_coco_keypoint_names()
+        
+        # Gather every visible keypoint of every player into one flow call
+        points = []
+        owners = []
+        for pose_idx, pose_data in enumerate(self.last_poses):
+            keypoints = getattr(pose_data, 'all_keypoints', {})
+            for name in keypoint_names:
+                kp = keypoints.get(name)
+                if kp is not None and kp.confidence > 0.3:
+                    points.append((kp.x, kp.y))
+                    owners.append((pose_idx, name))
+        
+        if not points:
+            return None
+        
+        prev_points = np.array(points, dtype=np.float32).reshape(-1, 1, 2)
+        next_points, status, error = cv2.calcOpticalFlowPyrLK(
+            self.prev_gray, gray, prev_points, None, **self.flow_params
+        )
+        
+        tracked = (status.ravel() == 1) & (error.ravel() < self.flow_error_threshold)
+        if tracked.mean() < self.min_flow_ratio:
+            return None
+        
+        # Wrists drive shot detection, so losing one forces a re-inference
+        for (pose_idx, name), ok in zip(owners, tracked):
+            if "wrist" in name and not ok:
+                return None
+        
+        next_points = next_points.reshape(-1, 2)
+        moved: Dict[int, Dict[str, Tuple[float, float]]] = {}
+        for (pose_idx, name), point, ok in zip(owners, next_points, tracked):
+            if ok:
+                moved.setdefault(pose_idx, {})[name] = (float(point[0]), float(point[1]))
+        
+        pose_data_list = []
+        for pose_idx, last_pose in enumerate(self.last_poses):
+            all_keypoints = {}
+            for name, kp in getattr(last_pose, 'all_keypoints', {}).items():
+                x, y = moved.get(pose_idx, {}).get(name, (kp.x, kp.y))
+                all_keypoints[name] = Keypoint(x=x, y=y, confidence=kp.confidence, name=name)
+            
+            pose_data = PoseData(
+                frame_number=frame_number,
+                timestamp=timestamp,
+                player_id=last_pose.player_id,
+                left_wrist=all_keypoints.get("left_wrist"),
+                left_elbow=all_keypoints.get("left_elbow"),
+                right_wrist=all_keypoints.get("right_wrist"),
+                right_elbow=all_keypoints.get("right_elbow"),
+                source="propagated"
+            )
+            pose_data.all_keypoints = all_keypoints
+            pose_data.compute_arm_angles()
+            
+            # Keep the player's box in step with the keypoints for the next matching
+            if pose_idx in moved:
+                shift = np.mean([np.subtract(moved[pose_idx][name], (last_pose.all_keypoints[name].x,
+                                                                     last_pose.all_keypoints[name].y))
+                                 for name in moved[pose_idx]], axis=0)
+                self._update_player_history(last_pose.player_id,
+                                            self.last_boxes[last_pose.player_id] + np.tile(shift, 2))
+            
+            pose_data_list.append(pose_data)
+        
+        return pose_data_list
+    
+    def get_inference_statistics(self) -> Dict:
+        """Get counts of pose model calls and optical-flow propagated frames."""
+        total = self.inference_calls + self.propagated_frames
+        return {
+            'pose_inference_calls': self.inference_calls,
+            'propagated_frames': self.propagated_frames,
+            'early_reinferences': self.early_reinferences,
+            'inference_ratio': self.inference_calls / total if total > 0 else 0.0
+        }
+    
+    def _infer_poses(self, frame: np.ndarray, frame_number: int, timestamp: float) -> List[PoseData]:
+        """Run the pose model on a frame and build PoseData for the matched players."""
         # Run YOLOv11 pose estimation with optimizations
+        inference_args = {'imgsz': self.imgsz} if self.imgsz else {}
         results = self.model(
             frame, 
             conf=self.min_confidence, 
             verbose=False,
             half=self.use_half,  # Use FP16 for faster inference
-            device='mps'  # Use Apple Metal Performance Shaders
+            device=self.device,  # Apple Metal Performance Shaders by default
+            **inference_args
         )
         
         pose_data_list = []
         
+        # Free the IDs of players that have been gone too long
+        self.frames_since_seen += 1
+        self.history_length[self.frames_since_seen > self.lost_after] = 0
+        
         if len(results) == 0 or results[0].keypoints is None:
             return pose_data_list
         
@@ -132,25 +411,20 @@ class PlayerTracker:
         if result.boxes is None or len(result.boxes) == 0:
             return pose_data_list
         
-        # Extract bounding box centers for player ID assignment
-        bbox_centers = []
-        for box in result.boxes:
-            x, y, w, h = box.xywh[0].tolist()
-            bbox_centers.append((x, y))
+        # Filter non-players on boxes alone, then match the rest to player IDs
+        boxes = result.boxes.xyxy.cpu().numpy()
+        candidates = self._select_candidates(boxes, frame.shape)
+        player_ids = self._assign_player_id(boxes[candidates], frame.shape)
         
-        # Assign player IDs
-        player_ids = self._assign_player_id(bbox_centers)
+        keypoint_names = PoseData.get_coco_keypoint_names()
         
-        # Create PoseData for each detected player
-        for idx, keypoints in enumerate(result.keypoints):
-            if idx >= len(player_ids):
-                break
-            
-            player_id = player_ids[idx]
+        # Create PoseData for each matched player
+        for det_idx, player_id in zip(candidates, player_ids):
+            if player_id < 0:
+                continue
             
             # Extract ALL keypoints for full body pose tracking
-            keypoints_array = keypoints.data[0]  # Shape: [17, 3]
-            keypoint_names = PoseData.get_coco_keypoint_names()
+            keypoints_array = result.keypoints.data[det_idx].cpu().numpy()  # Shape: [17, 3]
             
             # Store all keypoints
             all_keypoints = {}
@@ -163,7 +437,7 @@ class PlayerTracker:
             pose_data = PoseData(
                 frame_number=frame_number,
                 timestamp=timestamp,
-                player_id=player_id,
+                player_id=int(player_id),
                 left_wrist=all_keypoints.get("left_wrist"),
                 left_elbow=all_keypoints.get("left_elbow"),
                 right_wrist=all_keypoints.get("right_wrist"),
@@ -177,12 +451,12 @@ class PlayerTracker:
             pose_data.compute_arm_angles()
             
             # Update player history
-            center_x = bbox_centers[idx][0]
-            center_y = bbox_centers[idx][1]
-            self._update_player_history(player_id, (center_x, center_y))
+            self._update_player_history(player_id, boxes[det_idx])
             
             pose_data_list.append(pose_data)
         
+        pose_data_list.sort(key=lambda p: p.player_id)
+        
         return pose_data_list
     
     def visualize_pose(self, frame: np.ndarray, pose_data: PoseData) -> np.ndarray:
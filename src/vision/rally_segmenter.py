@@ -0,0 +1,300 @@
+"""
+Rally segmentation for table tennis videos.
+A lightweight first pass (low frame rate, downscaled frames) finds the intervals
+where the ball is in play or the players are swinging, so full-rate pose
+inference, shot detection and biomechanics only run inside rallies.
+"""
+from typing import List, Optional, Dict, Tuple
+from dataclasses import dataclass
+from bisect import bisect_right
+import math
+import cv2
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from vision.ball_tracker_hsv import BallTrackerHSV
+
+
+@dataclass
+class Rally:
+    """A stretch of active play between two dead-time periods."""
+    rally_id: int
+    start_frame: int  # 0-based video frame index (inclusive)
+    end_frame: int  # 0-based video frame index (inclusive)
+    start_time: float
+    end_time: float
+    
+    # Scan-pass evidence
+    ball_ratio: float = 0.0  # Share of scanned samples with a moving ball
+    peak_wrist_speed: float = 0.0  # px/s
+    
+    @property
+    def duration(self) -> float:
+        """Rally length in seconds."""
+        return self.end_time - self.start_time
+    
+    def contains(self, frame_number: int) -> bool:
+        """Whether a 0-based frame index lies inside the rally."""
+        return self.start_frame <= frame_number <= self.end_frame
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for JSON."""
+        return {
+            "rally": self.rally_id,
+            "frames": {
+                "start": self.start_frame,
+                "end": self.end_frame
+            },
+            "time": {
+                "start": round(self.start_time, 3),
+                "end": round(self.end_time, 3),
+                "duration": round(self.duration, 3)
+            },
+            "ball_ratio": round(self.ball_ratio, 3),
+            "peak_wrist_speed": round(self.peak_wrist_speed, 1)
+        }
+
+
+def rally_starts(rallies: List[Rally]) -> List[int]:
+    """Start frames of rallies sorted by start frame, the search keys of find_rally."""
+    return [rally.start_frame for rally in rallies]
+
+
+def find_rally(rallies: List[Rally], frame_number: int, starts: Optional[List[int]] = None) -> Optional[Rally]:
+    """
+    Find the rally containing a frame.
+    
+    Args:
+        rallies: Rallies sorted by start frame (as returned by RallySegmenter)
+        frame_number: 0-based video frame index
+        starts: rally_starts(rallies), built once by callers that look up every frame
+                (rebuilt on each call if None)
+    
+    Returns:
+        The containing Rally, or None if the frame is dead time
+    """
+    if starts is None:
+        starts = rally_starts(rallies)
+    idx = bisect_right(starts, frame_number) - 1
+    if idx >= 0 and rallies[idx].contains(frame_number):
+        return rallies[idx]
+    return None
+
+
+class RallySegmenter:
+    """
+    Finds rally intervals from ball presence and wrist activity.
+    Samples the video at a low rate, marks samples where the ball moves or a
+    wrist moves fast, then joins active samples separated by short gaps.
+    """
+    
+    def __init__(self,
+                 pose_model=None,
+                 scan_fps: float = 10.0,
+                 scan_width: int = 640,
+                 pose_imgsz: int = 320,
+                 wrist_speed_threshold: float = 400.0,
+                 ball_min_motion: float = 4.0,
+                 max_gap: float = 2.0,
+                 min_duration: float = 1.5,
+                 padding: float = 0.5):
+        """
+        Initialize the rally segmenter.
+        
+        Args:
+            pose_model: Optional YOLO pose model for wrist activity (ball-only if None)
+            scan_fps: Sampling rate of the scan pass
+            scan_width: Width (pixels) frames are shrunk to for pose inference in the scan pass
+            pose_imgsz: Inference size for the scan-pass pose model
+            wrist_speed_threshold: Wrist speed (full-resolution px/s) that counts as a swing
+            ball_min_motion: Ball displacement (px) between samples to count as in play;
+                             filters static orange objects in the scene
+            max_gap: Longest inactive stretch (seconds) that still belongs to one rally
+            min_duration: Shortest rally (seconds) to keep
+            padding: Time (seconds) added before and after each rally
+        """
+        self.pose_model = pose_model
+        self.scan_fps = scan_fps
+        self.scan_width = scan_width
+        self.pose_imgsz = pose_imgsz
+        self.wrist_speed_threshold = wrist_speed_threshold
+        self.ball_min_motion = ball_min_motion
+        self.max_gap = max_gap
+        self.min_duration = min_duration
+        self.padding = padding
+        
+        self.ball_detector = BallTrackerHSV(fast_mode=True)
+    
+    def scan_video(self, video_path: str) -> List[Rally]:
+        """
+        Run the lightweight scan pass over a video and segment it into rallies.
+        
+        Args:
+            video_path: Path to the video file
+        
+        Returns:
+            Rallies sorted by start frame (empty if no activity was found)
+        """
+        cap = cv2.VideoCapture(str(video_path))
+        if not cap.isOpened():
+            print(f"Error: Could not open video file at {video_path}")
+            return []
+        
+        video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(1, int(round(video_fps / self.scan_fps)))
+        
+        print(f"\n🔎 Scanning for rallies (every {step} frames)...")
+        
+        timestamps = []
+        ball_active = []
+        wrist_speeds = []
+        
+        prev_ball: Optional[Tuple[float, float]] = None
+        prev_wrists: Optional[np.ndarray] = None
+        prev_time = 0.0
+        frame_idx = 0
+        
+        while True:
+            # Sampled frames are decoded; the rest are only grabbed
+            if frame_idx % step != 0:
+                if not cap.grab():
+                    break
+                frame_idx += 1
+                continue
+            
+            ret, frame = cap.read()
+            if not ret:
+                break
+            
+            timestamp = frame_idx / video_fps
+            dt = timestamp - prev_time
+            
+            # Ball presence: a candidate that moved since the previous sample
+            candidate = self.ball_detector.detect(frame, timestamp)
+            ball_pos = (candidate[0], candidate[1]) if candidate is not None else None
+            moving = (ball_pos is not None and prev_ball is not None and
+                      math.hypot(ball_pos[0] - prev_ball[0], ball_pos[1] - prev_ball[1]) >= self.ball_min_motion)
+            prev_ball = ball_pos
+            
+            # Wrist activity from a small, low-rate pose pass
+            wrist_speed = 0.0
+            if self.pose_model is not None:
+                wrists = self._detect_wrists(frame)
+                if wrists is not None and prev_wrists is not None and dt > 0:
+                    wrist_speed = self._max_wrist_displacement(prev_wrists, wrists) / dt
+                prev_wrists = wrists
+            
+            timestamps.append(timestamp)
+            ball_active.append(moving)
+            wrist_speeds.append(wrist_speed)
+            
+            prev_time = timestamp
+            frame_idx += 1
+        
+        cap.release()
+        
+        rallies = self.segment(timestamps, ball_active, wrist_speeds, video_fps, total_frames or frame_idx)
+        
+        rally_time = sum(rally.duration for rally in rallies)
+        duration = frame_idx / video_fps if video_fps > 0 else 0
+        print(f"   Found {len(rallies)} rallies covering {rally_time:.1f}s of {duration:.1f}s")
+        
+        return rallies
+    
+    def segment(self, timestamps: List[float], ball_active: List[bool], wrist_speeds: List[float],
+                fps: float, total_frames: int) -> List[Rally]:
+        """
+        Segment scan-pass samples into rallies.
+        
+        Args:
+            timestamps: Sample times in seconds
+            ball_active: Whether a moving ball was seen at each sample
+            wrist_speeds: Fastest wrist speed (px/s) at each sample
+            fps: Video frame rate used to convert times to frame indices
+            total_frames: Number of frames in the video
+        
+        Returns:
+            Rallies sorted by start frame
+        """
+        if not timestamps:
+            return []
+        
+        times = np.asarray(timestamps, dtype=float)
+        ball = np.asarray(ball_active, dtype=bool)
+        wrist = np.asarray(wrist_speeds, dtype=float)
+        active = ball | (wrist >= self.wrist_speed_threshold)
+        
+        active_idx = np.flatnonzero(active)
+        if len(active_idx) == 0:
+            return []
+        
+        # Split active samples wherever the inactive gap is too long
+        breaks = np.flatnonzero(np.diff(times[active_idx]) > self.max_gap)
+        groups = np.split(active_idx, breaks + 1)
+        
+        video_end = (total_frames - 1) / fps
+        intervals = []
+        for group in groups:
+            first, last = group[0], group[-1]
+            if times[last] - times[first] < self.min_duration:
+                continue
+            start = max(0.0, times[first] - self.padding)
+            end = min(video_end, times[last] + self.padding)
+            
+            # Padding can make neighbours overlap; merge them
+            if intervals and start <= intervals[-1][1]:
+                intervals[-1][1] = end
+                intervals[-1][2] = np.concatenate([intervals[-1][2], group])
+            else:
+                intervals.append([start, end, group])
+        
+        rallies = []
+        for start, end, group in intervals:
+            start_frame = int(math.floor(start * fps))
+            end_frame = min(total_frames - 1, int(math.ceil(end * fps)))
+            rallies.append(Rally(
+                rally_id=len(rallies),
+                start_frame=start_frame,
+                end_frame=end_frame,
+                start_time=start_frame / fps,
+                end_time=end_frame / fps,
+                ball_ratio=float(ball[group[0]:group[-1] + 1].mean()),
+                peak_wrist_speed=float(wrist[group[0]:group[-1] + 1].max())
+            ))
+        
+        return rallies
+    
+    def _detect_wrists(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Run the pose model on a downscaled frame and return wrist positions.
+        
+        Returns:
+            (N, 2) array of visible wrists in full-resolution pixels, or None
+        """
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.scan_width / width)
+        small = cv2.resize(frame, (int(width * scale), int(height * scale)),
+                           interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+        
+        results = self.pose_model.predict(source=small, imgsz=self.pose_imgsz, conf=0.4,
+                                          classes=0, verbose=False)
+        if len(results) == 0 or results[0].keypoints is None or len(results[0].keypoints.xy) == 0:
+            return None
+        
+        # COCO indices 9 and 10 are the left and right wrists
+        keypoints = results[0].keypoints.xy.cpu().numpy()
+        wrists = keypoints[:, [9, 10], :].reshape(-1, 2)
+        wrists = wrists[(wrists[:, 0] > 0) & (wrists[:, 1] > 0)]
+        if len(wrists) == 0:
+            return None
+        
+        return wrists / scale
+    
+    @staticmethod
+    def _max_wrist_displacement(previous: np.ndarray, current: np.ndarray) -> float:
+        """Largest distance from a current wrist to its nearest previous wrist."""
+        distances = np.linalg.norm(current[:, None, :] - previous[None, :, :], axis=2)
+        return float(distances.min(axis=1).max())
@@ -39,10 +39,14 @@ class Shot:
     horizontal_movement: float = 0.0  # Positive = forward
     swing_arc: float = 0.0  # Total path length
     
+    # Rally the shot belongs to (None when rallies were not segmented)
+    rally_id: Optional[int] = None
+    
     def to_dict(self) -> Dict:
         """Convert to dictionary for JSON."""
         return {
             "player": self.player_id,
+            "rally": self.rally_id,
             "frames": {
                 "start": self.start_frame,
                 "peak": self.peak_frame,
@@ -85,7 +89,8 @@ class ShotDetector:
                  velocity_threshold: float = 15.0,  # px/frame minimum velocity
                  min_shot_duration: int = 5,  # Minimum frames for a shot
                  max_shot_duration: int = 30,  # Maximum frames for a shot
-                 cooldown_frames: int = 10):  # Frames between shots
+                 cooldown_frames: int = 10,  # Frames between shots
+                 frame_interval: Optional[int] = None):  # Video frames per full-rate sample
         """
         Initialize shot detector.
         
@@ -94,11 +99,15 @@ class ShotDetector:
             min_shot_duration: Minimum frames for valid shot
             max_shot_duration: Maximum frames for valid shot
             cooldown_frames: Minimum frames between consecutive shots
+            frame_interval: Video frames between samples at full rate. Velocities, durations and
+                            cooldowns are measured in these units, so unevenly sampled sequences
+                            (adaptive frame rate) work. None = smallest gap in the sequence
         """
         self.velocity_threshold = velocity_threshold
         self.min_shot_duration = min_shot_duration
         self.max_shot_duration = max_shot_duration
         self.cooldown_frames = cooldown_frames
+        self.frame_interval = frame_interval
     
     def detect_shots(self, pose_data_list: List) -> List[Shot]:
         """
@@ -149,12 +158,20 @@ class ShotDetector:
         if len(wrist_data) < self.min_shot_duration:
             return []
         
-        # Calculate velocities
+        # Sample positions in full-rate steps (uneven when the frame rate was adaptive)
+        frame_interval = self.frame_interval
+        if frame_interval is None:
+            gaps = [b['frame'] - a['frame'] for a, b in zip(wrist_data, wrist_data[1:]) if b['frame'] > a['frame']]
+            frame_interval = min(gaps) if gaps else 1
+        steps = [(w['frame'] - wrist_data[0]['frame']) / frame_interval for w in wrist_data]
+        
+        # Calculate velocities (px per full-rate step)
         velocities = []
         for i in range(1, len(wrist_data)):
             dx = wrist_data[i]['pos'][0] - wrist_data[i-1]['pos'][0]
             dy = wrist_data[i]['pos'][1] - wrist_data[i-1]['pos'][1]
-            velocity = math.sqrt(dx*dx + dy*dy)
+            step_gap = max(steps[i] - steps[i-1], 1e-6)
+            velocity = math.sqrt(dx*dx + dy*dy) / step_gap
             velocities.append({
                 'idx': i,
                 'velocity': velocity,
@@ -173,14 +190,14 @@ class ShotDetector:
             
             # Start of shot: velocity exceeds threshold
             if not in_shot and vel_data['velocity'] > self.velocity_threshold:
-                if idx - last_shot_end >= self.cooldown_frames:
+                if steps[idx] - last_shot_end >= self.cooldown_frames:
                     in_shot = True
                     shot_start_idx = max(0, idx - 2)  # Include a bit of backswing
             
             # End of shot: velocity drops below threshold
             elif in_shot and vel_data['velocity'] < self.velocity_threshold * 0.5:
                 shot_end_idx = min(idx + 2, len(wrist_data) - 1)  # Include followthrough
-                shot_duration = shot_end_idx - shot_start_idx
+                shot_duration = steps[shot_end_idx] - steps[shot_start_idx]
                 
                 if self.min_shot_duration <= shot_duration <= self.max_shot_duration:
                     # Create shot object
@@ -192,7 +209,7 @@ class ShotDetector:
                     )
                     if shot:
                         shots.append(shot)
-                        last_shot_end = shot_end_idx
+                        last_shot_end = steps[shot_end_idx]
                 
                 in_shot = False
         
@@ -0,0 +1,245 @@
+"""
+Thumbnail sprites and seek index for processed videos.
+Samples one downscaled frame every few seconds into JPEG sprite sheets and
+writes a small JSON seek index, so a timeline hover preview is a lookup into an
+image the browser already has instead of decoding the video.
+"""
+from typing import List, Dict, Optional
+from bisect import bisect_right
+from datetime import datetime
+import hashlib
+import json
+import shutil
+import subprocess
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from vision.clip_exporter import probe_video, probe_keyframes
+
+
+def thumbnails_dir(video_path: str) -> Path:
+    """Directory holding the sprites and seek index of a video ({video}_thumbs next to it)."""
+    path = Path(video_path)
+    return path.parent / f"{path.stem}_thumbs"
+
+
+def lookup(index: Dict, timestamp: float) -> Dict:
+    """
+    Resolve a time to its thumbnail tile and the keyframe to start decoding from.
+    The frontend does the same arithmetic on the seek index.
+    
+    Args:
+        index: Seek index (see SpriteGenerator.generate)
+        timestamp: Time in seconds
+    
+    Returns:
+        Sprite file, tile rectangle and the nearest keyframe at or before the time
+    """
+    count = index["thumbnail_count"]
+    tile = min(max(int(timestamp / index["interval"]), 0), count - 1) if count > 0 else 0
+    per_sprite = index["columns"] * index["rows"]
+    position = tile % per_sprite
+    result = {
+        "time": timestamp,
+        "thumbnail_time": round(tile * index["interval"], 3),
+        "sprite": index["sprites"][tile // per_sprite] if count > 0 else None,
+        "x": (position % index["columns"]) * index["tile_width"],
+        "y": (position // index["columns"]) * index["tile_height"],
+        "width": index["tile_width"],
+        "height": index["tile_height"],
+        "keyframe_time": None,
+        "byte_offset": None
+    }
+    
+    times = index["keyframes"]["times"]
+    k = bisect_right(times, timestamp) - 1
+    if times:
+        k = max(k, 0)
+        result["keyframe_time"] = times[k]
+        result["byte_offset"] = index["keyframes"]["offsets"][k]
+    return result
+
+
+class SpriteGenerator:
+    """
+    Writes thumbnail sprite sheets and a seek index for a video.
+    
+    Thumbnail i shows the frame at i * interval seconds and sits at row-major
+    position i % (columns * rows) of sprite i // (columns * rows). The seek index
+    also lists every keyframe with its byte offset in the file (needs ffprobe),
+    so a player can request the right byte range when the user seeks.
+    """
+    
+    def __init__(self,
+                 interval: float = 2.0,
+                 thumb_width: int = 160,
+                 columns: int = 5,
+                 rows: int = 5,
+                 jpeg_quality: int = 70,
+                 ffprobe_path: str = "ffprobe"):
+        """
+        Initialize the generator.
+        
+        Args:
+            interval: Seconds between thumbnails
+            thumb_width: Thumbnail width in pixels (height keeps the aspect ratio)
+            columns: Thumbnails per sprite row
+            rows: Thumbnail rows per sprite
+            jpeg_quality: JPEG quality of the sprite sheets
+            ffprobe_path: ffprobe executable (keyframe offsets are left out without it)
+        """
+        self.interval = interval
+        self.thumb_width = thumb_width
+        self.columns = columns
+        self.rows = rows
+        self.jpeg_quality = jpeg_quality
+        self.ffprobe_path = ffprobe_path
+    
+    def generate(self, video_path: str, output_dir: Optional[str] = None) -> Dict:
+        """
+        Write the sprites and seek_index.json for a video.
+        
+        Args:
+            video_path: Video the frontend plays
+            output_dir: Directory for the sprites and index (default: {video}_thumbs)
+        
+        Returns:
+            The seek index
+        """
+        video_path = Path(video_path)
+        output_dir = Path(output_dir) if output_dir else thumbnails_dir(str(video_path))
+        start_time = time.time()
+        
+        cap = cv2.VideoCapture(str(video_path))
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        tile_width = self.thumb_width
+        tile_height = max(2, int(round(height * tile_width / width / 2)) * 2) if width > 0 else tile_width
+        
+        # Sprite names carry a version of the video, so they can be cached forever:
+        # reprocessing the video produces new names instead of stale hits
+        stat = video_path.stat()
+        version = hashlib.sha1(f"{video_path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:10]
+        
+        if output_dir.exists():
+            shutil.rmtree(output_dir)
+        output_dir.mkdir(parents=True)
+        
+        print(f"\n🖼️  Writing thumbnail sprites ({self.interval:g}s interval, {tile_width}x{tile_height} tiles)...")
+        
+        per_sprite = self.columns * self.rows
+        sprites: List[str] = []
+        sheet = None
+        count = 0
+        frame_index = 0
+        next_frame = 0
+        
+        while True:
+            # grab() skips the color conversion of frames between thumbnails
+            if not cap.grab():
+                break
+            if frame_index == next_frame:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                position = count % per_sprite
+                if position == 0:
+                    sheet = np.zeros((self.rows * tile_height, self.columns * tile_width, 3), dtype=np.uint8)
+                x = (position % self.columns) * tile_width
+                y = (position // self.columns) * tile_height
+                sheet[y:y + tile_height, x:x + tile_width] = cv2.resize(frame, (tile_width, tile_height),
+                                                                        interpolation=cv2.INTER_AREA)
+                count += 1
+                if count % per_sprite == 0:
+                    sprites.append(self._write_sprite(sheet, output_dir, version, len(sprites)))
+                    sheet = None
+                next_frame = int(round(count * self.interval * fps))
+            frame_index += 1
+        cap.release()
+        
+        if sheet is not None:
+            # Crop the unused rows of the last sprite
+            used_rows = (count % per_sprite + self.columns - 1) // self.columns
+            sprites.append(self._write_sprite(sheet[:used_rows * tile_height], output_dir, version, len(sprites)))
+        
+        keyframes = self._keyframes(video_path)
+        index = {
+            "video": video_path.name,
+            "version": version,
+            "created": datetime.now().isoformat(),
+            "duration": round((total_frames or frame_index) / fps, 3),
+            "fps": fps,
+            "width": width,
+            "height": height,
+            "interval": self.interval,
+            "thumbnail_count": count,
+            "tile_width": tile_width,
+            "tile_height": tile_height,
+            "columns": self.columns,
+            "rows": self.rows,
+            "sprites": sprites,
+            "keyframes": {
+                "times": [round(t, 3) for t, _ in keyframes],
+                "offsets": [offset for _, offset in keyframes]
+            }
+        }
+        
+        index_path = output_dir / "seek_index.json"
+        with open(index_path, 'w') as f:
+            json.dump(index, f, separators=(",", ":"))
+        
+        sprite_kb = sum((output_dir / name).stat().st_size for name in sprites) / 1024
+        print(f"   {count} thumbnails in {len(sprites)} sprites ({sprite_kb:.0f} KB) in {time.time() - start_time:.1f}s")
+        print(f"   Seek index: {index_path} ({index_path.stat().st_size / 1024:.1f} KB, {len(keyframes)} keyframes)")
+        return index
+    
+    def _write_sprite(self, sheet: np.ndarray, output_dir: Path, version: str, number: int) -> str:
+        """Encode one sprite sheet; returns its file name."""
+        name = f"sprite_{version}_{number:03d}.jpg"
+        cv2.imwrite(str(output_dir / name), sheet, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return name
+    
+    def _keyframes(self, video_path: Path) -> List:
+        """Keyframe (time, byte offset) pairs, relative to the start of the video."""
+        if shutil.which(self.ffprobe_path) is None:
+            print("   ⚠️  ffprobe not found, seek index without keyframe offsets")
+            return []
+        try:
+            start = probe_video(str(video_path), self.ffprobe_path)["start_time"]
+            keyframes = probe_keyframes(str(video_path), self.ffprobe_path)
+        except (subprocess.CalledProcessError, KeyError, IndexError, ValueError) as e:
+            print(f"   ⚠️  Could not read keyframes: {e}")
+            return []
+        # Player time starts at 0, container timestamps may not
+        return [(t - start, offset) for t, offset in keyframes]
+
+
+def main():
+    """Write thumbnail sprites and a seek index for a video."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Write thumbnail sprites and a seek index for a video")
+    parser.add_argument("video_path", type=str, help="Video the frontend plays")
+    parser.add_argument("--output-dir", type=str, default=None, help="Output directory (default: <video>_thumbs)")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between thumbnails")
+    parser.add_argument("--thumb-width", type=int, default=160, help="Thumbnail width in pixels")
+    parser.add_argument("--columns", type=int, default=5, help="Thumbnails per sprite row")
+    parser.add_argument("--rows", type=int, default=5, help="Thumbnail rows per sprite")
+    
+    args = parser.parse_args()
+    
+    generator = SpriteGenerator(interval=args.interval, thumb_width=args.thumb_width,
+                                columns=args.columns, rows=args.rows)
+    generator.generate(args.video_path, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+Lightweight per-stage timing for the processing pipelines.
+StageTimer records spans around pipeline stages (decode, inference, drawing,
+encoding, ...) into fixed-bucket latency histograms. Histograms give
+p50/p95/p99 per stage, merge across jobs, are saved as JSON per job and are
+exported in the Prometheus text format for the server's /api/metrics endpoint.
+Only the most recent job files are kept per pipeline; older ones are merged into
+one rolling file, so disk use and scrape cost stay bounded.
+"""
+from typing import Dict, List, Optional
+from datetime import datetime
+import bisect
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+
+# Jobs run as separate processes, so they leave their histograms here for the server
+DEFAULT_METRICS_DIR = Path("output/metrics")
+
+# Job files kept per pipeline before they are merged into the pipeline's rollup file
+KEEP_JOB_FILES = 20
+
+# A compaction lock older than this was left by a crashed job
+STALE_LOCK_SECONDS = 300
+
+# Bucket upper bounds in seconds: 10 per decade from 10 µs to 100 s (~26% wide)
+BUCKET_BOUNDS: List[float] = [10 ** (exponent / 10) for exponent in range(-50, 21)]
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with fixed log-spaced buckets.
+    Constant memory per stage, mergeable across jobs, and percentiles accurate
+    to within one bucket (interpolated inside it).
+    """
+    
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)  # Last bucket: above the largest bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    def observe(self, seconds: float):
+        """Add one duration."""
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    def merge(self, other: 'LatencyHistogram'):
+        """Add another histogram's observations to this one."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+    
+    def percentile(self, q: float) -> float:
+        """
+        Estimate a percentile.
+        
+        Args:
+            q: Quantile in [0, 1] (0.95 = p95)
+        
+        Returns:
+            Duration in seconds (0.0 if empty)
+        """
+        if self.count == 0:
+            return 0.0
+        
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count == 0 or cumulative + bucket_count < rank:
+                cumulative += bucket_count
+                continue
+            
+            lower = BUCKET_BOUNDS[index - 1] if index > 0 else 0.0
+            upper = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+            upper = min(upper, self.max)
+            fraction = (rank - cumulative) / bucket_count
+            if lower <= 0 or upper <= lower:
+                return lower + (upper - lower) * fraction
+            # Buckets are log-spaced, so interpolate geometrically
+            return lower * math.exp(math.log(upper / lower) * fraction)
+        return self.max
+    
+    def to_dict(self) -> Dict:
+        """Convert to a JSON-serializable dict."""
+        return {'counts': self.counts, 'count': self.count, 'sum': self.sum, 'max': self.max}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        """Create from a to_dict() result."""
+        histogram = cls()
+        if len(data['counts']) == len(histogram.counts):
+            histogram.counts = list(data['counts'])
+        histogram.count = data['count']
+        histogram.sum = data['sum']
+        histogram.max = data['max']
+        return histogram
+
+
+class _Span:
+    """Context manager that times one stage execution."""
+    
+    __slots__ = ('timer', 'stage', 'start')
+    
+    def __init__(self, timer: 'StageTimer', stage: str):
+        self.timer = timer
+        self.stage = stage
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timer.record(self.stage, time.perf_counter() - self.start)
+
+
+class _NullSpan:
+    """Span used when timing is disabled: does nothing."""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class StageTimer:
+    """
+    Per-job stage timer.
+    
+    Usage:
+        timer = StageTimer("video_processor")
+        with timer.span("decode"):
+            ret, frame = source.read()
+    
+    Spans must be recorded from a single thread.
+    """
+    
+    def __init__(self, pipeline: str, enabled: bool = True, metrics_dir: Optional[str] = None):
+        """
+        Initialize the timer.
+        
+        Args:
+            pipeline: Pipeline name the job's metrics are reported under
+                      (e.g. "video_processor", "ball_tracking", "game_analysis")
+            enabled: Record spans; when False, span() returns a shared no-op context
+            metrics_dir: Directory save() writes to (default: output/metrics)
+        """
+        self.pipeline = pipeline
+        self.enabled = enabled
+        self.metrics_dir = Path(metrics_dir) if metrics_dir is not None else DEFAULT_METRICS_DIR
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.started = datetime.now()
+    
+    def span(self, stage: str):
+        """
+        Time a block of code as one execution of a stage.
+        
+        Args:
+            stage: Stage name
+        
+        Returns:
+            Context manager
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+    
+    def record(self, stage: str, seconds: float):
+        """
+        Record a duration measured elsewhere.
+        
+        Args:
+            stage: Stage name
+            seconds: Duration in seconds
+        """
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.observe(seconds)
+    
+    def get_statistics(self) -> Dict[str, Dict]:
+        """
+        Get per-stage count, total and latency percentiles.
+        
+        Returns:
+            Dict of stage name -> statistics (times in milliseconds)
+        """
+        stats = {}
+        for stage, histogram in self.histograms.items():
+            stats[stage] = {
+                'count': histogram.count,
+                'total_s': round(histogram.sum, 4),
+                'mean_ms': round(1000 * histogram.sum / histogram.count, 3) if histogram.count > 0 else 0.0,
+                'p50_ms': round(1000 * histogram.percentile(0.50), 3),
+                'p95_ms': round(1000 * histogram.percentile(0.95), 3),
+                'p99_ms': round(1000 * histogram.percentile(0.99), 3),
+                'max_ms': round(1000 * histogram.max, 3)
+            }
+        return stats
+    
+    def print_summary(self):
+        """Print the per-stage timing table."""
+        if not self.histograms:
+            return
+        print(f"\n⏱️  Stage timings ({self.pipeline}):")
+        print(f"   {'Stage':<16} {'Count':>7} {'Total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage, stage_stats in self.get_statistics().items():
+            print(f"   {stage:<16} {stage_stats['count']:>7} {stage_stats['total_s']:>9.2f} "
+                  f"{stage_stats['p50_ms']:>9.2f} {stage_stats['p95_ms']:>9.2f} {stage_stats['p99_ms']:>9.2f}")
+    
+    def save(self, keep_jobs: int = KEEP_JOB_FILES) -> Optional[Path]:
+        """
+        Save the job's histograms to metrics_dir for the metrics endpoint.
+        
+        Args:
+            keep_jobs: Job files kept for this pipeline; older ones are merged into its rollup
+        
+        Returns:
+            Path to the saved JSON file, or None when timing is disabled
+        """
+        if not self.enabled:
+            return None
+        
+        self.metrics_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = self.started.strftime("%Y%m%d_%H%M%S_%f")
+        output_path = self.metrics_dir / f"{self.pipeline}_{timestamp}.json"
+        
+        with open(output_path, 'w') as f:
+            json.dump({
+                'pipeline': self.pipeline,
+                'started': self.started.isoformat(),
+                'finished': datetime.now().isoformat(),
+                'stages': {stage: histogram.to_dict() for stage, histogram in self.histograms.items()}
+            }, f)
+        
+        compact_metrics(self.pipeline, self.metrics_dir, keep_jobs)
+        return output_path
+
+
+def compact_metrics(pipeline: str, metrics_dir: Optional[str] = None, keep_jobs: int = KEEP_JOB_FILES) -> int:
+    """
+    Merge all but the newest job files of a pipeline into its rollup file.
+    
+    Args:
+        pipeline: Pipeline whose job files are compacted
+        metrics_dir: Directory with job metric files (default: output/metrics)
+        keep_jobs: Newest job files left as they are
+    
+    Returns:
+        Number of job files merged (0 if another process is compacting)
+    """
+    metrics_dir = Path(metrics_dir) if metrics_dir is not None else DEFAULT_METRICS_DIR
+    # Job files are named {pipeline}_{timestamp}.json, so name order is time order
+    job_paths = sorted(metrics_dir.glob(f"{pipeline}_[0-9]*.json"))
+    old_paths = job_paths[:max(0, len(job_paths) - keep_jobs)]
+    if not old_paths:
+        return 0
+    
+    # Jobs finish in separate processes; one compacts at a time, the others skip
+    lock_path = metrics_dir / f".{pipeline}.lock"
+    try:
+        lock = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - lock_path.stat().st_mtime > STALE_LOCK_SECONDS:
+                lock_path.unlink()
+        except OSError:
+            pass
+        return 0
+    
+    try:
+        rollup_path = metrics_dir / f"{pipeline}_rollup.json"
+        rollup = {'pipeline': pipeline, 'kind': 'rollup', 'jobs': 0, 'stages': {}}
+        if rollup_path.exists():
+            with open(rollup_path, 'r') as f:
+                rollup = json.load(f)
+        stages = {stage: LatencyHistogram.from_dict(data) for stage, data in rollup['stages'].items()}
+        
+        for path in old_paths:
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue  # Unreadable; dropped below
+            rollup['jobs'] += 1
+            for stage, histogram_data in data.get('stages', {}).items():
+                histogram = LatencyHistogram.from_dict(histogram_data)
+                if stage in stages:
+                    stages[stage].merge(histogram)
+                else:
+                    stages[stage] = histogram
+        
+        rollup['stages'] = {stage: histogram.to_dict() for stage, histogram in stages.items()}
+        temp_path = rollup_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_path, 'w') as f:
+            json.dump(rollup, f)
+        os.replace(temp_path, rollup_path)
+        
+        for path in old_paths:
+            path.unlink(missing_ok=True)
+        return len(old_paths)
+    finally:
+        os.close(lock)
+        lock_path.unlink(missing_ok=True)
+
+
+def load_metrics(metrics_dir: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Merge the saved job metrics (rollups and recent job files) per pipeline.
+    
+    Args:
+        metrics_dir: Directory with job metric files (default: output/metrics)
+    
+    Returns:
+        Dict of pipeline -> {'jobs': count, 'stages': {stage: LatencyHistogram},
+        'last_job': {'finished': ISO time, 'stages': {stage: LatencyHistogram}} or None}
+    """
+    metrics_dir = Path(metrics_dir) if metrics_dir is not None else DEFAULT_METRICS_DIR
+    pipelines: Dict[str, Dict] = {}
+    
+    for path in sorted(metrics_dir.glob("*.json")) if metrics_dir.exists() else []:
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue  # Partially written or foreign file
+        
+        pipeline = pipelines.setdefault(data.get('pipeline', 'unknown'),
+                                        {'jobs': 0, 'stages': {}, 'last_job': None})
+        is_rollup = data.get('kind') == 'rollup'
+        pipeline['jobs'] += data.get('jobs', 0) if is_rollup else 1
+        job_stages = {}
+        for stage, histogram_data in data.get('stages', {}).items():
+            histogram = LatencyHistogram.from_dict(histogram_data)
+            job_stages[stage] = LatencyHistogram.from_dict(histogram_data)
+            if stage in pipeline['stages']:
+                pipeline['stages'][stage].merge(histogram)
+            else:
+                pipeline['stages'][stage] = histogram
+        
+        last_job = pipeline['last_job']
+        if not is_rollup and (last_job is None or data.get('finished', '') > last_job['finished']):
+            pipeline['last_job'] = {'finished': data.get('finished', ''), 'stages': job_stages}
+    
+    return pipelines
+
+
+def format_prometheus(metrics_dir: Optional[str] = None) -> str:
+    """
+    Render the merged job metrics in the Prometheus text exposition format.
+    
+    Args:
+        metrics_dir: Directory with job metric files (default: output/metrics)
+    
+    Returns:
+        Metrics text
+    """
+    pipelines = load_metrics(metrics_dir)
+    lines = [
+        "# HELP paddlecoach_jobs_total Completed processing jobs with timing enabled.",
+        "# TYPE paddlecoach_jobs_total counter"
+    ]
+    for pipeline, data in pipelines.items():
+        lines.append(f'paddlecoach_jobs_total{{pipeline="{pipeline}"}} {data["jobs"]}')
+    
+    lines.append("# HELP paddlecoach_stage_duration_seconds Time spent per pipeline stage execution.")
+    lines.append("# TYPE paddlecoach_stage_duration_seconds histogram")
+    for pipeline, data in pipelines.items():
+        for stage, histogram in data['stages'].items():
+            labels = f'pipeline="{pipeline}",stage="{stage}"'
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKET_BOUNDS, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'paddlecoach_stage_duration_seconds_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'paddlecoach_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'paddlecoach_stage_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+            lines.append(f'paddlecoach_stage_duration_seconds_count{{{labels}}} {histogram.count}')
+    
+    lines.append("# HELP paddlecoach_stage_latency_seconds Estimated per-stage latency percentiles over all jobs.")
+    lines.append("# TYPE paddlecoach_stage_latency_seconds gauge")
+    for pipeline, data in pipelines.items():
+        for stage, histogram in data['stages'].items():
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append(f'paddlecoach_stage_latency_seconds{{pipeline="{pipeline}",stage="{stage}",'
+                             f'quantile="{quantile}"}} {histogram.percentile(quantile):.6f}')
+    
+    # The latest job per pipeline, so a slow job is visible without the all-time merge hiding it
+    lines.append("# HELP paddlecoach_last_job_stage_seconds_total Time spent per stage in the latest job.")
+    lines.append("# TYPE paddlecoach_last_job_stage_seconds_total gauge")
+    for pipeline, data in pipelines.items():
+        for stage, histogram in (data['last_job'] or {}).get('stages', {}).items():
+            lines.append(f'paddlecoach_last_job_stage_seconds_total{{pipeline="{pipeline}",stage="{stage}"}} '
+                         f'{histogram.sum:.6f}')
+    
+    lines.append("# HELP paddlecoach_last_job_stage_latency_seconds Per-stage latency percentiles of the latest job.")
+    lines.append("# TYPE paddlecoach_last_job_stage_latency_seconds gauge")
+    for pipeline, data in pipelines.items():
+        for stage, histogram in (data['last_job'] or {}).get('stages', {}).items():
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append(f'paddlecoach_last_job_stage_latency_seconds{{pipeline="{pipeline}",stage="{stage}",'
+                             f'quantile="{quantile}"}} {histogram.percentile(quantile):.6f}')
+    
+    return "\n".join(lines) + "\n"
@@ -3,6 +3,7 @@ Video processor for analyzing table tennis matches using YOLOv11n pose estimatio
 Processes MP4 videos and extracts pose data for both players.
 """
 import cv2
+import copy
 import json
 from pathlib import Path
 from typing import List, Dict, Optional
@@ -13,6 +14,17 @@ sys.path.append(str(Path(__file__).parent.parent))
 from models.pose_data import PoseData
 from vision.player_tracker import PlayerTracker
 from vision.shot_detector import ShotDetector
+from vision.motion_gate import MotionGate
+from vision.keypoint_smoother import KeypointSmoother
+from vision.adaptive_scheduler import AdaptiveFrameScheduler
+from vision.rally_segmenter import RallySegmenter, Rally, find_rally, rally_starts
+from vision.overlay_renderer import OverlayRenderer
+from vision.frame_source import FrameSource
+from vision.timing import StageTimer
+from vision.model_registry import registry
+from vision.imgsz_autotuner import ImgszAutotuner, sample_clip
+from vision.clip_exporter import ClipExporter
+from vision.thumbnail_sprites import SpriteGenerator
 
 
 class VideoProcessor:
@@ -20,7 +32,11 @@ class VideoProcessor:
     Processes MP4 video files to extract pose data for table tennis players.
     """
     
-    def __init__(self, video_path: str, output_dir: str = "output", target_fps: int = 30):
+    def __init__(self, video_path: str, output_dir: str = "output", target_fps: int = 30,
+                 use_motion_gate: bool = False, segment_rallies: bool = False,
+                 smooth_keypoints: bool = False, pose_interval: int = 1,
+                 adaptive_rate: bool = False, enable_timing: bool = False, auto_imgsz: bool = False,
+                 thumbnail_interval: Optional[float] = None):
         """
         Initialize the video processor.
         
@@ -28,6 +44,18 @@ class VideoProcessor:
             video_path: Path to input MP4 video
             output_dir: Directory to save output files
             target_fps: Target FPS for processing (e.g., 30 for real-time on most systems)
+            use_motion_gate: Skip pose inference on static frames and carry the last pose forward
+            segment_rallies: Scan for rallies first and only run full-rate analysis inside them
+            smooth_keypoints: Apply a One-Euro filter to all keypoints to remove frame-to-frame jitter
+            pose_interval: Run the pose model every N processed frames and propagate keypoints
+                           with optical flow in between (1 = every frame)
+            adaptive_rate: Sample slowly while wrists are slow, switch to full rate (with
+                           backfill of the skipped frames) when a stroke starts
+            enable_timing: Time each processing stage (stats and output/metrics)
+            auto_imgsz: Profile a clip at several pose model input sizes and use the smallest
+                        that reaches target_fps with good keypoints (cached per resolution)
+            thumbnail_interval: Seconds between timeline thumbnails written next to the
+                                annotated video, with its seek index (None = no thumbnails)
         """
         self.video_path = Path(video_path)
         self.output_dir = Path(output_dir)
@@ -58,14 +86,31 @@ class VideoProcessor:
         print(f"  Duration: {self.duration:.2f}s")
         
         # Initialize player tracker
-        self.tracker = PlayerTracker()
+        self.tracker = PlayerTracker(inference_interval=pose_interval)
+        
+        # Pose model input size for this resolution and target FPS
+        self.imgsz_tuning = None
+        if auto_imgsz:
+            autotuner = ImgszAutotuner(target_fps=target_fps)
+            clip = sample_clip(str(self.video_path), autotuner.warmup_frames + autotuner.clip_frames)
+            self.imgsz_tuning = autotuner.tune_pose(self.tracker, clip)
+        
+        # Motion gate to skip inference between rallies
+        self.motion_gate = MotionGate() if use_motion_gate else None
+        
+        # Temporal keypoint smoothing (streaming)
+        self.smoother = KeypointSmoother() if smooth_keypoints else None
+        
+        # Wrist-velocity driven sampling rate
+        self.scheduler = AdaptiveFrameScheduler() if adaptive_rate else None
         
         # Initialize shot detector
         self.shot_detector = ShotDetector(
             velocity_threshold=15.0,  # Adjust based on video resolution
             min_shot_duration=5,
             max_shot_duration=30,
-            cooldown_frames=10
+            cooldown_frames=10,
+            frame_interval=self.frame_skip  # Full-rate spacing, for unevenly sampled sequences
         )
         
         # Storage for all pose data
@@ -73,6 +118,17 @@ class VideoProcessor:
         
         # Storage for detected shots
         self.detected_shots: Dict[int, List] = {0: [], 1: []}
+        
+        # Rally intervals from the scan pass (empty = whole video)
+        self.segment_rallies = segment_rallies
+        self.rallies: List[Rally] = []
+        
+        # Per-stage span timers
+        self.timer = StageTimer("video_processor", enabled=enable_timing)
+        
+        # Timeline thumbnails for the annotated video
+        self.thumbnail_interval = thumbnail_interval
+        self.seek_index: Optional[Dict] = None
     
     def process_video(self, 
                      visualize: bool = True, 
@@ -84,7 +140,7 @@ class VideoProcessor:
         
         Args:
             visualize: Whether to show visualization while processing
-            save_video: Whether to save annotated video
+            save_video: Whether to save annotated video (rendered from the results after processing)
             max_frames: Maximum number of frames to process (None = all)
             
         Returns:
@@ -95,20 +151,17 @@ class VideoProcessor:
         frame_count = 0
         processed_count = 0
         
-        # Setup video writer if saving
-        video_writer = None
-        if save_video:
-            output_video_path = self.output_dir / f"{self.video_path.stem}_annotated.mp4"
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            video_writer = cv2.VideoWriter(
-                str(output_video_path),
-                fourcc,
-                self.target_fps,
-                (self.width, self.height)
-            )
+        # Lightweight scan pass to find where the ball is in play
+        if self.segment_rallies:
+            segmenter = RallySegmenter(pose_model=self.tracker.model)
+            with self.timer.span("rally_scan"):
+                self.rallies = segmenter.scan_video(str(self.video_path))
+            if not self.rallies:
+                print("⚠️  No rallies found, processing the whole video")
         
         print("\nProcessing video (optimized for Apple Silicon)...")
-        print(f"Press 'q' to quit, 'p' to pause, SPACE to toggle visualization")
+        if visualize:
+            print(f"Press 'q' to quit, 'p' to pause, SPACE to toggle visualization")
         
         paused = False
         show_viz = visualize
@@ -116,34 +169,87 @@ class VideoProcessor:
         fps_counter = 0
         fps_start = time.time()
         current_fps = 0
+        last_pose_data: List[PoseData] = []
+        
+        # Frames skipped for the target FPS and dead time between rallies are only grabbed
+        starts = rally_starts(self.rallies)
+        
+        def needs_decoding(frame_index: int) -> bool:
+            if frame_index % self.frame_skip != 0:
+                return False
+            return not self.rallies or find_rally(self.rallies, frame_index, starts) is not None
+        
+        source = FrameSource(self.cap, frame_filter=needs_decoding)
         
         while True:
             if not paused:
-                ret, frame = self.cap.read()
-                if not ret:
-                    break
-                
                 # Check max frames limit
                 if max_frames and frame_count >= max_frames:
                     break
                 
-                # Skip frames for target FPS
-                if frame_count % self.frame_skip != 0:
+                # Frames are read-only views into the decoder's ring buffer
+                with self.timer.span("decode"):
+                    ret, frame = source.read()
+                if not ret:
+                    break
+                
+                if frame is None:
                     frame_count += 1
                     continue
                 
                 # Calculate timestamp
                 timestamp = frame_count / self.original_fps
                 
-                # Process frame
-                pose_data_list = self.tracker.process_frame(frame, frame_count, timestamp)
+                # Quiet phase at low sampling rate: keep the frame in case a stroke follows
+                if self.scheduler is not None and not self.scheduler.should_process():
+                    self.scheduler.skip(frame.copy(), frame_count, timestamp)
+                    frame_count += 1
+                    continue
+                
+                # Process frame (static frames reuse the last pose)
+                with self.timer.span("motion_gate"):
+                    inferred = self.motion_gate is None or self.motion_gate.should_process(frame)
+                if inferred:
+                    # A low-rate sample may start a stroke, after which the skipped frames come first
+                    tracker_state = (self.tracker.get_state()
+                                     if self.scheduler is not None and not self.scheduler.full_rate else None)
+                    with self.timer.span("pose"):
+                        pose_data_list = self.tracker.process_frame(frame, frame_count, timestamp)
+                else:
+                    pose_data_list = self._carry_forward_poses(last_pose_data, frame_count, timestamp)
+                
+                # Stroke starting: backfill the frames skipped just before it
+                backfill = self.scheduler.observe(pose_data_list, frame_count, timestamp) if self.scheduler else []
+                if backfill:
+                    # The tracker is stateful (IDs, history, optical flow): rewind it so the
+                    # skipped frames go in before the trigger frame, which is processed again
+                    if inferred:
+                        self.tracker.set_state(tracker_state)
+                    for skipped_frame, skipped_number, skipped_time in backfill:
+                        with self.timer.span("backfill"):
+                            backfilled = self.tracker.process_frame(skipped_frame, skipped_number, skipped_time)
+                            if self.smoother is not None:
+                                backfilled = self.smoother.update(backfilled)
+                        for pose_data in backfilled:
+                            self.all_pose_data[pose_data.player_id].append(pose_data)
+                        processed_count += 1
+                    if inferred:
+                        with self.timer.span("pose"):
+                            pose_data_list = self.tracker.process_frame(frame, frame_count, timestamp)
+                
+                if inferred:
+                    if self.smoother is not None:
+                        with self.timer.span("smoothing"):
+                            pose_data_list = self.smoother.update(pose_data_list)
+                    last_pose_data = pose_data_list
                 
                 # Store pose data
                 for pose_data in pose_data_list:
                     self.all_pose_data[pose_data.player_id].append(pose_data)
                 
-                # Visualize
-                if show_viz or save_video:
+                # Live view (the saved video is rendered after processing)
+                if show_viz:
+                    draw_start = time.perf_counter()
                     annotated_frame = frame.copy()
                     for pose_data in pose_data_list:
                         annotated_frame = self.tracker.visualize_pose(annotated_frame, pose_data)
@@ -162,17 +268,14 @@ class VideoProcessor:
                     cv2.putText(annotated_frame, f"Players: {len(pose_data_list)}", 
                                (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
                     
-                    if show_viz:
-                        # Resize for display if needed (faster visualization)
-                        display_frame = annotated_frame
-                        if self.width > 1280:
-                            scale = 1280 / self.width
-                            display_frame = cv2.resize(annotated_frame, 
-                                                      (int(self.width * scale), int(self.height * scale)))
-                        cv2.imshow('Table Tennis Pose Analysis (Optimized)', display_frame)
-                    
-                    if save_video and video_writer:
-                        video_writer.write(annotated_frame)
+                    # Resize for display if needed (faster visualization)
+                    display_frame = annotated_frame
+                    if self.width > 1280:
+                        scale = 1280 / self.width
+                        display_frame = cv2.resize(annotated_frame, 
+                                                  (int(self.width * scale), int(self.height * scale)))
+                    cv2.imshow('Table Tennis Pose Analysis (Optimized)', display_frame)
+                    self.timer.record("visualization", time.perf_counter() - draw_start)
                 
                 processed_count += 1
                 frame_count += 1
@@ -207,19 +310,47 @@ class VideoProcessor:
         
         # Cleanup
         elapsed_time = time.time() - start_time
-        self.cap.release()
-        if video_writer:
-            video_writer.release()
-        cv2.destroyAllWindows()
+        source.release()
+        if visualize:
+            # Headless OpenCV builds have no window support at all
+            cv2.destroyAllWindows()
         
         avg_fps = processed_count / elapsed_time if elapsed_time > 0 else 0
         
-        # Detect shots from pose data
+        # Backfilled frames were stored after the frame that triggered them
+        if self.scheduler is not None:
+            for player_id in [0, 1]:
+                self.all_pose_data[player_id].sort(key=lambda p: p.frame_number)
+        
+        # Detect shots from pose data (per rally, so no stroke spans dead time)
         print(f"\n🔍 Detecting shots...")
+        shot_start = time.perf_counter()
         for player_id in [0, 1]:
-            shots = self.shot_detector.detect_shots(self.all_pose_data[player_id])
+            shots = []
+            if self.rallies:
+                for rally in self.rallies:
+                    rally_poses = [p for p in self.all_pose_data[player_id] if rally.contains(p.frame_number)]
+                    for shot in self.shot_detector.detect_shots(rally_poses):
+                        shot.rally_id = rally.rally_id
+                        shots.append(shot)
+            else:
+                shots = self.shot_detector.detect_shots(self.all_pose_data[player_id])
             self.detected_shots[player_id] = shots
             print(f"   Player {player_id}: {len(shots)} shots detected")
+        self.timer.record("shot_detection", time.perf_counter() - shot_start)
+        
+        # Annotated video from the stored results, outside the inference loop
+        if save_video and frame_count > 0:
+            renderer = OverlayRenderer(str(self.video_path))
+            renderer.set_poses(self.all_pose_data)
+            annotated_path = self.output_dir / f"{self.video_path.stem}_annotated.mp4"
+            with self.timer.span("render"):
+                renderer.render(str(annotated_path), end_frame=frame_count - 1)
+            
+            # Sprites and seek index, so the frontend can scrub without loading the video
+            if self.thumbnail_interval:
+                with self.timer.span("thumbnails"):
+                    self.seek_index = SpriteGenerator(interval=self.thumbnail_interval).generate(str(annotated_path))
         
         print(f"\n✅ Processing complete!")
         print(f"Processed {processed_count} frames in {elapsed_time:.1f}s")
@@ -227,7 +358,7 @@ class VideoProcessor:
         print(f"Player 0: {len(self.all_pose_data[0])} detections")
         print(f"Player 1: {len(self.all_pose_data[1])} detections")
         
-        return {
+        stats = {
             "total_frames": self.total_frames,
             "processed_frames": processed_count,
             "player_0_detections": len(self.all_pose_data[0]),
@@ -235,15 +366,77 @@ class VideoProcessor:
             "duration": self.duration,
             "original_fps": self.original_fps,
             "processing_fps": avg_fps,
-            "processing_time": elapsed_time
+            "processing_time": elapsed_time,
+            "rallies": len(self.rallies),
+            "rally_frames": sum(r.end_frame - r.start_frame + 1 for r in self.rallies)
         }
+        
+        stats["frame_source"] = source.get_statistics()
+        stats["pose_inference"] = self.tracker.get_inference_statistics()
+        print(f"Pose model calls: {stats['pose_inference']['pose_inference_calls']} "
+              f"({stats['pose_inference']['propagated_frames']} frames propagated with optical flow)")
+        
+        if self.scheduler is not None:
+            stats["adaptive_rate"] = self.scheduler.get_statistics()
+            print(f"Adaptive rate: skipped {stats['adaptive_rate']['scheduler_skipped_frames']} quiet frames, "
+                  f"backfilled {stats['adaptive_rate']['backfilled_frames']}")
+        
+        if self.motion_gate is not None:
+            gate_stats = self.motion_gate.get_statistics()
+            stats["motion_gate"] = gate_stats
+            print(f"Motion gate: skipped {gate_stats['skipped_frames']}/{gate_stats['gated_frames']} "
+                  f"frames ({gate_stats['skip_ratio']:.1%})")
+        
+        stats["models"] = registry.memory_report()
+        
+        if self.imgsz_tuning is not None:
+            stats["imgsz"] = self.imgsz_tuning
+        
+        if self.seek_index is not None:
+            stats["thumbnails"] = {
+                "thumbnail_count": self.seek_index["thumbnail_count"],
+                "sprites": len(self.seek_index["sprites"]),
+                "keyframes": len(self.seek_index["keyframes"]["times"])
+            }
+        
+        if self.timer.enabled:
+            stats["timing"] = self.timer.get_statistics()
+            self.timer.print_summary()
+            self.timer.save()
+        
+        return stats
+    
+    @staticmethod
+    def _carry_forward_poses(pose_data_list: List[PoseData], frame_number: int,
+                             timestamp: float) -> List[PoseData]:
+        """
+        Reuse the last inferred poses for a frame that was skipped by the motion gate.
+        
+        Args:
+            pose_data_list: Poses from the last inferred frame
+            frame_number: Current frame number
+            timestamp: Timestamp in seconds from video start
+            
+        Returns:
+            Copies of the poses stamped with the current frame
+        """
+        carried = []
+        for pose_data in pose_data_list:
+            pose_copy = copy.copy(pose_data)
+            pose_copy.frame_number = frame_number
+            pose_copy.timestamp = timestamp
+            pose_copy.source = "carried"
+            carried.append(pose_copy)
+        return carried
     
-    def save_pose_data_json(self, filename: Optional[str] = None) -> Path:
+    def save_pose_data_json(self, filename: Optional[str] = None, include_all_keypoints: bool = False) -> Path:
         """
         Save all pose data to a compact JSON file (only wrists and elbows).
         
         Args:
             filename: Output filename (default: {video_name}_pose_data.json)
+            include_all_keypoints: Also store all 17 keypoints per pose, so the overlay
+                                   video can be re-rendered later with OverlayRenderer
             
         Returns:
             Path to the saved JSON file
@@ -268,11 +461,17 @@ class VideoProcessor:
                 "tracking_info": {
                     "keypoints_tracked": ["left_wrist", "left_elbow", "right_wrist", "right_elbow"],
                     "player_0_frames": len(self.all_pose_data[0]),
-                    "player_1_frames": len(self.all_pose_data[1])
-                }
+                    "player_1_frames": len(self.all_pose_data[1]),
+                    "keypoint_sources": {
+                        source: sum(1 for pid in [0, 1] for p in self.all_pose_data[pid] if p.source == source)
+                        for source in ["inferred", "propagated", "carried"]
+                    }
+                },
+                "rallies": [rally.to_dict() for rally in self.rallies],
+                "sampling_segments": self.scheduler.get_segments() if self.scheduler is not None else []
             },
-            "player_0": [pose.to_dict() for pose in self.all_pose_data[0]],
-            "player_1": [pose.to_dict() for pose in self.all_pose_data[1]]
+            "player_0": [pose.to_dict(include_all_keypoints) for pose in self.all_pose_data[0]],
+            "player_1": [pose.to_dict(include_all_keypoints) for pose in self.all_pose_data[1]]
         }
         
         # Save to JSON
@@ -320,6 +519,7 @@ class VideoProcessor:
                     "total_shots_detected": total_shots,
                     "player_0_shots": len(self.detected_shots[0]),
                     "player_1_shots": len(self.detected_shots[1]),
+                    "rally_count": len(self.rallies),
                     "detection_method": "velocity_based_wrist_tracking"
                 },
                 "gemini_usage": {
@@ -328,6 +528,7 @@ class VideoProcessor:
                     "estimated_tokens": total_shots * 150  # Rough estimate
                 }
             },
+            "rallies": [rally.to_dict() for rally in self.rallies],
             "shots": {
                 "player_0": [shot.to_dict() for shot in self.detected_shots[0]],
                 "player_1": [shot.to_dict() for shot in self.detected_shots[1]]
@@ -366,6 +567,21 @@ class VideoProcessor:
         
         return output_path
     
+    def export_shot_clips(self, padding: float = 0.5, workers: Optional[int] = None) -> Dict:
+        """
+        Cut one clip per detected shot from the source video (see ClipExporter).
+        
+        Args:
+            padding: Seconds added before and after each shot
+            workers: Clips cut at the same time (None = CPU count)
+        
+        Returns:
+            Clip index (also saved as {video_name}_clips/clip_index.json)
+        """
+        exporter = ClipExporter(str(self.video_path), str(self.output_dir / f"{self.video_path.stem}_clips"),
+                                padding=padding, workers=workers)
+        return exporter.export(self.detected_shots[0] + self.detected_shots[1])
+    
     def get_summary_statistics(self) -> Dict:
         """
         Calculate summary statistics for both players (focused on arm movements).
@@ -418,24 +634,48 @@ def main():
     parser.add_argument("--output-dir", type=str, default="output", help="Output directory")
     parser.add_argument("--no-visualize", action="store_true", help="Disable visualization")
     parser.add_argument("--no-save-video", action="store_true", help="Don't save annotated video")
-    parser.add_argument("--skip-frames", type=int, default=0, help="Process every Nth frame")
     parser.add_argument("--max-frames", type=int, default=None, help="Maximum frames to process")
+    parser.add_argument("--all-keypoints", action="store_true",
+                        help="Store all 17 keypoints in the pose JSON (for re-rendering overlays)")
+    parser.add_argument("--adaptive-rate", action="store_true",
+                        help="Sample quiet phases at a lower rate, full rate around strokes")
+    parser.add_argument("--pose-interval", type=int, default=1,
+                        help="Run the pose model every Nth frame, optical flow in between")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="Skip pose inference on static frames and carry the last pose forward")
+    parser.add_argument("--segment-rallies", action="store_true",
+                        help="Scan for rallies first and only run full-rate analysis inside them")
+    parser.add_argument("--smooth-keypoints", action="store_true",
+                        help="Remove frame-to-frame keypoint jitter with a One-Euro filter")
+    parser.add_argument("--timing", action="store_true", help="Time each stage (stats and output/metrics)")
+    parser.add_argument("--auto-imgsz", action="store_true",
+                        help="Choose the pose model input size for this resolution and the target FPS")
+    parser.add_argument("--thumbnail-interval", type=float, default=0,
+                        help="Seconds between timeline thumbnails of the annotated video (0 = none)")
+    parser.add_argument("--export-clips", action="store_true", help="Cut one clip per detected shot")
+    parser.add_argument("--clip-padding", type=float, default=0.5, help="Seconds before and after each shot clip")
     
     args = parser.parse_args()
     
     # Create processor
-    processor = VideoProcessor(args.video_path, args.output_dir)
+    processor = VideoProcessor(args.video_path, args.output_dir, pose_interval=args.pose_interval,
+                               adaptive_rate=args.adaptive_rate, enable_timing=args.timing,
+                               auto_imgsz=args.auto_imgsz, thumbnail_interval=args.thumbnail_interval or None,
+                               use_motion_gate=args.motion_gate, segment_rallies=args.segment_rallies,
+                               smooth_keypoints=args.smooth_keypoints)
     
     # Process video
     stats = processor.process_video(
         visualize=not args.no_visualize,
         save_video=not args.no_save_video,
-        skip_frames=args.skip_frames,
         max_frames=args.max_frames
     )
     
     # Save pose data to JSON
-    json_path = processor.save_pose_data_json()
+    json_path = processor.save_pose_data_json(include_all_keypoints=args.all_keypoints)
+    
+    if args.export_clips:
+        processor.export_shot_clips(padding=args.clip_padding)
     
     # Print summary statistics
     summary = processor.get_summary_statistics()
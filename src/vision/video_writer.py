@@ -0,0 +1,182 @@
+"""
+Video writer backends.
+OpenCVVideoWriter wraps cv2.VideoWriter (mp4v); FFmpegVideoWriter pipes raw
+frames to an ffmpeg subprocess that encodes H.264 on a background thread,
+so encoding stays off the capture/inference loop.
+"""
+from typing import Tuple, Optional
+import queue
+import shutil
+import subprocess
+import threading
+import cv2
+import numpy as np
+from pathlib import Path
+
+
+class OpenCVVideoWriter:
+    """cv2.VideoWriter backend (MPEG-4 Part 2, encodes on the calling thread)."""
+    
+    def __init__(self, output_path: str, fps: float, frame_size: Tuple[int, int], fourcc: str = "mp4v"):
+        """
+        Initialize the writer.
+        
+        Args:
+            output_path: Output video path
+            fps: Output frame rate
+            frame_size: (width, height) of the frames
+            fourcc: Four-character codec code
+        """
+        self.output_path = Path(output_path)
+        self.frame_size = frame_size
+        self.writer = cv2.VideoWriter(str(self.output_path), cv2.VideoWriter_fourcc(*fourcc), fps, frame_size)
+        self.frames_written = 0
+    
+    def is_opened(self) -> bool:
+        """Whether the writer accepts frames."""
+        return self.writer.isOpened()
+    
+    def write(self, frame: np.ndarray):
+        """Encode one BGR frame."""
+        self.writer.write(frame)
+        self.frames_written += 1
+    
+    def release(self):
+        """Finish the file."""
+        self.writer.release()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class FFmpegVideoWriter:
+    """
+    ffmpeg pipe backend: raw BGR frames in, H.264 MP4 out.
+    write() only queues a copy of the frame; a background thread feeds ffmpeg,
+    which encodes in its own process. Files use the faststart layout (index at
+    the front) so browsers can start playback before the download finishes.
+    """
+    
+    def __init__(self,
+                 output_path: str,
+                 fps: float,
+                 frame_size: Tuple[int, int],
+                 preset: str = "veryfast",
+                 crf: int = 23,
+                 queue_size: int = 32,
+                 ffmpeg_path: str = "ffmpeg"):
+        """
+        Initialize the writer and start ffmpeg.
+        
+        Args:
+            output_path: Output video path (.mp4)
+            fps: Output frame rate
+            frame_size: (width, height) of the frames
+            preset: x264 speed/size trade-off ("ultrafast" ... "veryslow")
+            crf: x264 constant rate factor (lower = better quality, larger file; 18-28 is typical)
+            queue_size: Frames buffered before write() blocks
+            ffmpeg_path: ffmpeg executable
+        """
+        self.output_path = Path(output_path)
+        self.frame_size = frame_size
+        self.frames_written = 0
+        
+        width, height = frame_size
+        command = [
+            ffmpeg_path, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps}",
+            "-i", "-",
+            "-an", "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            # A keyframe every 2 s, so a seek never decodes more than 2 s of video
+            "-g", str(max(1, int(round(2 * fps)))),
+            # yuv420p for player compatibility (needs even dimensions)
+            "-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-movflags", "+faststart",
+            str(self.output_path)
+        ]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        
+        self.frames: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.error: Optional[Exception] = None
+        self.thread = threading.Thread(target=self._feed, daemon=True)
+        self.thread.start()
+    
+    def is_opened(self) -> bool:
+        """Whether the writer accepts frames."""
+        return self.process.poll() is None and self.error is None
+    
+    def write(self, frame: np.ndarray):
+        """
+        Queue one BGR frame for encoding.
+        The frame is copied, so the caller may reuse or draw on it afterwards.
+        """
+        if self.error is not None:
+            raise RuntimeError(f"ffmpeg writer failed: {self.error}")
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            raise ValueError(f"Frame size {frame.shape[1]}x{frame.shape[0]} does not match "
+                             f"writer size {self.frame_size[0]}x{self.frame_size[1]}")
+        self.frames.put(np.ascontiguousarray(frame).copy())
+        self.frames_written += 1
+    
+    def _feed(self):
+        """Background thread: move queued frames into the ffmpeg pipe."""
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                continue  # Drain the queue so write() never blocks forever
+            try:
+                self.process.stdin.write(frame.data)
+            except (BrokenPipeError, OSError) as e:
+                self.error = e
+    
+    def release(self):
+        """Flush the queue, close the pipe and wait for ffmpeg to finish the file."""
+        if self.process.stdin.closed:
+            return
+        self.frames.put(None)
+        self.thread.join()
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        stderr = self.process.stderr.read().decode(errors="replace")
+        return_code = self.process.wait()
+        if return_code != 0 or self.error is not None:
+            raise RuntimeError(f"ffmpeg exited with code {return_code}: {stderr.strip()[-500:]}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def create_video_writer(output_path: str, fps: float, frame_size: Tuple[int, int],
+                        backend: str = "auto", preset: str = "veryfast", crf: int = 23):
+    """
+    Create a video writer.
+    
+    Args:
+        output_path: Output video path
+        fps: Output frame rate
+        frame_size: (width, height) of the frames
+        backend: "ffmpeg" (H.264 via pipe), "opencv" (mp4v) or "auto" (ffmpeg if installed)
+        preset: x264 preset for the ffmpeg backend
+        crf: x264 CRF for the ffmpeg backend
+    
+    Returns:
+        FFmpegVideoWriter or OpenCVVideoWriter
+    """
+    if backend == "auto":
+        backend = "ffmpeg" if shutil.which("ffmpeg") else "opencv"
+    
+    if backend == "ffmpeg":
+        return FFmpegVideoWriter(output_path, fps, frame_size, preset=preset, crf=crf)
+    if backend == "opencv":
+        return OpenCVVideoWriter(output_path, fps, frame_size)
+    raise ValueError(f"Unknown video writer backend: {backend}")
@@ -0,0 +1,5 @@
+"""Shared test setup: make src/ importable the way the scripts do."""
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
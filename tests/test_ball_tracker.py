@@ -0,0 +1,54 @@
+"""
+Tests for the YOLO ball tracker's ROI search.
+"""
+from pathlib import Path
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent / "benchmarks"))
+from stub_models import stub_models
+from vision.ball_tracker import BallTracker
+
+
+class RecordingModel:
+    """Wraps a model and records the keyword arguments of every call."""
+    
+    def __init__(self, model):
+        self.model = model
+        self.names = model.names
+        self.call_kwargs = []
+    
+    def __call__(self, image, **kwargs):
+        self.call_kwargs.append(dict(kwargs, shape=image.shape))
+        return self.model(image, **kwargs)
+
+
+def ball_frame(x: int, y: int, width: int = 1280, height: int = 720) -> np.ndarray:
+    """Gray frame with an orange ball at (x, y)."""
+    frame = np.full((height, width, 3), 90, np.uint8)
+    cv2.circle(frame, (x, y), 6, (50, 139, 250), -1)
+    return frame
+
+
+def test_roi_search_runs_crops_at_their_own_size_and_retries_misses_on_the_full_frame():
+    with stub_models(None):
+        tracker = BallTracker(use_roi=True, use_half=False, device="cpu")
+        tracker.model = RecordingModel(tracker.model)
+        
+        # Acquire the ball on full frames, then follow it with crops
+        for i in range(4):
+            assert tracker.process_frame(ball_frame(400 + 10 * i, 300), i, i / 30) is not None
+        calls = tracker.model.call_kwargs
+        assert "imgsz" not in calls[0]
+        assert calls[-1]["shape"][:2] != (720, 1280)
+        assert calls[-1]["imgsz"] == -(-max(calls[-1]["shape"][:2]) // 32) * 32
+        assert calls[-1]["imgsz"] < 640
+        
+        # A miss in the crop is retried on the whole next frame
+        assert tracker.process_frame(np.full((720, 1280, 3), 90, np.uint8), 4, 4 / 30) is None
+        assert calls[-1]["shape"][:2] != (720, 1280)
+        tracker.process_frame(ball_frame(1000, 600), 5, 5 / 30)
+        assert calls[-1]["shape"][:2] == (720, 1280)
+        assert "imgsz" not in calls[-1]
@@ -0,0 +1,86 @@
+"""
+Tests for the HSV ball tracker's fast path and candidate scoring.
+"""
+from pathlib import Path
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent / "benchmarks"))
+from synthetic_match import SyntheticMatch
+from vision.ball_tracker_hsv import BallTrackerHSV
+
+
+def detection_rate(tracker: BallTrackerHSV, match: SyntheticMatch) -> float:
+    """Share of frames with a visible ball where the tracker finds it within 3 ball radii."""
+    radius = max(4, match.width // 128)
+    hits = []
+    for i in range(match.num_frames):
+        result = tracker.process_frame(match.render_frame(i), i, i / match.fps)
+        x, y, visible = match.ball[i]
+        if visible > 0:
+            hits.append(result is not None and np.hypot(result.x - x, result.y - y) < 3 * radius)
+    return float(np.mean(hits))
+
+
+@pytest.mark.parametrize("width, height", [(640, 360), (1280, 720)])
+def test_fast_mode_recall_matches_full_mode(width, height):
+    match = SyntheticMatch(width=width, height=height, fps=30, duration=4, seed=0)
+    
+    full = detection_rate(BallTrackerHSV(), match)
+    fast = detection_rate(BallTrackerHSV(fast_mode=True), match)
+    
+    assert full > 0.85
+    assert fast >= full - 0.03
+
+
+def test_fast_mode_keeps_small_balls_at_full_resolution():
+    tracker = BallTrackerHSV(fast_mode=True, pyramid_levels=2)
+    
+    assert tracker._fast_levels(640) == 0  # 5 px ball
+    assert tracker._fast_levels(1280) == 1  # 10 px ball
+    assert tracker._fast_levels(3840) == 2  # 30 px ball
+    assert BallTrackerHSV(fast_mode=True, ball_radius=12)._fast_levels(640) == 1
+
+
+def random_mask(rng: np.random.Generator, height: int = 120, width: int = 160) -> np.ndarray:
+    """Binary mask with a few filled ellipses of random size and orientation plus speckle noise."""
+    mask = np.zeros((height, width), np.uint8)
+    for _ in range(rng.integers(1, 6)):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        axes = (int(rng.integers(1, 30)), int(rng.integers(1, 30)))
+        cv2.ellipse(mask, center, axes, float(rng.uniform(0, 180)), 0, 360, 255, -1)
+    mask[rng.random(mask.shape) < 0.002] = 255
+    return mask
+
+
+@pytest.mark.parametrize("area_scale", [1.0, 4.0])
+def test_component_scoring_matches_contour_scoring(area_scale):
+    contours = BallTrackerHSV(candidate_method="contours")
+    components = BallTrackerHSV(candidate_method="components")
+    rng = np.random.default_rng(0)
+    
+    found = 0
+    for _ in range(300):
+        mask = random_mask(rng)
+        expected = contours._find_candidate(mask, area_scale)
+        result = components._find_candidate(mask, area_scale)
+        if expected is None:
+            assert result is None
+            continue
+        found += 1
+        assert result is not None
+        assert result[:4] == expected[:4]
+        assert result[4] == pytest.approx(expected[4])
+    
+    assert found > 100
+
+
+def test_component_scoring_rejects_hollow_blobs():
+    mask = np.zeros((120, 160), np.uint8)
+    cv2.circle(mask, (80, 60), 20, 255, 2)
+    
+    assert BallTrackerHSV(candidate_method="contours")._find_candidate(mask) is not None
+    assert BallTrackerHSV(candidate_method="components")._find_candidate(mask) is None
@@ -0,0 +1,109 @@
+"""
+Tests for the process-wide model registry.
+"""
+import sys
+import types
+
+import pytest
+
+from vision import model_registry
+from vision.model_registry import ModelRegistry
+
+
+class FakeYOLO:
+    """
+    Mimics how ultralytics places a model: the first call builds the predictor,
+    which moves the weights to the requested device and precision; later calls
+    leave them where they are.
+    """
+    
+    def __init__(self, model_path, task=None):
+        self.model_path = model_path
+        self.device = "cpu"
+        self.dtype = "float32"
+        self.predictor = None
+        self.call_kwargs = []
+    
+    def __call__(self, image, **kwargs):
+        self.call_kwargs.append(kwargs)
+        if self.predictor is None:
+            self.predictor = kwargs
+            self.device = kwargs.get("device") or "cpu"
+            self.dtype = "float16" if kwargs.get("half") else "float32"
+        return []
+
+
+@pytest.fixture
+def fake_ultralytics(monkeypatch):
+    module = types.ModuleType("ultralytics")
+    module.YOLO = FakeYOLO
+    monkeypatch.setitem(sys.modules, "ultralytics", module)
+    return module
+
+
+def test_warmup_places_model_on_requested_device_and_precision(fake_ultralytics):
+    registry = ModelRegistry(warmup_size=32)
+    
+    model = registry.get("ball.pt", device="mps", half=True)
+    
+    assert model.device == "mps"
+    assert model.dtype == "float16"
+    assert model.call_kwargs[0]["device"] == "mps"
+    assert model.call_kwargs[0]["half"] is True
+
+
+def test_device_and_precision_are_part_of_the_key(fake_ultralytics):
+    registry = ModelRegistry(warmup_size=32)
+    
+    fp16 = registry.get("pose.pt", device="mps", half=True)
+    fp32 = registry.get("pose.pt", device="cpu", half=False)
+    
+    assert fp16 is not fp32
+    assert (fp16.device, fp16.dtype) == ("mps", "float16")
+    assert (fp32.device, fp32.dtype) == ("cpu", "float32")
+    assert registry.get("pose.pt", device="mps", half=True) is fp16
+    assert registry.memory_report()["model_count"] == 2
+
+
+def test_evict_by_path_drops_every_configuration(fake_ultralytics):
+    registry = ModelRegistry(warmup_size=32)
+    registry.get("pose.pt", device="mps", half=True)
+    registry.get("pose.pt", device="cpu")
+    registry.get("ball.pt", device="cpu")
+    
+    assert registry.evict("pose.pt") == 2
+    assert registry.loaded_models() == ["ball.pt"]
+
+
+def test_tracker_and_analyzer_with_the_same_settings_share_one_model(fake_ultralytics, tmp_path):
+    from vision.game_analyzer import GameAnalyzer
+    from vision.player_tracker import PlayerTracker
+    
+    model_registry.registry.evict()
+    try:
+        tracker = PlayerTracker(device="cpu", use_half=False)
+        analyzer = GameAnalyzer(output_dir=str(tmp_path), device="cpu", use_half=False)
+        
+        assert analyzer.model is tracker.model
+        assert model_registry.registry.memory_report()["model_count"] == 1
+        assert GameAnalyzer(output_dir=str(tmp_path)).model is PlayerTracker().model
+    finally:
+        model_registry.registry.evict()
+
+
+def test_ultralytics_model_device_and_dtype():
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("ultralytics")
+    
+    registry = ModelRegistry(warmup_size=64)
+    # Built from the architecture config, so no weights download is needed
+    model = registry.get("yolo11n.yaml", device="cpu", half=False)
+    parameter = next(model.model.parameters())
+    assert parameter.device.type == "cpu"
+    assert parameter.dtype == torch.float32
+    
+    if torch.cuda.is_available():
+        model = registry.get("yolo11n.yaml", device="cuda:0", half=True)
+        parameter = next(model.model.parameters())
+        assert parameter.device.type == "cuda"
+        assert parameter.dtype == torch.float16
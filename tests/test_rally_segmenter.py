@@ -0,0 +1,23 @@
+"""
+Tests for rally lookup.
+"""
+from vision.rally_segmenter import Rally, find_rally, rally_starts
+
+
+def make_rallies(bounds):
+    return [Rally(rally_id=i, start_frame=start, end_frame=end, start_time=start / 30, end_time=end / 30)
+            for i, (start, end) in enumerate(bounds)]
+
+
+def test_find_rally_with_prebuilt_starts_matches_a_linear_search():
+    rallies = make_rallies([(10, 40), (41, 41), (90, 150), (300, 420)])
+    starts = rally_starts(rallies)
+    
+    for frame in range(-5, 450):
+        expected = next((rally for rally in rallies if rally.contains(frame)), None)
+        assert find_rally(rallies, frame, starts) is expected
+        assert find_rally(rallies, frame) is expected
+
+
+def test_find_rally_without_rallies():
+    assert find_rally([], 0, rally_starts([])) is None
@@ -0,0 +1,41 @@
+"""
+Tests for stage timing metrics retention and export.
+"""
+from datetime import datetime, timedelta
+
+from vision.timing import StageTimer, load_metrics, format_prometheus
+
+
+def save_jobs(metrics_dir, count: int, keep_jobs: int, seconds: float = 0.01):
+    """Save count jobs of one 'decode' span each."""
+    start = datetime(2026, 1, 1)
+    for i in range(count):
+        timer = StageTimer("video_processor", metrics_dir=str(metrics_dir))
+        timer.started = start + timedelta(seconds=i)
+        timer.record("decode", seconds * (i + 1))
+        timer.save(keep_jobs=keep_jobs)
+
+
+def test_old_job_files_are_rolled_up(tmp_path):
+    save_jobs(tmp_path, count=25, keep_jobs=5)
+    
+    job_files = sorted(tmp_path.glob("video_processor_[0-9]*.json"))
+    assert len(job_files) == 5
+    assert (tmp_path / "video_processor_rollup.json").exists()
+    assert not list(tmp_path.glob(".*.lock"))
+    
+    pipeline = load_metrics(str(tmp_path))["video_processor"]
+    assert pipeline["jobs"] == 25
+    assert pipeline["stages"]["decode"].count == 25
+    assert abs(pipeline["stages"]["decode"].sum - 0.01 * sum(range(1, 26))) < 1e-9
+
+
+def test_latest_job_is_exported(tmp_path):
+    save_jobs(tmp_path, count=8, keep_jobs=3)
+    
+    pipeline = load_metrics(str(tmp_path))["video_processor"]
+    assert abs(pipeline["last_job"]["stages"]["decode"].sum - 0.08) < 1e-9
+    
+    text = format_prometheus(str(tmp_path))
+    assert 'paddlecoach_jobs_total{pipeline="video_processor"} 8' in text
+    assert 'paddlecoach_last_job_stage_seconds_total{pipeline="video_processor",stage="decode"} 0.080000' in text
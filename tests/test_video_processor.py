@@ -0,0 +1,33 @@
+"""
+Tests for VideoProcessor's adaptive-rate backfill.
+"""
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent / "benchmarks"))
+from synthetic_match import SyntheticMatch
+from stub_models import stub_models
+from vision.video_processor import VideoProcessor
+
+
+def test_backfilled_frames_reach_the_tracker_before_the_trigger_frame(tmp_path):
+    match = SyntheticMatch(width=640, height=360, fps=30, duration=6, seed=1)
+    video_path = match.write(str(tmp_path / "match.mp4"))
+    
+    with stub_models(match):
+        processor = VideoProcessor(str(video_path), str(tmp_path / "out"), adaptive_rate=True, pose_interval=2)
+        processor.timer.metrics_dir = tmp_path / "metrics"
+        
+        # Frame number the tracker last saw, at every call
+        calls = []
+        process_frame = processor.tracker.process_frame
+        
+        def recording_process_frame(frame, frame_number, timestamp):
+            calls.append((processor.tracker.last_frame_number, frame_number))
+            return process_frame(frame, frame_number, timestamp)
+        
+        processor.tracker.process_frame = recording_process_frame
+        processor.process_video(visualize=False, save_video=False)
+    
+    assert processor.scheduler.backfilled_frames > 0
+    assert all(previous is None or previous < frame_number for previous, frame_number in calls)